@@ -0,0 +1,223 @@
+"""Model backends behind app/ai_client.py, picked with ``AI_BACKEND``.
+
+* ``gemini`` (default): Google's SDK through its async client, one shared
+  client (and connection pool) per event loop. ``GEMINI_BASE_URL`` points it
+  at another server speaking the same REST API, such as
+  ``benchmarks/fake_gemini.py``.
+* ``fake``: an in-process stand-in that needs no key or network. It answers
+  every AI Studio prompt with canned text of the right shape after a
+  simulated latency, streams it in chunks and fails a given fraction of
+  calls with retryable 429/503 errors. The behaviour comes from a named
+  profile (``AI_FAKE_PROFILE``, see ``FAKE_PROFILES``) whose settings can be
+  overridden one by one (``AI_FAKE_LATENCY_MS``, ``AI_FAKE_JITTER_MS``,
+  ``AI_FAKE_CHUNKS``, ``AI_FAKE_ERROR_RATE``). Answers depend only on the
+  prompt, and latencies and failures come from a generator seeded with
+  ``AI_FAKE_SEED``, so a sequential run is reproducible.
+
+A backend has a ``model`` name, ``generate(prompt)`` returning a
+``Completion`` (the answer's text and token usage), ``stream(prompt)``
+returning an async iterator of ``Completion`` chunks (usage arrives with the
+last one), and ``upstream_status(error)`` giving the HTTP status of a
+provider error (0 when the provider could not be reached, None for anything
+else), which the client uses to retry and to report failures.
+"""
+import asyncio
+import functools
+import json
+import os
+import random
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+BACKEND = os.environ.get("AI_BACKEND", "gemini")
+MAX_CONNECTIONS = int(os.environ.get("AI_MAX_CONNECTIONS", 32))
+
+FAKE_PROFILES = {
+    "instant": {"latency_ms": 0.0, "jitter_ms": 0.0, "chunks": 1, "error_rate": 0.0},
+    "typical": {"latency_ms": 800.0, "jitter_ms": 400.0, "chunks": 8, "error_rate": 0.0},
+    "slow": {"latency_ms": 5000.0, "jitter_ms": 2000.0, "chunks": 24, "error_rate": 0.0},
+    "flaky": {"latency_ms": 800.0, "jitter_ms": 400.0, "chunks": 8, "error_rate": 0.2},
+}
+
+
+@dataclass
+class Completion:
+    text: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+
+# -- Gemini ------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=8)
+def _client_for(api_key: str, base_url: Optional[str], loop: Optional[asyncio.AbstractEventLoop] = None):
+    # Imported lazily: the SDK is by far the heaviest import in the app and is
+    # only needed once someone actually calls a model.
+    from google import genai
+    from google.genai import types
+
+    import httpx
+
+    http_options = types.HttpOptions(
+        base_url=base_url,
+        async_client_args={"limits": httpx.Limits(
+            max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS, keepalive_expiry=60,
+        )},
+    )
+    client = genai.Client(api_key=api_key, http_options=http_options)
+    client.aio.models  # builds the async transport (SSL context etc.) here, not on the event loop
+    return client
+
+
+def get_client(loop: Optional[asyncio.AbstractEventLoop] = None):
+    """The shared Gemini client (it owns the connection pool), or None without a key.
+
+    Async connections belong to the event loop that opened them, so callers
+    on another loop (the AI job worker's) get a client of their own.
+    """
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        return None
+    return _client_for(api_key, os.environ.get("GEMINI_BASE_URL") or None, loop)
+
+
+class GeminiBackend:
+    def __init__(self, client, model: str = MODEL):
+        self.client = client
+        self.model = model
+
+    @staticmethod
+    def _completion(response) -> Completion:
+        usage = response.usage_metadata
+        return Completion(
+            response.text or "",
+            usage.prompt_token_count if usage else None,
+            usage.candidates_token_count if usage else None,
+        )
+
+    async def generate(self, prompt: str) -> Completion:
+        return self._completion(await self.client.aio.models.generate_content(model=self.model, contents=prompt))
+
+    async def stream(self, prompt: str) -> AsyncIterator[Completion]:
+        response = await self.client.aio.models.generate_content_stream(model=self.model, contents=prompt)
+        async for chunk in response:
+            completion = self._completion(chunk)
+            if completion.text or completion.completion_tokens is not None:
+                yield completion
+
+    def upstream_status(self, error: Exception) -> Optional[int]:
+        import httpx
+        from google.genai import errors
+
+        if isinstance(error, errors.APIError):
+            return error.code
+        return 0 if isinstance(error, httpx.TransportError) else None
+
+
+# -- fake --------------------------------------------------------------------
+
+def answer_for(prompt: str) -> str:
+    """A canned answer shaped like what the AI Studio prompt asks for."""
+    if "JSON array" in prompt:
+        return json.dumps([
+            {"title": f"Idea {i}", "content": f"Fake idea {i} for: {prompt[:60]}"} for i in range(1, 4)
+        ])
+    if "JSON object" in prompt:
+        return json.dumps({
+            "high_reach": ["#marketing", "#socialmedia"],
+            "medium_reach": ["#contentstrategy"],
+            "low_reach": ["#fakegemini"],
+        })
+    return f"Fake answer to: {prompt[:80]} #fake"
+
+
+class FakeAPIError(Exception):
+    def __init__(self, code: int):
+        super().__init__(f"{code} fake failure")
+        self.code = code
+
+
+class FakeBackend:
+    model = "fake"
+
+    def __init__(self, latency_ms: float = 800, jitter_ms: float = 0, chunks: int = 8, error_rate: float = 0.0,
+                 seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.chunks = max(1, chunks)
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeBackend":
+        name = os.environ.get("AI_FAKE_PROFILE", "typical")
+        if name not in FAKE_PROFILES:
+            raise ValueError(f"Unknown AI_FAKE_PROFILE {name!r}; expected one of {', '.join(FAKE_PROFILES)}")
+        profile = dict(FAKE_PROFILES[name])
+        for key in profile:
+            value = os.environ.get(f"AI_FAKE_{key.upper()}")
+            if value is not None:
+                profile[key] = int(float(value)) if key == "chunks" else float(value)
+        return cls(seed=int(os.environ.get("AI_FAKE_SEED", 0)), **profile)
+
+    def _start(self) -> float:
+        """Count the call, maybe fail it, and return its simulated latency in seconds."""
+        self.calls += 1
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.failed += 1
+            raise FakeAPIError(self._rng.choice([429, 503]))
+        jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    @staticmethod
+    def tokens(text: str) -> int:
+        # Roughly four characters per token, as for English text
+        return max(1, len(text) // 4)
+
+    async def generate(self, prompt: str) -> Completion:
+        latency = self._start()
+        await asyncio.sleep(latency)
+        text = answer_for(prompt)
+        return Completion(text, self.tokens(prompt), self.tokens(text))
+
+    async def stream(self, prompt: str) -> AsyncIterator[Completion]:
+        latency = self._start()
+        text = answer_for(prompt)
+        size = max(1, -(-len(text) // self.chunks))
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        for i, piece in enumerate(pieces):
+            await asyncio.sleep(latency / len(pieces))
+            if i == len(pieces) - 1:
+                yield Completion(piece, self.tokens(prompt), self.tokens(text))
+            else:
+                yield Completion(piece)
+
+    def upstream_status(self, error: Exception) -> Optional[int]:
+        return error.code if isinstance(error, FakeAPIError) else None
+
+
+@functools.lru_cache(maxsize=1)
+def _fake() -> FakeBackend:
+    return FakeBackend.from_env()
+
+
+def get_backend(loop: Optional[asyncio.AbstractEventLoop] = None):
+    """The configured backend, or None when it needs credentials that are missing."""
+    if BACKEND == "fake":
+        return _fake()
+    if BACKEND != "gemini":
+        raise ValueError(f"Unknown AI_BACKEND {BACKEND!r}; expected gemini or fake")
+    client = get_client(loop)
+    return GeminiBackend(client) if client is not None else None
+
+
+def configured() -> bool:
+    return BACKEND == "fake" or bool(os.environ.get("GOOGLE_API_KEY"))
+
+
+def model_name() -> str:
+    """The model recorded with answers and saved ideas."""
+    return FakeBackend.model if BACKEND == "fake" else MODEL
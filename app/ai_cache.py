@@ -0,0 +1,171 @@
+"""Persistent cache of model answers for the AI Studio endpoints.
+
+Answers are stored in ``ai_response_cache`` under the SHA-256 of the model,
+the normalized prompt (Unicode NFKC, whitespace collapsed) and any call
+parameters, so the same caption, idea or hashtag request from any user and
+any process is answered from the table instead of the model. Entries expire
+after ``AI_CACHE_TTL_SECONDS`` and the table is held to
+``AI_CACHE_MAX_ENTRIES`` by evicting the least recently used rows whenever a
+new answer is stored. ``AI_CACHE_ENABLED=0`` turns the cache off.
+
+Hit/miss counters per endpoint are kept in process (``stats``). Expired and
+excess rows can also be dropped offline::
+
+    python -m app.ai_cache prune
+    python -m app.ai_cache clear
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import AIResponseCache
+
+ENABLED = os.environ.get("AI_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+TTL_SECONDS = float(os.environ.get("AI_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+MAX_ENTRIES = int(os.environ.get("AI_CACHE_MAX_ENTRIES", 20000))
+
+logger = logging.getLogger(__name__)
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return _SPACE_RE.sub(" ", unicodedata.normalize("NFKC", prompt)).strip()
+
+
+def cache_key(model: str, prompt: str, params: Optional[dict] = None) -> str:
+    payload = json.dumps([model, normalize_prompt(prompt), params or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CacheStats:
+    """Thread-safe hit/miss/bypass counters per endpoint kind."""
+
+    def __init__(self):
+        self._counts = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, outcome: str, n: int = 1):
+        with self._lock:
+            self._counts[kind][outcome] += n
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            kinds = {kind: dict(counts) for kind, counts in self._counts.items()}
+        totals = defaultdict(int)
+        for counts in kinds.values():
+            for outcome, n in counts.items():
+                totals[outcome] += n
+        for counts in [*kinds.values(), totals]:
+            lookups = counts.get("hits", 0) + counts.get("misses", 0)
+            counts["hit_rate"] = round(counts.get("hits", 0) / lookups, 4) if lookups else 0.0
+        return {"total": dict(totals), "by_kind": kinds}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+def get(key: str, kind: str) -> Optional[str]:
+    """The cached answer for ``key``, bumping its LRU position; None on a miss."""
+    now = datetime.now()
+    try:
+        with SessionLocal() as db:
+            response = db.execute(
+                select(AIResponseCache.response)
+                .where(AIResponseCache.key == key, AIResponseCache.expires_at > now)
+            ).scalar()
+            if response is not None:
+                db.execute(
+                    update(AIResponseCache).where(AIResponseCache.key == key)
+                    .values(hits=AIResponseCache.hits + 1, last_used_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+    except Exception:
+        # A broken cache must not take the model endpoints down with it
+        logger.exception("AI cache lookup failed")
+        response = None
+    stats.record(kind, "hits" if response is not None else "misses")
+    return response
+
+
+def put(key: str, kind: str, model: str, response: str):
+    now = datetime.now()
+    row = {
+        "key": key, "kind": kind, "model": model, "response": response, "hits": 0,
+        "expires_at": now + timedelta(seconds=TTL_SECONDS), "last_used_at": now,
+    }
+    try:
+        with SessionLocal() as db:
+            dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+            stmt = dialect.insert(AIResponseCache.__table__)
+            # Two workers that missed on the same key both store; the later answer wins
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["key"],
+                set_={c: stmt.excluded[c] for c in ("response", "model", "expires_at", "last_used_at")},
+            )
+            db.execute(stmt, row)
+            evicted = prune(db, now)
+            db.commit()
+    except Exception:
+        logger.exception("AI cache store failed")
+        return
+    stats.record(kind, "stores")
+    if evicted:
+        stats.record(kind, "evictions", evicted)
+
+
+def prune(db: Session, now: Optional[datetime] = None, max_entries: int = MAX_ENTRIES) -> int:
+    """Drop expired rows, then the least recently used beyond ``max_entries``. Caller commits."""
+    now = now or datetime.now()
+    removed = db.execute(
+        delete(AIResponseCache).where(AIResponseCache.expires_at <= now)
+        .execution_options(synchronize_session=False)
+    ).rowcount or 0
+    excess = db.execute(select(func.count()).select_from(AIResponseCache)).scalar() - max_entries
+    if excess > 0:
+        oldest = select(AIResponseCache.key).order_by(AIResponseCache.last_used_at).limit(excess)
+        removed += db.execute(
+            delete(AIResponseCache).where(AIResponseCache.key.in_(oldest))
+            .execution_options(synchronize_session=False)
+        ).rowcount or 0
+    return removed
+
+
+def entries(db: Session) -> int:
+    return db.execute(select(func.count()).select_from(AIResponseCache)).scalar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.ai_cache")
+    parser.add_argument("command", choices=["prune", "clear"])
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        if args.command == "prune":
+            removed = prune(db)
+        else:
+            removed = db.execute(delete(AIResponseCache)).rowcount or 0
+        db.commit()
+    print(f"Removed {removed} cached answer(s)")
+
+
+if __name__ == "__main__":
+    main()
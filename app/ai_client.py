@@ -0,0 +1,388 @@
+"""Non-blocking Gemini calls for the AI Studio routes.
+
+Calls go through the SDK's async client (``client.aio``), so a slow model
+response parks one coroutine instead of the event loop that every other
+route shares. Each call has a deadline (``AI_TIMEOUT_SECONDS``) and, when
+given the incoming ``Request``, is cancelled as soon as the browser goes
+away, so abandoned requests stop holding an upstream connection. ``stream``
+yields the answer chunk by chunk for the Server-Sent Events endpoints.
+
+Answers are cached per (model, prompt) in app/ai_cache.py; pass
+``use_cache=False`` to force a fresh answer (it still refreshes the cache).
+
+Calls from every route share one client (and so one pool of keep-alive
+connections), pass through the global and per-user token buckets of
+app/ai_rate_limit.py, and are retried with jittered exponential backoff on
+429/5xx answers and connection errors (``AI_MAX_RETRIES``), all within the
+call's deadline.
+
+Fan-out callers (the batch endpoint) take a ``limits.slot(user_id)`` around
+each call: at most ``AI_MAX_CONCURRENCY`` calls are in flight per process and
+``AI_TENANT_CONCURRENCY`` per tenant, so one large batch cannot starve the
+other tenants.
+
+The model itself sits behind app/ai_backends.py: Gemini by default, or a
+local fake with configurable latency and failures (``AI_BACKEND=fake``).
+
+Every call's outcome, latency, token usage, estimated cost and (for JSON
+answers) parse result is recorded in app/ai_metrics.py, and copied into a
+``CallStats`` when the caller passes one. Failures are raised as ``AIError``
+subclasses carrying the HTTP status and error code to report;
+``error_info`` maps any exception to that triple for the routes.
+"""
+import asyncio
+import json
+import os
+import random
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Tuple
+
+from starlette.requests import Request
+
+from app import ai_cache
+from app.ai_backends import MODEL, Completion, get_backend, get_client, model_name
+from app.ai_metrics import CallStats, estimate_cost, metrics
+from app.ai_rate_limit import RateLimited, limiter
+
+TIMEOUT_SECONDS = float(os.environ.get("AI_TIMEOUT_SECONDS", 30))
+MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", 16))
+TENANT_CONCURRENCY = int(os.environ.get("AI_TENANT_CONCURRENCY", 4))
+MAX_RETRIES = int(os.environ.get("AI_MAX_RETRIES", 3))
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 8.0
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# How often an in-flight call checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class AIError(Exception):
+    status_code = 500
+    code = "ai_error"
+
+
+class AINotConfigured(AIError):
+    status_code = 503
+    code = "not_configured"
+
+    def __init__(self):
+        super().__init__("AI is not configured on this server (GOOGLE_API_KEY is missing)")
+
+
+class AITimeout(AIError):
+    status_code = 504
+    code = "timeout"
+
+    def __init__(self, seconds: float):
+        super().__init__(f"Model did not answer within {seconds:g}s")
+
+
+class ClientDisconnected(AIError):
+    # nginx's "client closed request"; nobody is left to read it
+    status_code = 499
+    code = "client_disconnected"
+
+    def __init__(self):
+        super().__init__("Client disconnected")
+
+
+class AIParseError(AIError):
+    status_code = 502
+    code = "malformed_answer"
+
+    def __init__(self):
+        super().__init__("The model's answer was not in the expected format, please try again")
+
+
+class AIUpstreamError(AIError):
+    """The model provider failed the call (after any retries)."""
+
+    status_code = 502
+
+    def __init__(self, upstream_status: int):
+        self.upstream_status = upstream_status
+        if upstream_status == 0:
+            self.code, message = "provider_unreachable", "Could not reach the AI provider"
+        elif upstream_status == 429:
+            # Our own limits were respected, so the provider's quota is exhausted; it is temporary
+            self.status_code, self.code, message = 503, "provider_busy", "The AI provider is busy, try again shortly"
+        elif upstream_status in (401, 403):
+            self.code, message = "provider_auth", "The AI provider rejected this server's credentials"
+        elif 400 <= upstream_status < 500:
+            self.code, message = "provider_rejected", f"The AI provider rejected the request ({upstream_status})"
+        else:
+            self.code, message = "provider_error", f"The AI provider failed ({upstream_status})"
+        super().__init__(message)
+
+
+def error_info(error: BaseException) -> Tuple[int, str, str]:
+    """(HTTP status, error code, message safe to show the user) for a failed AI call."""
+    if isinstance(error, RateLimited):
+        return error.status_code, "rate_limited", str(error)
+    if isinstance(error, AIError):
+        return error.status_code, error.code, str(error)
+    return 500, "internal_error", "Something went wrong while calling the AI model"
+
+
+class ConcurrencyLimits:
+    """A cap on in-flight model calls plus a smaller one per tenant.
+
+    Semaphores belong to one event loop, so each loop (the web server's, the
+    AI job worker's) gets its own set of limits.
+    """
+
+    def __init__(self, total: int = MAX_CONCURRENCY, per_tenant: int = TENANT_CONCURRENCY):
+        self.total = total
+        self.per_tenant = per_tenant
+        # loop -> (global semaphore, {user_id: [semaphore, callers holding or waiting for it]})
+        self._loops = weakref.WeakKeyDictionary()
+
+    @asynccontextmanager
+    async def slot(self, user_id: str):
+        loop = asyncio.get_running_loop()
+        if loop not in self._loops:
+            self._loops[loop] = (asyncio.Semaphore(self.total), {})
+        total, tenants = self._loops[loop]
+        entry = tenants.setdefault(user_id, [asyncio.Semaphore(self.per_tenant), 0])
+        entry[1] += 1
+        try:
+            # Queue on the tenant's own limit first so waiting items never hold a global slot
+            async with entry[0], total:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del tenants[user_id]
+
+
+limits = ConcurrencyLimits()
+
+
+def _retry_delay(backend, error: Exception, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying after ``error``, or None if it is not retryable."""
+    status = backend.upstream_status(error)
+    if status is None or (status and status not in RETRYABLE_STATUS):
+        return None
+    # Full jitter keeps a burst of callers that failed together from retrying together
+    delay = random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        delay = max(delay, float(headers.get("retry-after", 0)))
+    except ValueError:
+        pass
+    return delay
+
+
+async def _with_retries(backend, attempt_call: Callable[[], Awaitable[Any]], user_id: Optional[str], deadline: float):
+    """Run ``attempt_call`` under the rate limiter, retrying transient failures until ``deadline``."""
+    loop = asyncio.get_running_loop()
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.acquire(user_id, max_wait=deadline - loop.time())
+        try:
+            return await attempt_call()
+        except Exception as e:
+            delay = _retry_delay(backend, e, attempt) if attempt < MAX_RETRIES else None
+            if delay is None or loop.time() + delay >= deadline:
+                raise _as_ai_error(backend, e)
+        await asyncio.sleep(delay)
+
+
+def _as_ai_error(backend, error: Exception) -> Exception:
+    status = backend.upstream_status(error)
+    if status is None:
+        return error
+    upstream = AIUpstreamError(status)
+    upstream.__cause__ = error
+    return upstream
+
+
+def _finish(stats: CallStats, started: float, completion: Optional[Completion] = None):
+    stats.latency_ms = round((asyncio.get_running_loop().time() - started) * 1000, 1)
+    if completion is not None:
+        stats.prompt_tokens = completion.prompt_tokens
+        stats.completion_tokens = completion.completion_tokens
+        stats.cost_usd = estimate_cost(stats.model, completion.prompt_tokens, completion.completion_tokens)
+
+
+def _parse(parse: Optional[Callable[[str], Any]], text: str, kind: str, model: str):
+    if parse is None:
+        return text
+    try:
+        result = parse(text)
+    except ValueError as e:
+        metrics.record_parse(kind, model, False)
+        raise AIParseError() from e
+    metrics.record_parse(kind, model, True)
+    return result
+
+
+async def _wait_for_disconnect(request: Request):
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+async def _cached(key: str, kind: str, use_cache: bool) -> Optional[str]:
+    if not ai_cache.ENABLED:
+        return None
+    if not use_cache:
+        ai_cache.stats.record(kind, "bypassed")
+        return None
+    return await asyncio.to_thread(ai_cache.get, key, kind)
+
+
+async def generate(prompt: str, request: Optional[Request] = None, timeout: Optional[float] = None,
+                   kind: str = "generate", use_cache: bool = True, parse: Optional[Callable[[str], Any]] = None,
+                   user_id: Optional[str] = None, stats: Optional[CallStats] = None):
+    """The model's answer to ``prompt``, run through ``parse`` if given.
+
+    ``kind`` labels the endpoint in cache stats and metrics, ``user_id`` picks
+    the rate-limit bucket and is charged the cost, and ``stats`` receives the
+    call's latency, tokens and cost. Only answers that parse are cached; one
+    that does not raises ``AIParseError``. Raises ``RateLimited`` when the
+    call cannot start in time, ``AITimeout`` past the deadline and
+    ``ClientDisconnected`` when ``request``'s client goes away first; either
+    way the upstream call is cancelled.
+    """
+    stats = CallStats() if stats is None else stats
+    loop = asyncio.get_running_loop()
+    # The first call imports the SDK and builds the client; keep that off the loop too
+    backend = await asyncio.to_thread(get_backend, loop)
+    if backend is None:
+        metrics.record_call(kind, model_name(), AINotConfigured.code, user_id)
+        raise AINotConfigured()
+    stats.model = backend.model
+    timeout = TIMEOUT_SECONDS if timeout is None else timeout
+    key = ai_cache.cache_key(backend.model, prompt)
+    cached = await _cached(key, kind, use_cache)
+    if cached is not None:
+        stats.cached = True
+        metrics.record_call(kind, backend.model, "cached", user_id, stats)
+        return parse(cached) if parse else cached
+
+    started = loop.time()
+    call = asyncio.ensure_future(_with_retries(backend, lambda: backend.generate(prompt), user_id, started + timeout))
+    tasks = {call}
+    watcher = None
+    if request is not None:
+        watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+        tasks.add(watcher)
+    try:
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+        if call in done:
+            completion = call.result()
+        elif watcher in done:
+            raise ClientDisconnected()
+        else:
+            raise AITimeout(timeout)
+    except Exception as e:
+        _finish(stats, started)
+        metrics.record_call(kind, backend.model, error_info(e)[1], user_id, stats)
+        raise
+    _finish(stats, started, completion)
+    metrics.record_call(kind, backend.model, "ok", user_id, stats)
+    result = _parse(parse, completion.text, kind, backend.model)
+    if ai_cache.ENABLED and completion.text:
+        await asyncio.to_thread(ai_cache.put, key, kind, backend.model, completion.text)
+    return result
+
+
+async def stream(prompt: str, timeout: Optional[float] = None, kind: str = "generate", use_cache: bool = True,
+                 parse: Optional[Callable[[str], Any]] = None, user_id: Optional[str] = None,
+                 stats: Optional[CallStats] = None) -> AsyncIterator[str]:
+    """Yield the model's answer to ``prompt`` in chunks as they are generated.
+
+    A cached answer comes back as a single chunk. The deadline covers the
+    whole answer (``AITimeout``); client disconnects need no watcher here
+    because the streaming response cancels this generator itself. The full
+    answer is cached once it is complete and, if ``parse`` is given, parses.
+    Failures are retried only until the first chunk has been yielded.
+    ``stats`` is filled in once the answer is complete.
+    """
+    stats = CallStats() if stats is None else stats
+    loop = asyncio.get_running_loop()
+    backend = await asyncio.to_thread(get_backend, loop)
+    if backend is None:
+        metrics.record_call(kind, model_name(), AINotConfigured.code, user_id)
+        raise AINotConfigured()
+    stats.model = backend.model
+    timeout = TIMEOUT_SECONDS if timeout is None else timeout
+    key = ai_cache.cache_key(backend.model, prompt)
+    cached = await _cached(key, kind, use_cache)
+    if cached is not None:
+        stats.cached = True
+        metrics.record_call(kind, backend.model, "cached", user_id, stats)
+        yield cached
+        return
+
+    started = loop.time()
+    deadline = started + timeout
+    chunks = []
+    usage = Completion("")
+
+    async def open_stream():
+        # The request is only sent, and can only fail, once the first chunk is read
+        response = backend.stream(prompt)
+        try:
+            return response, await response.__anext__()
+        except StopAsyncIteration:
+            return response, None
+
+    def record(outcome: str, completion: Optional[Completion] = None):
+        _finish(stats, started, completion)
+        metrics.record_call(kind, backend.model, outcome, user_id, stats)
+
+    try:
+        response, chunk = await asyncio.wait_for(_with_retries(backend, open_stream, user_id, deadline), timeout)
+        while chunk is not None:
+            if chunk.completion_tokens is not None:
+                usage = chunk
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield chunk.text
+            try:
+                chunk = await asyncio.wait_for(response.__anext__(), deadline - loop.time())
+            except StopAsyncIteration:
+                break
+    except asyncio.TimeoutError:
+        record(AITimeout.code)
+        raise AITimeout(timeout) from None
+    except (asyncio.CancelledError, GeneratorExit):
+        record(ClientDisconnected.code)
+        raise
+    except Exception as e:
+        error = _as_ai_error(backend, e)
+        record(error_info(error)[1])
+        if error is e:
+            raise
+        raise error from e
+    record("ok", usage)
+
+    text = "".join(chunks)
+    if ai_cache.ENABLED and text and _parses(parse, text, kind, backend.model):
+        await asyncio.to_thread(ai_cache.put, key, kind, backend.model, text)
+    elif parse is not None and not ai_cache.ENABLED:
+        _parses(parse, text, kind, backend.model)
+
+
+def _parses(parse: Optional[Callable[[str], Any]], text: str, kind: str, model: str) -> bool:
+    try:
+        _parse(parse, text, kind, model)
+        return True
+    except AIParseError:
+        return False
+
+
+def parse_json(text: str) -> Any:
+    """Parse a JSON answer, tolerating a surrounding markdown code fence."""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    elif text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return json.loads(text.strip())
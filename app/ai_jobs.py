@@ -0,0 +1,392 @@
+"""Background AI jobs: submit now, poll for the result later.
+
+Long model calls (30-hashtag research, batched idea generation) would hold
+an HTTP connection open past proxy timeouts. Instead ``POST /api/ai/jobs``
+stores the request in ``ai_jobs`` and returns its id straight away; a worker
+claims queued jobs, runs them through the same code as the synchronous
+endpoints (app/ai_tasks.py) and writes the result, plus any
+new ``AIContentIdea`` rows, back in one transaction. Clients poll
+``GET /api/ai/jobs/{id}`` (optionally long-polling with ``wait``) or
+subscribe to ``/api/ai/jobs/{id}/events``.
+
+Claiming works like the post dispatcher: a guarded ``queued -> running``
+UPDATE, with ``FOR UPDATE SKIP LOCKED`` on Postgres so several workers can
+share the table. Each job has its own timeout; failures are retried with
+exponential backoff up to ``max_attempts``; a cancel request stops a queued
+job at once and a running one within ``CANCEL_POLL_SECONDS``. Jobs left
+``running`` by a worker that died are requeued after the lease expires.
+
+The worker is an asyncio loop on its own thread running up to
+``AI_JOB_CONCURRENCY`` jobs at once; no broker is needed. Run it on its own::
+
+    python -m app.ai_jobs --concurrency 8
+
+or in the web process with ``AI_JOB_WORKER=1``. An idle worker only reads:
+the claim UPDATE runs once a due job is seen, and expired leases are swept
+every ``LEASE_GRACE_SECONDS`` rather than on every poll.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app import ai_client, ai_tasks
+from app.ai_metrics import CallStats
+from app.ai_rate_limit import RateLimited
+from app.database import SessionLocal
+from app.models import AIJob
+
+CONCURRENCY = int(os.environ.get("AI_JOB_CONCURRENCY", 4))
+DEFAULT_TIMEOUT_SECONDS = float(os.environ.get("AI_JOB_TIMEOUT_SECONDS", 300))
+MAX_TIMEOUT_SECONDS = 900.0
+MAX_ATTEMPTS = int(os.environ.get("AI_JOB_MAX_ATTEMPTS", 3))
+BACKOFF_SECONDS = 5.0
+# A running job whose worker vanished is requeued after its longest possible run plus this
+LEASE_GRACE_SECONDS = 60.0
+CANCEL_POLL_SECONDS = 1.0
+
+TERMINAL = ("succeeded", "failed", "cancelled")
+
+# kind -> required params
+KINDS = {
+    "caption": ("description",),
+    "hashtags": ("keyword",),
+    "repurpose": ("content", "target_platform"),
+    "generate": ("topic", "platform"),
+    "batch": ("platforms",),
+}
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# -- API side ----------------------------------------------------------------
+
+def submit(db: Session, user_id: str, kind: str, params: Dict[str, Any],
+           timeout_seconds: Optional[float] = None, max_attempts: Optional[int] = None) -> AIJob:
+    """Queue a job. Raises ``ValueError`` for an unknown kind or missing params. Caller commits."""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown job kind {kind!r}; expected one of {', '.join(KINDS)}")
+    missing = [name for name in KINDS[kind] if not params.get(name)]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)} for a {kind} job")
+    if kind == "batch":
+        items = ai_tasks.batch_items(params["platforms"], params.get("content"), params.get("topics", []))
+        if not items:
+            raise ValueError("Nothing to generate: send content and/or topics with platforms")
+    timeout = min(MAX_TIMEOUT_SECONDS, max(1.0, timeout_seconds or DEFAULT_TIMEOUT_SECONDS))
+    job = AIJob(
+        user_id=user_id, kind=kind, params=json.dumps(params), status="queued", attempts=0,
+        max_attempts=max(1, max_attempts or MAX_ATTEMPTS), timeout_seconds=timeout, cancel_requested=False,
+    )
+    db.add(job)
+    return job
+
+
+def cancel(db: Session, job: AIJob) -> AIJob:
+    """Cancel a queued job now, or ask the worker to stop a running one. Caller commits."""
+    if job.status == "queued":
+        job.status = "cancelled"
+        job.finished_at = datetime.now()
+    elif job.status == "running":
+        job.cancel_requested = True
+    return job
+
+
+def to_dict(job: AIJob) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "params": json.loads(job.params),
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "timeout_seconds": job.timeout_seconds,
+        "cancel_requested": bool(job.cancel_requested),
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+# -- execution ---------------------------------------------------------------
+
+async def execute(kind: str, params: Dict[str, Any], user_id: str, timeout: float) -> Tuple[dict, List[dict]]:
+    """Run one job. Returns its result and the ``ai_content_ideas`` rows to insert."""
+    use_cache = not params.get("fresh")
+    call = dict(timeout=timeout, use_cache=use_cache, user_id=user_id)
+    if kind == "caption":
+        prompt = ai_tasks.caption_prompt(params["description"], params.get("platform") or "instagram")
+        return {"caption": await ai_client.generate(prompt, kind="caption", **call)}, []
+    if kind == "repurpose":
+        prompt = ai_tasks.repurpose_prompt(params["content"], params["target_platform"])
+        return {"content": await ai_client.generate(prompt, kind="repurpose", **call)}, []
+    if kind == "hashtags":
+        prompt = ai_tasks.hashtags_prompt(params["keyword"])
+        return await ai_client.generate(prompt, kind="hashtags", parse=ai_client.parse_json, **call), []
+
+    tone = params.get("tone") or "professional"
+    content_type = params.get("content_type") or "post"
+    if kind == "generate":
+        prompt = ai_tasks.idea_prompt(params["topic"], params["platform"], tone, content_type)
+        stats = CallStats()
+        ideas = ai_tasks.clean_ideas(
+            await ai_client.generate(prompt, kind="generate", parse=ai_client.parse_json, stats=stats, **call)
+        )
+        return {"ideas": ideas}, ai_tasks.idea_rows(user_id, params["platform"], content_type, tone, ideas, stats)
+
+    # batch
+    content = params.get("content")
+    items = ai_tasks.batch_items(params["platforms"], content, params.get("topics", []))
+    stats = [CallStats() for _ in items]
+    outcomes = await asyncio.gather(
+        *(ai_tasks.run_batch_item(item, content, tone, content_type, user_id, use_cache, timeout, item_stats)
+          for item, item_stats in zip(items, stats)),
+        return_exceptions=True,
+    )
+    if all(isinstance(outcome, Exception) for outcome in outcomes):
+        raise outcomes[0]
+    results, rows = [], []
+    for item, outcome, item_stats in zip(items, outcomes, stats):
+        if isinstance(outcome, Exception):
+            _, code, message = ai_client.error_info(outcome)
+            results.append({**item, "error": message, "code": code})
+        else:
+            results.append({**item, "ideas": outcome})
+            rows += ai_tasks.idea_rows(user_id, item["platform"], ai_tasks.batch_idea_type(item, content_type),
+                                       tone, outcome, item_stats)
+    return {"items": results}, rows
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, ai_client.AIUpstreamError):
+        # The provider refused the request itself; sending it again will not help
+        return error.code not in ("provider_auth", "provider_rejected")
+    return not isinstance(error, (ai_client.AINotConfigured, KeyError, TypeError))
+
+
+class JobMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"polls": 0, "claimed": 0, "succeeded": 0, "retried": 0, "failed": 0,
+                       "cancelled": 0, "released": 0}
+
+    def add(self, name: str, n: int = 1):
+        with self._lock:
+            self.counts[name] += n
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+
+class AIJobWorker:
+    def __init__(self, concurrency: int = CONCURRENCY, poll_interval: float = 0.5,
+                 backoff_seconds: float = BACKOFF_SECONDS, session_factory=SessionLocal):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.backoff_seconds = backoff_seconds
+        self.session_factory = session_factory
+        self.metrics = JobMetrics()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._next_release = 0.0  # monotonic time of the next expired-lease sweep
+
+    # -- claiming (worker thread pool, blocking) ----------------------------
+
+    def release_expired(self, now: datetime) -> int:
+        lease = timedelta(seconds=MAX_TIMEOUT_SECONDS + LEASE_GRACE_SECONDS)
+        with self.session_factory() as db:
+            result = db.execute(
+                update(AIJob)
+                .where(AIJob.status == "running", AIJob.claimed_at < now - lease)
+                .values(status="queued", claimed_at=None, next_attempt_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        return result.rowcount or 0
+
+    def claim(self, now: datetime, limit: int) -> List[AIJob]:
+        with self.session_factory() as db:
+            due = (
+                select(AIJob.id)
+                .where(AIJob.status == "queued", (AIJob.next_attempt_at.is_(None)) | (AIJob.next_attempt_at <= now))
+                .order_by(AIJob.id)
+                .limit(limit)
+            )
+            # A plain read first, so polling an empty queue takes no write lock (SQLite)
+            if db.execute(due.limit(1)).first() is None:
+                return []
+            due = due.with_for_update(skip_locked=True)  # ignored by SQLite
+            claimed = db.execute(
+                update(AIJob)
+                .where(AIJob.id.in_(due.scalar_subquery()), AIJob.status == "queued")
+                .values(status="running", claimed_at=now, started_at=now, attempts=AIJob.attempts + 1)
+                .returning(AIJob.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            db.commit()
+            if not claimed:
+                return []
+            jobs = db.execute(select(AIJob).where(AIJob.id.in_(claimed)).order_by(AIJob.id)).scalars().all()
+            db.expunge_all()
+            return jobs
+
+    def _cancel_requested(self, job_id: int) -> bool:
+        with self.session_factory() as db:
+            return bool(db.execute(select(AIJob.cancel_requested).where(AIJob.id == job_id)).scalar())
+
+    def _finish(self, job: AIJob, status: str, result: Optional[dict] = None, rows: Optional[List[dict]] = None,
+                error: Optional[str] = None):
+        now = datetime.now()
+        values = {"status": status, "claimed_at": None, "error": error}
+        if status == "queued":
+            delay = self.backoff_seconds * 2 ** (job.attempts - 1)
+            values["next_attempt_at"] = now + timedelta(seconds=delay)
+        else:
+            values["finished_at"] = now
+        with self.session_factory() as db:
+            if rows:
+                _, duplicates = ai_tasks.save_idea_rows(db, job.user_id, rows)
+                result = {**result, "duplicates": len(duplicates)}
+            if result is not None:
+                values["result"] = json.dumps(result)
+            # Guarded on "running" so a job released to another worker is not overwritten
+            db.execute(
+                update(AIJob).where(AIJob.id == job.id, AIJob.status == "running").values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        self.metrics.add({"queued": "retried"}.get(status, status))
+
+    # -- running (worker event loop) ----------------------------------------
+
+    async def _watch_cancel(self, job_id: int):
+        while not await asyncio.to_thread(self._cancel_requested, job_id):
+            await asyncio.sleep(CANCEL_POLL_SECONDS)
+        raise JobCancelled()
+
+    async def run_job(self, job: AIJob):
+        params = json.loads(job.params)
+        work = asyncio.ensure_future(execute(job.kind, params, job.user_id, job.timeout_seconds))
+        watcher = asyncio.ensure_future(self._watch_cancel(job.id))
+        try:
+            done, _ = await asyncio.wait({work, watcher}, timeout=job.timeout_seconds,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            work.cancel()
+            watcher.cancel()
+        if work in done and work.exception() is None:
+            result, rows = work.result()
+            await asyncio.to_thread(self._finish, job, "succeeded", result, rows)
+            return
+        if watcher in done and isinstance(watcher.exception(), JobCancelled):
+            await asyncio.to_thread(self._finish, job, "cancelled", error="Cancelled")
+            return
+        if work in done:
+            error = work.exception()
+            message = ai_client.error_info(error)[2]
+        else:
+            error = TimeoutError(f"Job timed out after {job.timeout_seconds:g}s")
+            message = str(error)
+        if not isinstance(error, (ai_client.AIError, RateLimited, TimeoutError)):
+            logger.warning("AI job %s attempt %s failed: %r", job.id, job.attempts, error)
+        retry = _retryable(error) and job.attempts < job.max_attempts
+        await asyncio.to_thread(self._finish, job, "queued" if retry else "failed", error=message[:1000])
+
+    async def _poll(self, running: set) -> int:
+        now = datetime.now()
+        # Leases run for MAX_TIMEOUT_SECONDS, so sweeping them once per grace period is plenty
+        if time.monotonic() >= self._next_release:
+            released = await asyncio.to_thread(self.release_expired, now)
+            self.metrics.add("released", released)
+            self._next_release = time.monotonic() + LEASE_GRACE_SECONDS
+        self.metrics.add("polls")
+        free = self.concurrency - len(running)
+        if free <= 0:
+            return 0
+        jobs = await asyncio.to_thread(self.claim, now, free)
+        self.metrics.add("claimed", len(jobs))
+        for job in jobs:
+            task = asyncio.ensure_future(self.run_job(job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        return len(jobs)
+
+    async def run_until_idle(self):
+        """Run jobs until none are queued and due (used by ``--once`` and scripts)."""
+        running = set()
+        while await self._poll(running) or running:
+            if running:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+
+    async def _run(self):
+        running = set()
+        while not self._stop.is_set():
+            try:
+                claimed = await self._poll(running)
+            except Exception:
+                logger.exception("AI job poll failed")
+                claimed = 0
+            # Every slot just filled means more may be waiting; poll again straight away
+            if not claimed or len(running) < self.concurrency:
+                await asyncio.sleep(self.poll_interval)
+            elif running:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+    def run_forever(self):
+        logger.info("AI job worker started (concurrency=%s)", self.concurrency)
+        asyncio.run(self._run())
+
+    def start(self) -> "AIJobWorker":
+        self._thread = threading.Thread(target=self.run_forever, name="ai-job-worker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def start_in_background(**kwargs) -> AIJobWorker:
+    return AIJobWorker(**kwargs).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.ai_jobs")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--once", action="store_true", help="run the jobs that are due and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    worker = AIJobWorker(concurrency=args.concurrency, poll_interval=args.poll_interval)
+    try:
+        if args.once:
+            asyncio.run(worker.run_until_idle())
+            print(f"AI jobs: {worker.metrics.snapshot()}")
+        else:
+            worker.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""In-process metrics for model calls, exported at ``/api/ai/metrics``.
+
+Every call made through app/ai_client.py is recorded under its endpoint
+``kind`` and model:
+
+* call counts by outcome (``ok``, ``cached`` or the error code from
+  ``ai_client.error_info``),
+* histograms of upstream latency and of prompt and completion tokens (from
+  the response's usage metadata),
+* how often the answer failed to parse as the JSON the prompt asked for,
+* estimated cost per tenant, from ``PRICES`` (USD per million input/output
+  tokens; ``AI_PRICE_INPUT_PER_MTOK`` / ``AI_PRICE_OUTPUT_PER_MTOK`` override
+  them for the configured model).
+
+Histograms use fixed cumulative buckets like Prometheus, so ``prometheus()``
+can render the text exposition format served at ``/metrics``. Counters are
+per process and reset on restart; per-idea numbers are also stored on
+``ai_content_ideas`` for analysis that must survive restarts.
+"""
+import bisect
+import os
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.ai_backends import MODEL
+
+# USD per million (input, output) tokens
+PRICES = {
+    "gemini-2.5-pro": (1.25, 10.0),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "fake": (0.0, 0.0),
+}
+if os.environ.get("AI_PRICE_INPUT_PER_MTOK") or os.environ.get("AI_PRICE_OUTPUT_PER_MTOK"):
+    PRICES[MODEL] = (
+        float(os.environ.get("AI_PRICE_INPUT_PER_MTOK", PRICES.get(MODEL, (0.0, 0.0))[0])),
+        float(os.environ.get("AI_PRICE_OUTPUT_PER_MTOK", PRICES.get(MODEL, (0.0, 0.0))[1])),
+    )
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+# Tenants beyond this many keep being charged to "other" rather than growing the map
+MAX_TENANTS = 10000
+
+
+def estimate_cost(model: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> Optional[float]:
+    """Estimated USD for one call, or None for a model without a known price."""
+    price = PRICES.get(model)
+    if price is None:
+        return None
+    return ((prompt_tokens or 0) * price[0] + (completion_tokens or 0) * price[1]) / 1_000_000
+
+
+@dataclass
+class CallStats:
+    """What one model call cost; passed to ``ai_client.generate``/``stream`` to be filled in."""
+    model: Optional[str] = None
+    latency_ms: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cost_usd: Optional[float] = None
+    cached: bool = False
+
+    def idea_columns(self, ideas: int = 1) -> dict:
+        """``ai_content_ideas`` columns for one of ``ideas`` ideas from this call.
+
+        Each idea gets an even share of the tokens and cost, so summing over
+        the ideas saved from a call gives its totals; latency is the whole call's.
+        """
+        def share(value):
+            return None if value is None else value / max(ideas, 1)
+
+        tokens = [share(self.prompt_tokens), share(self.completion_tokens)]
+        return {
+            "latency_ms": self.latency_ms,
+            "prompt_tokens": None if tokens[0] is None else round(tokens[0]),
+            "completion_tokens": None if tokens[1] is None else round(tokens[1]),
+            "cost_usd": share(self.cost_usd),
+        }
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the ``q`` quantile (None for +Inf or no data)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+class AIMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls: Dict[Tuple[str, str, str], int] = defaultdict(int)
+            self.latency: Dict[Tuple[str, str], Histogram] = {}
+            self.prompt_tokens: Dict[Tuple[str, str], Histogram] = {}
+            self.completion_tokens: Dict[Tuple[str, str], Histogram] = {}
+            self.parses: Dict[Tuple[str, str, bool], int] = defaultdict(int)
+            self.tenant_cost: Dict[str, float] = defaultdict(float)
+
+    def record_call(self, kind: str, model: str, outcome: str, user_id: Optional[str] = None,
+                    stats: Optional[CallStats] = None):
+        key = (kind, model)
+        with self._lock:
+            self.calls[(kind, model, outcome)] += 1
+            if stats is None or stats.cached:
+                return
+            if stats.latency_ms is not None:
+                self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(stats.latency_ms / 1000)
+            if stats.prompt_tokens is not None:
+                self.prompt_tokens.setdefault(key, Histogram(TOKEN_BUCKETS)).observe(stats.prompt_tokens)
+            if stats.completion_tokens is not None:
+                self.completion_tokens.setdefault(key, Histogram(TOKEN_BUCKETS)).observe(stats.completion_tokens)
+            if stats.cost_usd and user_id is not None:
+                if user_id not in self.tenant_cost and len(self.tenant_cost) >= MAX_TENANTS:
+                    user_id = "other"
+                self.tenant_cost[user_id] += stats.cost_usd
+
+    def record_parse(self, kind: str, model: str, ok: bool):
+        with self._lock:
+            self.parses[(kind, model, ok)] += 1
+
+    def snapshot(self, user_id: Optional[str] = None) -> dict:
+        """Per (endpoint, model) figures; tenant cost only for ``user_id`` when given."""
+        with self._lock:
+            series = defaultdict(lambda: {"calls": {}})
+            for (kind, model, outcome), n in self.calls.items():
+                series[(kind, model)]["calls"][outcome] = n
+            for name, histograms in (("latency_seconds", self.latency), ("prompt_tokens", self.prompt_tokens),
+                                     ("completion_tokens", self.completion_tokens)):
+                for key, histogram in histograms.items():
+                    series[key][name] = histogram.snapshot()
+            for (kind, model, ok), n in self.parses.items():
+                series[(kind, model)].setdefault("parses", {"ok": 0, "failed": 0})["ok" if ok else "failed"] += n
+            for entry in series.values():
+                parses = entry.get("parses")
+                if parses:
+                    parses["failure_rate"] = round(parses["failed"] / (parses["ok"] + parses["failed"]), 4)
+            if user_id is None:
+                cost = {tenant: round(usd, 6) for tenant, usd in self.tenant_cost.items()}
+            else:
+                cost = {user_id: round(self.tenant_cost.get(user_id, 0.0), 6)}
+        return {
+            "endpoints": [{"endpoint": kind, "model": model, **entry} for (kind, model), entry in sorted(series.items())],
+            "cost_usd_by_tenant": cost,
+        }
+
+    def prometheus(self, user_id: Optional[str] = None) -> str:
+        """All metrics in the Prometheus text exposition format; tenant cost only for ``user_id`` when given."""
+        lines = []
+
+        def labels(**values) -> str:
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in values.items()) + "}"
+
+        with self._lock:
+            lines.append("# TYPE ai_calls_total counter")
+            for (kind, model, outcome), n in sorted(self.calls.items()):
+                lines.append(f"ai_calls_total{labels(endpoint=kind, model=model, outcome=outcome)} {n}")
+            for name, histograms in (("ai_latency_seconds", self.latency), ("ai_prompt_tokens", self.prompt_tokens),
+                                     ("ai_completion_tokens", self.completion_tokens)):
+                lines.append(f"# TYPE {name} histogram")
+                for (kind, model), histogram in sorted(histograms.items()):
+                    cumulative = 0
+                    for bound, n in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{labels(endpoint=kind, model=model, le=bound)} {cumulative}")
+                    lines.append(f"{name}_sum{labels(endpoint=kind, model=model)} {histogram.sum}")
+                    lines.append(f"{name}_count{labels(endpoint=kind, model=model)} {histogram.count}")
+            lines.append("# TYPE ai_parse_total counter")
+            for (kind, model, ok), n in sorted(self.parses.items()):
+                result = "ok" if ok else "failed"
+                lines.append(f"ai_parse_total{labels(endpoint=kind, model=model, result=result)} {n}")
+            lines.append("# TYPE ai_cost_usd_total counter")
+            costs = self.tenant_cost if user_id is None else {user_id: self.tenant_cost.get(user_id, 0.0)}
+            for tenant, usd in sorted(costs.items()):
+                lines.append(f"ai_cost_usd_total{labels(tenant=tenant)} {usd}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = AIMetrics()
@@ -0,0 +1,131 @@
+"""Token-bucket rate limiting for model calls, process-wide and per user.
+
+Every model call (including each retry) takes one token from the global
+bucket (``AI_RATE_PER_SECOND``, bursts of ``AI_RATE_BURST``) and one from the
+caller's bucket (``AI_USER_RATE_PER_MINUTE``, bursts of ``AI_USER_BURST``).
+A caller that finds a bucket empty reserves the next token and waits its
+turn, which keeps the upstream request rate under the quota instead of
+discovering it through 429s. The wait is bounded twice over:
+
+* a reservation that would not come due before the call's deadline is
+  refused straight away rather than queued only to time out, and
+* at most ``AI_QUEUE_MAX`` callers wait at once; beyond that new calls are
+  rejected (backpressure) instead of piling up in memory.
+
+Both refusals raise ``RateLimited`` (HTTP 429).
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+GLOBAL_RATE = float(os.environ.get("AI_RATE_PER_SECOND", 10))
+GLOBAL_BURST = float(os.environ.get("AI_RATE_BURST", 20))
+USER_RATE = float(os.environ.get("AI_USER_RATE_PER_MINUTE", 30)) / 60
+USER_BURST = float(os.environ.get("AI_USER_BURST", 10))
+QUEUE_MAX = int(os.environ.get("AI_QUEUE_MAX", 100))
+# Idle user buckets are dropped once there are more than this many
+MAX_USER_BUCKETS = 10000
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token reserved now would be available."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        # May go negative: that is a reservation the next callers queue behind
+        self.tokens -= 1
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class RateLimiter:
+    def __init__(self, rate: float = GLOBAL_RATE, burst: float = GLOBAL_BURST, user_rate: float = USER_RATE,
+                 user_burst: float = USER_BURST, queue_max: int = QUEUE_MAX):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.queue_max = queue_max
+        self._global = TokenBucket(rate, burst)
+        self._users: Dict[str, TokenBucket] = {}
+        self._waiting = 0
+        # Buckets are shared by every event loop / worker thread in the process
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.rejected = 0
+
+    def _user_bucket(self, user_id: str, now: float) -> TokenBucket:
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            if len(self._users) >= MAX_USER_BUCKETS:
+                self._users = {u: b for u, b in self._users.items() if not b.idle(now)}
+            bucket = self._users[user_id] = TokenBucket(self.user_rate, self.user_burst)
+        return bucket
+
+    def reserve(self, user_id: Optional[str], max_wait: float) -> float:
+        """Reserve a token in both buckets and return the seconds to wait for it.
+
+        Raises ``RateLimited`` without reserving anything when the wait would
+        exceed ``max_wait`` or too many callers are already waiting.
+        """
+        now = time.monotonic()
+        with self._lock:
+            buckets = [self._global]
+            if user_id is not None:
+                buckets.append(self._user_bucket(user_id, now))
+            wait = max(bucket.wait_time(now) for bucket in buckets)
+            if wait > 0 and self._waiting >= self.queue_max:
+                self.rejected += 1
+                raise RateLimited("Too many AI requests queued, try again shortly", retry_after=wait)
+            if wait > max_wait:
+                self.rejected += 1
+                raise RateLimited(f"AI rate limit reached, retry in {wait:.0f}s", retry_after=wait)
+            for bucket in buckets:
+                bucket.take()
+            self.granted += 1
+            if wait > 0:
+                self._waiting += 1
+        return wait
+
+    async def acquire(self, user_id: Optional[str], max_wait: float):
+        wait = self.reserve(user_id, max_wait)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "granted": self.granted,
+                "rejected": self.rejected,
+                "waiting": self._waiting,
+                "users": len(self._users),
+            }
+
+
+limiter = RateLimiter()
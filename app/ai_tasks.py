@@ -0,0 +1,128 @@
+"""AI Studio operations shared by the HTTP endpoints and the job queue.
+
+Prompt builders for each tool, plus the fan-out items of a batch request and
+how each one is run, so ``/api/ai/*`` (app/routes/ai_studio.py) and the
+background workers (app/ai_jobs.py) produce the same answers and rows.
+"""
+from collections import Counter
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app import ai_backends, ai_client
+from app.ai_metrics import CallStats
+from app.idea_index import indexes, touch
+from app.models import AIContentIdea
+
+
+# Key of the CallStats a row came from, until save_idea_rows turns it into usage columns
+_CALL_STATS = "_call_stats"
+
+
+def idea_prompt(topic: str, platform: str, tone: str, content_type: str) -> str:
+    return f"Generate 3 {content_type} ideas for {platform} about '{topic}' with a {tone} tone. Return the response as JSON array of objects with 'title' and 'content' keys. Do not include markdown code blocks."
+
+
+def caption_prompt(description: str, platform: str) -> str:
+    return f"Write a {platform} caption for a post about: {description}. Include emojis and hashtags."
+
+
+def hashtags_prompt(keyword: str) -> str:
+    return f"Suggest 30 hashtags for '{keyword}' categorized by reach (High, Medium, Low). Return as a JSON object with keys 'high_reach', 'medium_reach', 'low_reach', each containing an array of strings."
+
+
+def repurpose_prompt(content: str, target_platform: str) -> str:
+    return f"Repurpose the following content for {target_platform}. Make it native to the platform style.\n\nContent:\n{content}"
+
+
+def clean_ideas(ideas: Any) -> List[dict]:
+    """``title``/``content`` pairs from a parsed idea list, skipping anything malformed."""
+    if not isinstance(ideas, list):
+        return []
+    return [
+        {"title": str(idea.get("title", "Untitled"))[:200], "content": str(idea.get("content", ""))}
+        for idea in ideas if isinstance(idea, dict)
+    ]
+
+
+def idea_rows(user_id: str, platform: str, idea_type: str, tone: Optional[str], ideas: List[dict],
+              stats: Optional[CallStats] = None) -> List[dict]:
+    """``ai_content_ideas`` rows for ``save_idea_rows``, which shares out the call's usage in ``stats``."""
+    stats = stats or CallStats()
+    return [
+        {"user_id": user_id, "platform": platform, "idea_type": idea_type, "title": idea["title"],
+         "content": idea["content"], "tone": tone, "model_used": stats.model or ai_backends.model_name(),
+         _CALL_STATS: stats}
+        for idea in ideas
+    ]
+
+
+def save_idea_rows(db: Session, user_id: str, rows: List[dict]) -> Tuple[List[dict], List[dict]]:
+    """Bulk-insert ``rows`` minus near-duplicates of the tenant's saved ideas (app/idea_index.py).
+
+    Each call's tokens and cost are split evenly over its ideas that are
+    saved, so they add up to the call's totals. Returns the rows inserted and
+    the ones skipped, each with the id of the saved idea it matched in
+    ``duplicate_of``. Caller commits; the new ideas are then indexed by id in
+    every process (``touch``), whatever order concurrent inserts commit in.
+    """
+    rows, duplicates = indexes.dedupe(db, user_id, rows)
+    saved_per_call = Counter(id(row[_CALL_STATS]) for row in rows)
+    rows = [
+        {**_without_stats(row), **row[_CALL_STATS].idea_columns(saved_per_call[id(row[_CALL_STATS])])}
+        for row in rows
+    ]
+    if rows:
+        touch(db, user_id, db.execute(insert(AIContentIdea).returning(AIContentIdea.id), rows).scalars())
+    return rows, [_without_stats(row) for row in duplicates]
+
+
+def _without_stats(row: dict) -> dict:
+    return {key: value for key, value in row.items() if key != _CALL_STATS}
+
+
+def matched_ideas(db: Session, user_id: str, duplicates: List[dict]) -> List[dict]:
+    """The saved ideas that ``duplicates`` matched, as ``title``/``content``/``duplicate_of`` dicts.
+
+    A repeated request (a cached answer especially) then shows the ideas the
+    user already has instead of nothing.
+    """
+    ids = list(dict.fromkeys(d["duplicate_of"] for d in duplicates if d.get("duplicate_of")))
+    if not ids:
+        return []
+    saved = {
+        row.id: row for row in db.execute(
+            select(AIContentIdea.id, AIContentIdea.title, AIContentIdea.content)
+            .where(AIContentIdea.user_id == user_id, AIContentIdea.id.in_(ids))
+        )
+    }
+    return [{"title": saved[i].title, "content": saved[i].content, "duplicate_of": i} for i in ids if i in saved]
+
+
+def batch_items(platforms: List[str], content: Optional[str], topics: List[str]) -> List[dict]:
+    """Repurpose ``content`` for every platform and generate ideas for every (topic, platform)."""
+    platforms = list(dict.fromkeys(p.strip() for p in platforms if p and p.strip()))
+    topics = list(dict.fromkeys(t.strip() for t in topics if t and t.strip()))
+    items = [{"kind": "repurpose", "platform": p} for p in platforms if content and content.strip()]
+    items += [{"kind": "generate", "platform": p, "topic": t} for t in topics for p in platforms]
+    return items
+
+
+async def run_batch_item(item: dict, content: Optional[str], tone: str, content_type: str, user_id: str,
+                         use_cache: bool = True, timeout: Optional[float] = None,
+                         stats: Optional[CallStats] = None) -> List[dict]:
+    """Ideas produced by one batch item, within the caller's concurrency slot; usage goes to ``stats``."""
+    async with ai_client.limits.slot(user_id):
+        if item["kind"] == "repurpose":
+            text = await ai_client.generate(repurpose_prompt(content, item["platform"]), timeout=timeout,
+                                            kind="repurpose", use_cache=use_cache, user_id=user_id, stats=stats)
+            return [{"title": f"Repurposed for {item['platform']}", "content": text}]
+        ideas = await ai_client.generate(idea_prompt(item["topic"], item["platform"], tone, content_type),
+                                         timeout=timeout, kind="generate", use_cache=use_cache,
+                                         parse=ai_client.parse_json, user_id=user_id, stats=stats)
+        return clean_ideas(ideas)
+
+
+def batch_idea_type(item: dict, content_type: str) -> str:
+    return "repurpose" if item["kind"] == "repurpose" else content_type
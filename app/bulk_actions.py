@@ -0,0 +1,123 @@
+"""Set-based bulk actions on a tenant's posts.
+
+Every action is a handful of UPDATE/DELETE statements scoped by
+``user_id`` and applied in one transaction, instead of loading and
+modifying posts one ORM object at a time. Posts are selected either by an
+explicit id list or by a filter (status / account / post type).
+
+The search index is maintained by row triggers, so it stays in sync with
+these statements without extra work here; other derived data is updated
+through app/post_hooks.py.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app import post_hooks
+from app.models import ContentCalendar, Post, PostMetric, SocialAccount
+
+BULK_ACTIONS = ("publish", "reschedule", "change_account", "delete")
+MAX_BULK_IDS = 10000
+
+
+class BulkActionError(ValueError):
+    pass
+
+
+@dataclass
+class PostFilter:
+    status: Optional[str] = None
+    account_id: Optional[int] = None
+    post_type: Optional[str] = None
+
+    def is_empty(self) -> bool:
+        return self.status is None and self.account_id is None and self.post_type is None
+
+
+def _scope(user_id: str, post_ids: Optional[List[int]], post_filter: Optional[PostFilter]):
+    """Subquery of the post ids an action applies to, always limited to the tenant."""
+    if not post_ids and (post_filter is None or post_filter.is_empty()):
+        raise BulkActionError("Select posts by id or by a filter")
+    if post_ids and len(post_ids) > MAX_BULK_IDS:
+        raise BulkActionError(f"At most {MAX_BULK_IDS} ids per request; use a filter instead")
+    query = select(Post.id).where(Post.user_id == user_id)
+    if post_ids:
+        query = query.where(Post.id.in_(post_ids))
+    if post_filter is not None:
+        if post_filter.status is not None:
+            query = query.where(Post.status == post_filter.status)
+        if post_filter.account_id is not None:
+            query = query.where(Post.account_id == post_filter.account_id)
+        if post_filter.post_type is not None:
+            query = query.where(Post.post_type == post_filter.post_type)
+    return query.scalar_subquery()
+
+
+def _update(db: Session, scope, *conditions, **values) -> int:
+    result = db.execute(
+        update(Post)
+        .where(Post.id.in_(scope), *conditions)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def apply_bulk_action(
+    db: Session,
+    user_id: str,
+    action: str,
+    post_ids: Optional[List[int]] = None,
+    post_filter: Optional[PostFilter] = None,
+    scheduled_at: Optional[datetime] = None,
+    account_id: Optional[int] = None,
+) -> Dict[str, int]:
+    """Apply ``action`` to the selected posts and commit. Returns affected row counts."""
+    if action not in BULK_ACTIONS:
+        raise BulkActionError(f"action must be one of {list(BULK_ACTIONS)}")
+    scope = _scope(user_id, post_ids, post_filter)
+
+    try:
+        if action == "publish":
+            counts = {"posts": _update(
+                db, scope, Post.status != "published",
+                status="published", published_at=datetime.now(), next_attempt_at=None,
+            )}
+        elif action == "reschedule":
+            if scheduled_at is None:
+                raise BulkActionError("reschedule needs scheduled_at")
+            counts = {"posts": _update(
+                db, scope, Post.status != "published",
+                status="scheduled", scheduled_at=scheduled_at,
+                next_attempt_at=None, publish_attempts=0, last_error=None,
+            )}
+        elif action == "change_account":
+            owned = db.execute(
+                select(SocialAccount.id).where(SocialAccount.id == account_id, SocialAccount.user_id == user_id)
+            ).first()
+            if owned is None:
+                raise BulkActionError("account_id must be one of your accounts")
+            counts = {"posts": _update(db, scope, account_id=account_id)}
+        else:
+            post_hooks.posts_deleting(db, db.execute(select(Post.id).where(Post.id.in_(scope))).scalars().all())
+            # Mirror the ORM cascade (metrics deleted, calendar entries unlinked) as set operations
+            metrics = db.execute(
+                delete(PostMetric).where(PostMetric.post_id.in_(scope))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            unlinked = db.execute(
+                update(ContentCalendar).where(ContentCalendar.post_id.in_(scope)).values(post_id=None)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            posts = db.execute(
+                delete(Post).where(Post.id.in_(scope)).execution_options(synchronize_session=False)
+            ).rowcount
+            counts = {"posts": posts, "metrics": metrics, "calendar_entries_unlinked": unlinked}
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return counts
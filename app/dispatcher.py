@@ -0,0 +1,337 @@
+"""Background dispatcher that publishes scheduled posts once they are due.
+
+Each poll claims a batch of due posts by moving them from ``scheduled`` to
+``publishing`` in one statement. On Postgres the candidate rows are selected
+with ``FOR UPDATE SKIP LOCKED`` so several dispatchers can run side by side;
+on SQLite the single writer makes the guarded UPDATE atomic on its own.
+Claimed posts are published through a platform adapter (app/publishers.py,
+named by ``PUBLISHER_BACKEND``, which must be set) on a bounded thread pool,
+and results are written back in bulk.
+
+Failed publishes are retried with exponential backoff via ``next_attempt_at``
+and end in ``failed`` after ``max_attempts``. Posts stuck in ``publishing``
+(a dispatcher died mid-batch) are released after ``lease_seconds``, which
+counts as an attempt. Results are only written back while the claim is still
+held, so a post released meanwhile is not overwritten by the late dispatcher.
+
+Run it as its own process::
+
+    python -m app.dispatcher --batch-size 200 --concurrency 16
+
+or in the web process with ``DISPATCHER_ENABLED=1``.
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Post, SocialAccount
+from app.publishers import PublishError, PublishRequest, Publisher, get_publisher
+
+logger = logging.getLogger(__name__)
+
+
+def _local(value: datetime) -> datetime:
+    """``value`` as naive local time, like ``datetime.now()``; aware values are converted, not truncated."""
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo is not None else value
+
+
+@dataclass
+class DispatchResult:
+    post_id: int
+    scheduled_at: Optional[datetime]
+    attempts: int
+    platform_post_id: Optional[str] = None
+    error: Optional[str] = None
+    retryable: bool = False
+
+
+class DispatchMetrics:
+    """In-process counters plus a window of recent dispatch lags."""
+
+    def __init__(self, window: int = 10000):
+        self._lock = threading.Lock()
+        self._lags = deque(maxlen=window)
+        self.claimed = 0
+        self.published = 0
+        self.retried = 0
+        self.failed = 0
+        self.released = 0
+        self.polls = 0
+
+    def record(self, results: List[DispatchResult], now: datetime, max_attempts: int):
+        with self._lock:
+            for r in results:
+                if r.error is None:
+                    self.published += 1
+                    if r.scheduled_at is not None:
+                        self._lags.append((now - _local(r.scheduled_at)).total_seconds())
+                elif r.retryable and r.attempts < max_attempts:
+                    self.retried += 1
+                else:
+                    self.failed += 1
+
+    def lag_percentile(self, pct: float) -> float:
+        with self._lock:
+            lags = sorted(self._lags)
+        if not lags:
+            return 0.0
+        return lags[min(len(lags) - 1, int(len(lags) * pct / 100))]
+
+    def snapshot(self) -> dict:
+        return {
+            "polls": self.polls,
+            "claimed": self.claimed,
+            "published": self.published,
+            "retried": self.retried,
+            "failed": self.failed,
+            "released": self.released,
+            "lag_p50_seconds": round(self.lag_percentile(50), 3),
+            "lag_p99_seconds": round(self.lag_percentile(99), 3),
+            "lag_max_seconds": round(self.lag_percentile(100), 3),
+        }
+
+
+class Dispatcher:
+    def __init__(
+        self,
+        publisher: Optional[Publisher] = None,
+        batch_size: int = 200,
+        concurrency: int = 16,
+        max_attempts: int = 3,
+        backoff_seconds: float = 30.0,
+        lease_seconds: float = 300.0,
+        session_factory=SessionLocal,
+    ):
+        self.publisher = publisher or get_publisher()
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.lease_seconds = lease_seconds
+        self.session_factory = session_factory
+        self.metrics = DispatchMetrics()
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="publish")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # -- claiming ---------------------------------------------------------
+
+    def release_expired(self, db: Session, now: datetime) -> Tuple[int, int]:
+        """Hand posts whose claim outlived the lease back to ``scheduled``.
+
+        The lost run counts as an attempt, so a post that keeps killing its
+        dispatcher ends in ``failed`` instead of being retried forever.
+        Returns (released, failed).
+        """
+        expired = and_(Post.status == "publishing", Post.claimed_at < now - timedelta(seconds=self.lease_seconds))
+        attempts = func.coalesce(Post.publish_attempts, 0) + 1
+        failed = db.execute(
+            update(Post)
+            .where(expired, attempts >= self.max_attempts)
+            .values(status="failed", claimed_at=None, next_attempt_at=None, publish_attempts=attempts,
+                    last_error="Publishing did not finish within the lease")
+            .execution_options(synchronize_session=False)
+        ).rowcount or 0
+        released = db.execute(
+            update(Post)
+            .where(expired)
+            .values(status="scheduled", claimed_at=None, publish_attempts=attempts)
+            .execution_options(synchronize_session=False)
+        ).rowcount or 0
+        db.commit()
+        return released, failed
+
+    def claim(self, db: Session, now: datetime) -> List[int]:
+        due = (
+            select(Post.id)
+            .where(
+                Post.status == "scheduled",
+                Post.scheduled_at <= now,
+                or_(Post.next_attempt_at.is_(None), Post.next_attempt_at <= now),
+            )
+            .order_by(Post.scheduled_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)  # ignored by SQLite
+        )
+        claimed = db.execute(
+            update(Post)
+            .where(Post.id.in_(due.scalar_subquery()), Post.status == "scheduled")
+            .values(status="publishing", claimed_at=now)
+            .returning(Post.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        db.commit()
+        return claimed
+
+    def unclaim(self, db: Session, post_ids: List[int], claimed_at: datetime):
+        """Give back a claimed batch untouched, e.g. when stopping before it was published."""
+        db.execute(
+            update(Post)
+            .where(Post.id.in_(post_ids), Post.status == "publishing", Post.claimed_at == claimed_at)
+            .values(status="scheduled", claimed_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    # -- publishing -------------------------------------------------------
+
+    def _load(self, db: Session, post_ids: List[int]):
+        return db.execute(
+            select(
+                Post.id, Post.user_id, Post.account_id, Post.post_type, Post.content,
+                Post.hashtags, Post.media_urls, Post.scheduled_at, Post.publish_attempts,
+                SocialAccount.platform, SocialAccount.account_name,
+            )
+            .join(SocialAccount, Post.account_id == SocialAccount.id)
+            .where(Post.id.in_(post_ids))
+        ).all()
+
+    def _publish_one(self, row) -> DispatchResult:
+        attempts = (row.publish_attempts or 0) + 1
+        request = PublishRequest(
+            post_id=row.id, user_id=row.user_id, platform=row.platform, account_id=row.account_id,
+            account_name=row.account_name, post_type=row.post_type, content=row.content,
+            hashtags=row.hashtags, media_urls=row.media_urls,
+        )
+        try:
+            platform_post_id = self.publisher.publish(request)
+            return DispatchResult(row.id, row.scheduled_at, attempts, platform_post_id=platform_post_id)
+        except PublishError as e:
+            return DispatchResult(row.id, row.scheduled_at, attempts, error=str(e)[:500], retryable=e.retryable)
+        except Exception as e:
+            logger.exception("Publisher crashed on post %s", row.id)
+            return DispatchResult(row.id, row.scheduled_at, attempts, error=str(e)[:500], retryable=True)
+
+    def _store(self, db: Session, results: List[DispatchResult], claimed_at: datetime,
+               now: datetime) -> List[DispatchResult]:
+        """Write back the results for posts this claim still holds and return those results.
+
+        A post released to another dispatcher after the lease, or moved out of
+        ``publishing`` by its user meanwhile, is no longer ours to overwrite.
+        """
+        held = set(db.execute(
+            select(Post.id)
+            .where(Post.id.in_([r.post_id for r in results]), Post.status == "publishing",
+                   Post.claimed_at == claimed_at)
+            .with_for_update()  # ignored by SQLite
+        ).scalars())
+        if len(held) < len(results):
+            logger.warning("Dropping results for %s post(s) no longer claimed by this dispatcher",
+                           len(results) - len(held))
+        results = [r for r in results if r.post_id in held]
+        updates = []
+        for r in results:
+            values = {"id": r.post_id, "publish_attempts": r.attempts, "claimed_at": None}
+            if r.error is None:
+                values.update(status="published", published_at=now, platform_post_id=r.platform_post_id,
+                              last_error=None, next_attempt_at=None)
+            elif r.retryable and r.attempts < self.max_attempts:
+                delay = self.backoff_seconds * 2 ** (r.attempts - 1)
+                values.update(status="scheduled", last_error=r.error,
+                              next_attempt_at=now + timedelta(seconds=delay))
+            else:
+                values.update(status="failed", last_error=r.error, next_attempt_at=None)
+            updates.append(values)
+        if updates:
+            # ORM bulk UPDATE by primary key: one executemany for the whole batch,
+            # still guarded on the claim in case it was lost since the check above
+            db.execute(
+                update(Post)
+                .where(Post.status == "publishing", Post.claimed_at == claimed_at)
+                .execution_options(synchronize_session=None),
+                updates,
+            )
+        db.commit()
+        return results
+
+    def run_once(self) -> int:
+        """Claim and publish one batch. Returns the number of posts claimed."""
+        now = datetime.now()
+        with self.session_factory() as db:
+            released, expired = self.release_expired(db, now)
+            post_ids = self.claim(db, now)
+            self.metrics.polls += 1
+            self.metrics.released += released
+            self.metrics.failed += expired
+            self.metrics.claimed += len(post_ids)
+            if not post_ids:
+                return 0
+            if self._stop.is_set():
+                # Stopping: hand the batch straight back rather than leave it to the lease
+                self.unclaim(db, post_ids, now)
+                return 0
+            rows = self._load(db, post_ids)
+            results = list(self._pool.map(self._publish_one, rows))
+            finished = datetime.now()
+            results = self._store(db, results, now, finished)
+            self.metrics.record(results, finished, self.max_attempts)
+        return len(post_ids)
+
+    def run_forever(self, poll_interval: float = 1.0, report_interval: float = 60.0):
+        logger.info("Dispatcher started (batch=%s, concurrency=%s)", self.batch_size, self.concurrency)
+        last_report = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                claimed = self.run_once()
+            except Exception:
+                logger.exception("Dispatcher poll failed")
+                claimed = 0
+            if time.monotonic() - last_report >= report_interval:
+                logger.info("Dispatcher metrics: %s", self.metrics.snapshot())
+                last_report = time.monotonic()
+            # A full batch means more is probably due; poll again straight away
+            if claimed < self.batch_size:
+                self._stop.wait(poll_interval)
+
+    def start(self) -> "Dispatcher":
+        self._thread = threading.Thread(target=self.run_forever, name="post-dispatcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        # Let the run loop finish its batch before the pool it publishes on goes away
+        if self._thread is not None:
+            self._thread.join()
+        self._pool.shutdown(wait=True)
+
+
+def start_in_background(**kwargs) -> Dispatcher:
+    return Dispatcher(**kwargs).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.dispatcher")
+    parser.add_argument("--batch-size", type=int, default=int(os.environ.get("DISPATCHER_BATCH_SIZE", 200)))
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("DISPATCHER_CONCURRENCY", 16)))
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--once", action="store_true", help="dispatch one batch and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    dispatcher = Dispatcher(batch_size=args.batch_size, concurrency=args.concurrency, max_attempts=args.max_attempts)
+    try:
+        if args.once:
+            print(f"Claimed {dispatcher.run_once()} post(s): {dispatcher.metrics.snapshot()}")
+        else:
+            dispatcher.run_forever(poll_interval=args.poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dispatcher.stop()
+
+
+if __name__ == "__main__":
+    main()
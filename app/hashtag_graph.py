@@ -0,0 +1,274 @@
+"""Hashtag co-occurrence graph and "works well with" recommendations.
+
+``hashtag_cooccurrences`` is a sparse matrix over a tenant's hashtags: one
+row per ordered pair of tags used together on at least one post, with the
+number of such posts and the sum of their ``engagement_rate``. It is kept
+current by deltas, like app/hashtag_metrics.py:
+
+* a post's tags change -> pairs that appeared / disappeared gain / lose the
+  post and its engagement,
+* a metric row changes -> every pair on that post moves by the change in
+  engagement.
+
+Recommendations for a set of picked tags are the other tags with the
+highest summed weight, read through the ``(hashtag_id, weight)`` index.
+
+With ``HASHTAG_GLOBAL_COOCCURRENCE=1`` the same deltas also feed
+``hashtag_cooccurrences_global``, keyed by tag text across all tenants.
+Rebuild from scratch with::
+
+    python -m app.hashtag_graph rebuild [--user-id 42] [--global]
+"""
+import argparse
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from itertools import permutations
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, desc, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, aliased
+
+from app.hashtag_metrics import MetricSample
+from app.models import GlobalHashtagCooccurrence, Hashtag, HashtagCooccurrence, PostHashtag, PostMetric
+
+GLOBAL_ENABLED = os.environ.get("HASHTAG_GLOBAL_COOCCURRENCE", "0").lower() in ("1", "true", "yes")
+
+
+@dataclass
+class Recommendation:
+    tag: str
+    posts: int
+    weight: float
+
+
+# posts, weight
+PairDeltas = Dict[Tuple, List[float]]
+
+
+def _new_deltas() -> PairDeltas:
+    return defaultdict(lambda: [0, 0.0])
+
+
+def _engagement(db: Session, post_ids: Iterable[int]) -> Dict[int, float]:
+    post_ids = list(post_ids)
+    if not post_ids:
+        return {}
+    return dict(db.execute(
+        select(PostMetric.post_id, func.coalesce(func.sum(PostMetric.engagement_rate), 0.0))
+        .where(PostMetric.post_id.in_(post_ids))
+        .group_by(PostMetric.post_id)
+    ).all())
+
+
+def _upsert(db: Session, model, keys: List[str], rows: List[dict]):
+    """Add ``posts`` / ``weight`` of each row onto the existing pair, inserting missing pairs."""
+    table = model.__table__
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={"posts": table.c.posts + stmt.excluded.posts, "weight": table.c.weight + stmt.excluded.weight},
+    )
+    # A stable key order keeps concurrent upserts from deadlocking on Postgres
+    db.execute(stmt, sorted(rows, key=lambda r: tuple(r[k] for k in keys)))
+
+
+def _apply(db: Session, deltas: PairDeltas):
+    deltas = {pair: d for pair, d in deltas.items() if d[0] or d[1]}
+    if not deltas:
+        return
+    _upsert(db, HashtagCooccurrence, ["hashtag_id", "other_id"], [
+        {"hashtag_id": a, "other_id": b, "posts": posts, "weight": weight}
+        for (a, b), (posts, weight) in deltas.items()
+    ])
+    touched = {a for a, _ in deltas}
+    db.execute(
+        delete(HashtagCooccurrence)
+        .where(HashtagCooccurrence.hashtag_id.in_(touched), HashtagCooccurrence.posts <= 0)
+        .execution_options(synchronize_session=False)
+    )
+    if GLOBAL_ENABLED:
+        _apply_global(db, deltas, touched)
+
+
+def _apply_global(db: Session, deltas: PairDeltas, hashtag_ids: Set[int]):
+    # Pairs are stored in both directions, so the first ids already cover every tag
+    tags = dict(db.execute(select(Hashtag.id, Hashtag.tag).where(Hashtag.id.in_(hashtag_ids))).all())
+    global_deltas = _new_deltas()
+    for (a, b), (posts, weight) in deltas.items():
+        global_deltas[tags[a], tags[b]][0] += posts
+        global_deltas[tags[a], tags[b]][1] += weight
+    _upsert(db, GlobalHashtagCooccurrence, ["tag", "other_tag"], [
+        {"tag": a, "other_tag": b, "posts": posts, "weight": weight}
+        for (a, b), (posts, weight) in global_deltas.items()
+        if posts or weight
+    ])
+    db.execute(
+        delete(GlobalHashtagCooccurrence)
+        .where(GlobalHashtagCooccurrence.tag.in_({a for a, _ in global_deltas}),
+               GlobalHashtagCooccurrence.posts <= 0)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def posts_relinked(db: Session, changes: Dict[int, Tuple[Set[int], Set[int]]]):
+    """``changes`` maps post id to ``(old_hashtag_ids, new_hashtag_ids)``."""
+    changes = {post_id: (old, new) for post_id, (old, new) in changes.items() if old != new}
+    if not changes:
+        return
+    engagement = _engagement(db, changes)
+    deltas = _new_deltas()
+    for post_id, (old, new) in changes.items():
+        weight = engagement.get(post_id, 0.0)
+        old_pairs, new_pairs = set(permutations(old, 2)), set(permutations(new, 2))
+        for pair in new_pairs - old_pairs:
+            deltas[pair][0] += 1
+            deltas[pair][1] += weight
+        for pair in old_pairs - new_pairs:
+            deltas[pair][0] -= 1
+            deltas[pair][1] -= weight
+    _apply(db, deltas)
+
+
+def metric_changed(db: Session, before: Optional[MetricSample], after: Optional[MetricSample]):
+    changes = defaultdict(float)
+    for sample, sign in ((before, -1), (after, 1)):
+        if sample is not None:
+            changes[sample.post_id] += sign * sample.engagement_rate
+    changes = {post_id: d for post_id, d in changes.items() if d}
+    if not changes:
+        return
+    links = defaultdict(set)
+    for post_id, hashtag_id in db.execute(
+        select(PostHashtag.post_id, PostHashtag.hashtag_id).where(PostHashtag.post_id.in_(changes))
+    ):
+        links[post_id].add(hashtag_id)
+    deltas = _new_deltas()
+    for post_id, weight in changes.items():
+        for pair in permutations(links[post_id], 2):
+            deltas[pair][1] += weight
+    _apply(db, deltas)
+
+
+# -- recommendations -------------------------------------------------------
+
+def recommend(db: Session, user_id: str, tags: Iterable[str], limit: int = 10,
+              scope: str = "tenant") -> List[Recommendation]:
+    """Tags that co-occur with ``tags`` (normalized), best summed weight first."""
+    tags = list(dict.fromkeys(tags))
+    if not tags:
+        return []
+    if scope == "global":
+        pair = GlobalHashtagCooccurrence
+        tag = pair.other_tag
+        query = (
+            select(pair.other_tag, func.sum(pair.posts), func.sum(pair.weight))
+            .where(pair.tag.in_(tags), pair.other_tag.not_in(tags))
+            .group_by(pair.other_tag)
+        )
+    else:
+        picked = select(Hashtag.id).where(Hashtag.user_id == user_id, Hashtag.tag.in_(tags))
+        pair = HashtagCooccurrence
+        tag = Hashtag.tag
+        query = (
+            select(Hashtag.tag, func.sum(pair.posts), func.sum(pair.weight))
+            .join(Hashtag, Hashtag.id == pair.other_id)
+            .where(pair.hashtag_id.in_(picked), pair.other_id.not_in(picked))
+            .group_by(Hashtag.id, Hashtag.tag)
+        )
+    weight = func.sum(pair.weight)
+    query = query.order_by(desc(weight), desc(func.sum(pair.posts)), tag).limit(limit)
+    return [Recommendation(name, int(posts), round(float(w), 2)) for name, posts, w in db.execute(query)]
+
+
+def recommend_each(db: Session, hashtag_ids: Iterable[int], limit: int = 5) -> Dict[int, List[Recommendation]]:
+    """Top ``limit`` co-occurring tags for each of ``hashtag_ids`` separately, in one query.
+
+    Same order as ``recommend`` for a single tag. Hashtag ids are tenant-scoped,
+    so no user filter is needed.
+    """
+    hashtag_ids = list(dict.fromkeys(hashtag_ids))
+    if not hashtag_ids:
+        return {}
+    pair = HashtagCooccurrence
+    rank = func.row_number().over(
+        partition_by=pair.hashtag_id, order_by=(desc(pair.weight), desc(pair.posts), Hashtag.tag)
+    )
+    ranked = (
+        select(pair.hashtag_id, Hashtag.tag, pair.posts, pair.weight, rank.label("rank"))
+        .join(Hashtag, Hashtag.id == pair.other_id)
+        .where(pair.hashtag_id.in_(hashtag_ids))
+        .subquery()
+    )
+    related = {hashtag_id: [] for hashtag_id in hashtag_ids}
+    for hashtag_id, name, posts, weight in db.execute(
+        select(ranked.c.hashtag_id, ranked.c.tag, ranked.c.posts, ranked.c.weight)
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.hashtag_id, ranked.c.rank)
+    ):
+        related[hashtag_id].append(Recommendation(name, int(posts), round(float(weight), 2)))
+    return related
+
+
+# -- rebuild ---------------------------------------------------------------
+
+def rebuild(db: Session, user_id: Optional[str] = None, include_global: bool = GLOBAL_ENABLED) -> int:
+    """Recompute the tenant matrix (one tenant, or all) and optionally the global one. Caller commits."""
+    tenant_tags = select(Hashtag.id).where(Hashtag.user_id == user_id)
+    clear = delete(HashtagCooccurrence).execution_options(synchronize_session=False)
+    if user_id is not None:
+        clear = clear.where(HashtagCooccurrence.hashtag_id.in_(tenant_tags))
+    db.execute(clear)
+
+    a, b = aliased(PostHashtag), aliased(PostHashtag)
+    engagement = (
+        select(PostMetric.post_id, func.sum(PostMetric.engagement_rate).label("weight"))
+        .group_by(PostMetric.post_id)
+        .subquery()
+    )
+    pairs = (
+        select(a.hashtag_id, b.hashtag_id, func.count(), func.coalesce(func.sum(engagement.c.weight), 0.0))
+        .join(b, (b.post_id == a.post_id) & (b.hashtag_id != a.hashtag_id))
+        .outerjoin(engagement, engagement.c.post_id == a.post_id)
+        .group_by(a.hashtag_id, b.hashtag_id)
+    )
+    if user_id is not None:
+        pairs = pairs.where(a.hashtag_id.in_(tenant_tags))
+    result = db.execute(
+        insert(HashtagCooccurrence).from_select(["hashtag_id", "other_id", "posts", "weight"], pairs)
+    )
+
+    if include_global:
+        db.execute(delete(GlobalHashtagCooccurrence).execution_options(synchronize_session=False))
+        ha, hb = aliased(Hashtag), aliased(Hashtag)
+        pair = HashtagCooccurrence
+        db.execute(insert(GlobalHashtagCooccurrence).from_select(
+            ["tag", "other_tag", "posts", "weight"],
+            select(ha.tag, hb.tag, func.sum(pair.posts), func.sum(pair.weight))
+            .join(ha, ha.id == pair.hashtag_id)
+            .join(hb, hb.id == pair.other_id)
+            .group_by(ha.tag, hb.tag),
+        ))
+    return result.rowcount or 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.hashtag_graph")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--user-id", default=None, help="only this tenant (default: all)")
+    parser.add_argument("--global", dest="include_global", action="store_true", default=GLOBAL_ENABLED,
+                        help="also rebuild the cross-tenant matrix")
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        pairs = rebuild(db, args.user_id, include_global=args.include_global)
+        db.commit()
+    print(f"Rebuilt {pairs} co-occurrence pair(s)" + (" and the global matrix" if args.include_global else ""))
+
+
+if __name__ == "__main__":
+    main()
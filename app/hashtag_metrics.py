@@ -0,0 +1,284 @@
+"""Usage counts and average reach per hashtag and per hashtag group.
+
+Every hashtag and group keeps running totals (``usage_count``,
+``reach_total``, ``reach_samples``, ``avg_reach``) that are adjusted by
+deltas as things change, so no write ever rescans a tenant's history:
+
+* a metric row is added, edited or removed -> its reach is added to /
+  subtracted from the post's hashtags and the groups containing them,
+* a post's tags change -> the post's usage and metric totals move between
+  the old and the new tags and groups,
+* a group's tag list changes -> only that group is recomputed, from the
+  indexed post_hashtags / post_metrics joins.
+
+A post counts once per group however many of the group's tags it uses.
+``rebuild`` recomputes everything from scratch::
+
+    python -m app.hashtag_metrics rebuild [--user-id 42]
+"""
+import argparse
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import Float, bindparam, cast, func, select, update
+from sqlalchemy.orm import Session
+
+from app import hashtag_suggest
+from app.models import Hashtag, HashtagGroup, HashtagGroupTag, Post, PostHashtag, PostMetric
+
+REBUILD_BATCH = 1000
+
+
+class MetricSample(NamedTuple):
+    post_id: int
+    reach: int
+    engagement_rate: float
+
+
+def sample_of(metric: PostMetric) -> MetricSample:
+    return MetricSample(metric.post_id, metric.reach or 0, metric.engagement_rate or 0.0)
+
+
+# usage, reach_total, reach_samples
+Delta = List[int]
+
+
+def _new_deltas() -> Dict[int, Delta]:
+    return defaultdict(lambda: [0, 0, 0])
+
+
+def _apply(db: Session, model, deltas: Dict[int, Delta]):
+    rows = [
+        {"target_id": target_id, "d_usage": usage, "d_reach": reach, "d_samples": samples}
+        for target_id, (usage, reach, samples) in deltas.items()
+        if usage or reach or samples
+    ]
+    if not rows:
+        return
+    table = model.__table__
+    reach_total = table.c.reach_total + bindparam("d_reach")
+    samples = table.c.reach_samples + bindparam("d_samples")
+    average = func.coalesce(reach_total / func.nullif(samples, 0), 0)
+    if model is Hashtag:
+        average = func.coalesce(cast(reach_total, Float) / func.nullif(samples, 0), 0.0)
+    # Core executemany: each SET reads the row's current totals, so concurrent deltas compose
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("target_id"))
+        .values(
+            usage_count=table.c.usage_count + bindparam("d_usage"),
+            reach_total=reach_total,
+            reach_samples=samples,
+            avg_reach=average,
+        ),
+        rows,
+    )
+
+
+def _groups_of_tags(db: Session, hashtag_ids: Iterable[int]) -> Dict[int, Set[int]]:
+    hashtag_ids = set(hashtag_ids)
+    groups = defaultdict(set)
+    if hashtag_ids:
+        for hashtag_id, group_id in db.execute(
+            select(HashtagGroupTag.hashtag_id, HashtagGroupTag.group_id)
+            .where(HashtagGroupTag.hashtag_id.in_(hashtag_ids))
+        ):
+            groups[hashtag_id].add(group_id)
+    return groups
+
+
+def _metric_totals(db: Session, post_ids: Iterable[int]) -> Dict[int, Tuple[int, int]]:
+    post_ids = list(post_ids)
+    if not post_ids:
+        return {}
+    return {
+        post_id: (int(reach), samples)
+        for post_id, reach, samples in db.execute(
+            select(PostMetric.post_id, func.coalesce(func.sum(PostMetric.reach), 0), func.count(PostMetric.id))
+            .where(PostMetric.post_id.in_(post_ids))
+            .group_by(PostMetric.post_id)
+        )
+    }
+
+
+def posts_relinked(db: Session, changes: Dict[int, Tuple[Set[int], Set[int]]]):
+    """Move usage and reach for posts whose hashtag ids went from old to new.
+
+    ``changes`` maps post id to ``(old_hashtag_ids, new_hashtag_ids)``.
+    """
+    changes = {post_id: (old, new) for post_id, (old, new) in changes.items() if old != new}
+    if not changes:
+        return
+    totals = _metric_totals(db, changes)
+    groups_of = _groups_of_tags(db, {h for old, new in changes.values() for h in old | new})
+    hashtag_deltas, group_deltas = _new_deltas(), _new_deltas()
+
+    for post_id, (old, new) in changes.items():
+        reach, samples = totals.get(post_id, (0, 0))
+        for hashtag_id in new - old:
+            _add(hashtag_deltas[hashtag_id], 1, reach, samples)
+        for hashtag_id in old - new:
+            _add(hashtag_deltas[hashtag_id], -1, reach, samples)
+        old_groups = set().union(*(groups_of[h] for h in old))
+        new_groups = set().union(*(groups_of[h] for h in new))
+        for group_id in new_groups - old_groups:
+            _add(group_deltas[group_id], 1, reach, samples)
+        for group_id in old_groups - new_groups:
+            _add(group_deltas[group_id], -1, reach, samples)
+
+    _apply(db, Hashtag, hashtag_deltas)
+    _apply(db, HashtagGroup, group_deltas)
+
+
+def _add(delta: Delta, sign: int, reach: int, samples: int):
+    delta[0] += sign
+    delta[1] += sign * reach
+    delta[2] += sign * samples
+
+
+def metric_changed(db: Session, before: Optional[MetricSample], after: Optional[MetricSample]):
+    """Apply one metric row being created (before=None), edited or deleted (after=None)."""
+    changes = defaultdict(lambda: [0, 0])
+    for sample, sign in ((before, -1), (after, 1)):
+        if sample is not None:
+            changes[sample.post_id][0] += sign * sample.reach
+            changes[sample.post_id][1] += sign
+    changes = {post_id: d for post_id, d in changes.items() if d != [0, 0]}
+    if not changes:
+        return
+    hashtag_suggest.touch(db, db.execute(select(Post.user_id).where(Post.id.in_(changes)).distinct()).scalars())
+
+    links = defaultdict(set)
+    for post_id, hashtag_id in db.execute(
+        select(PostHashtag.post_id, PostHashtag.hashtag_id).where(PostHashtag.post_id.in_(changes))
+    ):
+        links[post_id].add(hashtag_id)
+    groups_of = _groups_of_tags(db, {h for tags in links.values() for h in tags})
+
+    hashtag_deltas, group_deltas = _new_deltas(), _new_deltas()
+    for post_id, (reach, samples) in changes.items():
+        tags = links.get(post_id, set())
+        for hashtag_id in tags:
+            hashtag_deltas[hashtag_id][1] += reach
+            hashtag_deltas[hashtag_id][2] += samples
+        for group_id in set().union(*(groups_of[h] for h in tags)):
+            group_deltas[group_id][1] += reach
+            group_deltas[group_id][2] += samples
+    _apply(db, Hashtag, hashtag_deltas)
+    _apply(db, HashtagGroup, group_deltas)
+
+
+# -- full recomputation ----------------------------------------------------
+
+def _store_totals(db: Session, model, totals: Dict[int, Tuple[int, int, int]], ids: List[int]):
+    """Overwrite stats for ``ids``; ids missing from ``totals`` are reset to zero."""
+    rows = []
+    for target_id in ids:
+        usage, reach, samples = totals.get(target_id, (0, 0, 0))
+        average = reach / samples if samples else 0
+        rows.append({
+            "target_id": target_id, "usage": usage, "reach": reach, "samples": samples,
+            "average": average if model is Hashtag else int(average),
+        })
+    if rows:
+        table = model.__table__
+        db.execute(
+            update(table).where(table.c.id == bindparam("target_id")).values(
+                usage_count=bindparam("usage"), reach_total=bindparam("reach"),
+                reach_samples=bindparam("samples"), avg_reach=bindparam("average"),
+            ),
+            rows,
+        )
+
+
+def _post_totals_subquery():
+    return (
+        select(
+            PostMetric.post_id,
+            func.coalesce(func.sum(PostMetric.reach), 0).label("reach"),
+            func.count(PostMetric.id).label("samples"),
+        )
+        .group_by(PostMetric.post_id)
+        .subquery()
+    )
+
+
+def recompute_groups(db: Session, group_ids: Iterable[int]):
+    """Recompute groups from their current tags (after the tag list changed)."""
+    group_ids = list(group_ids)
+    if not group_ids:
+        return
+    group_posts = (
+        select(HashtagGroupTag.group_id, PostHashtag.post_id)
+        .join(PostHashtag, PostHashtag.hashtag_id == HashtagGroupTag.hashtag_id)
+        .where(HashtagGroupTag.group_id.in_(group_ids))
+        .distinct()
+        .subquery()
+    )
+    post_totals = _post_totals_subquery()
+    totals = {
+        group_id: (usage, int(reach), int(samples))
+        for group_id, usage, reach, samples in db.execute(
+            select(
+                group_posts.c.group_id,
+                func.count(group_posts.c.post_id),
+                func.coalesce(func.sum(post_totals.c.reach), 0),
+                func.coalesce(func.sum(post_totals.c.samples), 0),
+            )
+            .outerjoin(post_totals, post_totals.c.post_id == group_posts.c.post_id)
+            .group_by(group_posts.c.group_id)
+        )
+    }
+    _store_totals(db, HashtagGroup, totals, group_ids)
+
+
+def rebuild(db: Session, user_id: Optional[str] = None) -> Tuple[int, int]:
+    """Recompute every hashtag and group (of one tenant, or all). Caller commits."""
+    hashtags = select(Hashtag.id)
+    groups = select(HashtagGroup.id)
+    if user_id is not None:
+        hashtags = hashtags.where(Hashtag.user_id == user_id)
+        groups = groups.where(HashtagGroup.user_id == user_id)
+    hashtag_ids = db.execute(hashtags).scalars().all()
+    group_ids = db.execute(groups).scalars().all()
+
+    post_totals = _post_totals_subquery()
+    query = (
+        select(
+            PostHashtag.hashtag_id,
+            func.count(PostHashtag.post_id),
+            func.coalesce(func.sum(post_totals.c.reach), 0),
+            func.coalesce(func.sum(post_totals.c.samples), 0),
+        )
+        .outerjoin(post_totals, post_totals.c.post_id == PostHashtag.post_id)
+        .group_by(PostHashtag.hashtag_id)
+    )
+    if user_id is not None:
+        query = query.where(PostHashtag.hashtag_id.in_(hashtags))
+    totals = {hashtag_id: (usage, int(reach), int(samples)) for hashtag_id, usage, reach, samples in db.execute(query)}
+    _store_totals(db, Hashtag, totals, hashtag_ids)
+    for start in range(0, len(group_ids), REBUILD_BATCH):
+        recompute_groups(db, group_ids[start:start + REBUILD_BATCH])
+    if user_id is not None:
+        hashtag_suggest.touch(db, [user_id])
+    else:
+        hashtag_suggest.suggester.clear()
+    return len(hashtag_ids), len(group_ids)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.hashtag_metrics")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--user-id", default=None, help="only this tenant (default: all)")
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        hashtags, groups = rebuild(db, args.user_id)
+        db.commit()
+    print(f"Rebuilt stats for {hashtags} hashtag(s) and {groups} group(s)")
+
+
+if __name__ == "__main__":
+    main()
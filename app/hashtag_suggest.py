@@ -0,0 +1,165 @@
+"""In-memory hashtag autocomplete, one sorted-array index per tenant.
+
+A tenant's index is loaded from ``hashtags`` (which already covers tags from
+posts and hashtag groups, with usage and reach maintained by
+app/hashtag_metrics.py) the first time they type, then answered from memory:
+two binary searches find the tags that start with the prefix and the best
+``limit`` of them by (usage, reach) are returned. Results for short, busy
+prefixes are memoized per index.
+
+Indexes are kept in an LRU bounded by tenant count and total tags, so cold
+tenants are evicted. A commit that changed a tenant's hashtags drops that
+tenant's index (see ``touch``) and the next keystroke reloads it; a TTL
+bounds staleness for writes made by other processes.
+"""
+import bisect
+import heapq
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.models import Hashtag
+
+MAX_TENANTS = int(os.environ.get("HASHTAG_SUGGEST_MAX_TENANTS", 1000))
+MAX_ENTRIES = int(os.environ.get("HASHTAG_SUGGEST_MAX_ENTRIES", 500_000))
+TTL_SECONDS = float(os.environ.get("HASHTAG_SUGGEST_TTL_SECONDS", 300))
+# Prefix ranges wider than this are memoized instead of re-ranked per keystroke
+MEMO_MIN_RANGE = 256
+MEMO_SIZE = 512
+
+
+@dataclass
+class Suggestion:
+    tag: str
+    usage_count: int
+    avg_reach: float
+
+
+class TenantIndex:
+    def __init__(self, rows: Iterable[Tuple[str, int, float]]):
+        rows = sorted(rows)
+        self.tags = [tag for tag, _, _ in rows]
+        self.ranks = [(usage or 0, reach or 0.0) for _, usage, reach in rows]
+        self.loaded_at = time.monotonic()
+        self._memo = {}
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def suggest(self, prefix: str, limit: int) -> List[Suggestion]:
+        lo = bisect.bisect_left(self.tags, prefix)
+        hi = bisect.bisect_left(self.tags, prefix + "\U0010ffff", lo)
+        memoize = hi - lo > MEMO_MIN_RANGE
+        if memoize:
+            cached = self._memo.get((prefix, limit))
+            if cached is not None:
+                return cached
+        best = heapq.nlargest(limit, range(lo, hi), key=self.ranks.__getitem__)
+        result = [Suggestion(self.tags[i], *self.ranks[i]) for i in best]
+        if memoize:
+            if len(self._memo) >= MEMO_SIZE:
+                self._memo.clear()
+            self._memo[(prefix, limit)] = result
+        return result
+
+
+class HashtagSuggester:
+    def __init__(self, max_tenants: int = MAX_TENANTS, max_entries: int = MAX_ENTRIES,
+                 ttl_seconds: float = TTL_SECONDS):
+        self.max_tenants = max_tenants
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._indexes: "OrderedDict[str, TenantIndex]" = OrderedDict()
+        self._entries = 0
+        # Bumped on invalidation so a load that raced with a commit is not cached
+        self._versions = defaultdict(int)
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def _load(self, db: Session, user_id: str) -> TenantIndex:
+        rows = db.execute(
+            select(Hashtag.tag, Hashtag.usage_count, Hashtag.avg_reach).where(Hashtag.user_id == user_id)
+        ).all()
+        return TenantIndex(rows)
+
+    def index_for(self, db: Session, user_id: str) -> TenantIndex:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and time.monotonic() - index.loaded_at < self.ttl_seconds:
+                self._indexes.move_to_end(user_id)
+                return index
+            version = self._versions[user_id]
+        index = self._load(db, user_id)
+        with self._lock:
+            if self._versions[user_id] != version:
+                return index
+            self._discard(user_id)
+            self._indexes[user_id] = index
+            self._entries += len(index)
+            self.loads += 1
+            # Evict least recently used tenants, always keeping the one just loaded
+            while len(self._indexes) > 1 and (
+                len(self._indexes) > self.max_tenants or self._entries > self.max_entries
+            ):
+                cold, _ = next(iter(self._indexes.items()))
+                self._discard(cold)
+                self.evictions += 1
+        return index
+
+    def _discard(self, user_id: str):
+        index = self._indexes.pop(user_id, None)
+        if index is not None:
+            self._entries -= len(index)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._versions[user_id] += 1
+            self._discard(user_id)
+
+    def clear(self):
+        with self._lock:
+            for user_id in self._indexes:
+                self._versions[user_id] += 1
+            self._indexes.clear()
+            self._entries = 0
+
+    def suggest(self, db: Session, user_id: str, prefix: str, limit: int = 10) -> List[Suggestion]:
+        prefix = prefix.strip().lstrip("#").lower()
+        return self.index_for(db, user_id).suggest(prefix, limit)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tenants": len(self._indexes),
+                "entries": self._entries,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+suggester = HashtagSuggester()
+
+_DIRTY_KEY = "hashtag_suggest_dirty"
+
+
+def touch(db: Session, user_ids: Iterable[Optional[str]]):
+    """Drop these tenants' indexes once ``db`` commits (nothing happens on rollback)."""
+    db.info.setdefault(_DIRTY_KEY, set()).update(u for u in user_ids if u is not None)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    for user_id in session.info.pop(_DIRTY_KEY, ()):
+        suggester.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session):
+    session.info.pop(_DIRTY_KEY, None)
@@ -0,0 +1,230 @@
+"""Normalized hashtag and media rows derived from the free-text columns.
+
+``Post.hashtags``, ``Post.media_urls`` and ``HashtagGroup.hashtags`` stay the
+editable source of truth (comma/space separated text or a JSON list). On
+every write they are parsed once into ``hashtags`` / ``post_hashtags`` /
+``post_media`` / ``hashtag_group_tags``, so "posts using #X" and per-hashtag
+aggregates over ``PostMetric`` are indexed joins instead of a Python scan
+over every post. Inline ``#tags`` in a post's content count as uses too.
+"""
+import json
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, desc, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app import hashtag_graph, hashtag_metrics, hashtag_suggest
+from app.models import Hashtag, HashtagGroup, HashtagGroupTag, Post, PostHashtag, PostMedia, PostMetric
+
+MAX_TAG_LENGTH = 100
+
+_TAG_RE = re.compile(r"#?(\w+)", re.UNICODE)
+_INLINE_TAG_RE = re.compile(r"#(\w+)", re.UNICODE)
+
+
+@dataclass
+class HashtagStats:
+    tag: str
+    posts: int
+    total_reach: int
+    avg_reach: float
+    avg_engagement_rate: float
+
+
+def _split(text: Optional[str]) -> List[str]:
+    """Items of a JSON list or of comma/whitespace separated text."""
+    if not text:
+        return []
+    text = text.strip()
+    if text.startswith("["):
+        try:
+            items = json.loads(text)
+            if isinstance(items, list):
+                return [str(item) for item in items]
+        except ValueError:
+            pass
+    return [item for item in re.split(r"[,\s]+", text) if item]
+
+
+def normalize_tag(tag: str) -> Optional[str]:
+    match = _TAG_RE.search(tag)
+    return match.group(1).lower()[:MAX_TAG_LENGTH] if match else None
+
+
+def parse_hashtags(hashtags: Optional[str], content: Optional[str] = None) -> List[str]:
+    """Distinct normalized tags, in first-seen order."""
+    tags = [normalize_tag(item) for item in _split(hashtags)]
+    if content:
+        tags.extend(t.lower()[:MAX_TAG_LENGTH] for t in _INLINE_TAG_RE.findall(content))
+    return list(dict.fromkeys(t for t in tags if t))
+
+
+def parse_media_urls(media_urls: Optional[str]) -> List[str]:
+    return list(dict.fromkeys(url for url in _split(media_urls) if "://" in url))
+
+
+def _insert_ignoring_conflicts(db: Session, table, rows: List[dict]):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(table).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(table).on_conflict_do_nothing()
+    else:
+        stmt = insert(table)
+    db.execute(stmt, rows)
+
+
+def hashtag_ids(db: Session, user_id: str, tags: Iterable[str]) -> Dict[str, int]:
+    """Ids for ``tags`` of one tenant, creating the missing ones."""
+    tags = set(tags)
+    if not tags:
+        return {}
+    query = select(Hashtag.tag, Hashtag.id).where(Hashtag.user_id == user_id, Hashtag.tag.in_(tags))
+    ids = dict(db.execute(query).all())
+    missing = tags - ids.keys()
+    if missing:
+        # Concurrent writers may create the same tag; the unique constraint keeps one
+        _insert_ignoring_conflicts(db, Hashtag.__table__, [{"user_id": user_id, "tag": t} for t in missing])
+        ids.update(db.execute(query.where(Hashtag.tag.in_(missing))).all())
+    return ids
+
+
+def _link_rows(db: Session, owners: List[tuple], key: str) -> List[dict]:
+    """``owners`` is ``(owner_id, user_id, tags)``; returns link rows keyed by ``key``."""
+    tags_by_user = defaultdict(set)
+    for _, user_id, tags in owners:
+        tags_by_user[user_id].update(tags)
+    ids = {user_id: hashtag_ids(db, user_id, tags) for user_id, tags in tags_by_user.items()}
+    return [
+        {key: owner_id, "hashtag_id": ids[user_id][tag]}
+        for owner_id, user_id, tags in owners
+        for tag in tags
+    ]
+
+
+def _post_links(db: Session, post_ids: List[int]) -> Dict[int, Set[int]]:
+    links = {post_id: set() for post_id in post_ids}
+    for post_id, hashtag_id in db.execute(
+        select(PostHashtag.post_id, PostHashtag.hashtag_id).where(PostHashtag.post_id.in_(post_ids))
+    ):
+        links[post_id].add(hashtag_id)
+    return links
+
+
+def _delete_post_rows(db: Session, post_ids: List[int]):
+    for model in (PostHashtag, PostMedia):
+        db.execute(delete(model).where(model.post_id.in_(post_ids)).execution_options(synchronize_session=False))
+
+
+def sync_posts(db: Session, post_ids: Iterable[int]):
+    """Rebuild the hashtag links and media rows of the given posts. Caller commits."""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    posts = db.execute(
+        select(Post.id, Post.user_id, Post.content, Post.hashtags, Post.media_urls).where(Post.id.in_(post_ids))
+    ).all()
+    old_links = _post_links(db, post_ids)
+    _delete_post_rows(db, post_ids)
+    hashtag_suggest.touch(db, {p.user_id for p in posts})
+
+    owners = [(p.id, p.user_id, parse_hashtags(p.hashtags, p.content)) for p in posts]
+    links = _link_rows(db, owners, "post_id")
+    if links:
+        db.execute(insert(PostHashtag), links)
+    media = [
+        {"post_id": p.id, "position": position, "url": url}
+        for p in posts
+        for position, url in enumerate(parse_media_urls(p.media_urls))
+    ]
+    if media:
+        db.execute(insert(PostMedia), media)
+
+    new_links = {post_id: set() for post_id in post_ids}
+    for link in links:
+        new_links[link["post_id"]].add(link["hashtag_id"])
+    changes = {pid: (old_links[pid], new_links[pid]) for pid in post_ids}
+    hashtag_metrics.posts_relinked(db, changes)
+    hashtag_graph.posts_relinked(db, changes)
+
+
+def remove_posts(db: Session, post_ids: Iterable[int]):
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    old_links = _post_links(db, post_ids)
+    _delete_post_rows(db, post_ids)
+    hashtag_suggest.touch(db, db.execute(select(Post.user_id).where(Post.id.in_(post_ids)).distinct()).scalars())
+    changes = {pid: (old_links[pid], set()) for pid in post_ids}
+    hashtag_metrics.posts_relinked(db, changes)
+    hashtag_graph.posts_relinked(db, changes)
+
+
+def sync_groups(db: Session, group_ids: Iterable[int]):
+    """Rebuild the tag links of the given hashtag groups. Caller commits."""
+    group_ids = list(group_ids)
+    if not group_ids:
+        return
+    groups = db.execute(
+        select(HashtagGroup.id, HashtagGroup.user_id, HashtagGroup.hashtags).where(HashtagGroup.id.in_(group_ids))
+    ).all()
+    remove_groups(db, group_ids)
+    hashtag_suggest.touch(db, {g.user_id for g in groups})
+    links = _link_rows(db, [(g.id, g.user_id, parse_hashtags(g.hashtags)) for g in groups], "group_id")
+    if links:
+        db.execute(insert(HashtagGroupTag), links)
+    hashtag_metrics.recompute_groups(db, group_ids)
+
+
+def remove_groups(db: Session, group_ids: Iterable[int]):
+    group_ids = list(group_ids)
+    if group_ids:
+        db.execute(
+            delete(HashtagGroupTag).where(HashtagGroupTag.group_id.in_(group_ids))
+            .execution_options(synchronize_session=False)
+        )
+
+
+# -- queries -------------------------------------------------------------
+
+def posts_with_tag(db: Session, user_id: str, tag: str, limit: int = 100) -> List[Post]:
+    tag = normalize_tag(tag)
+    if not tag:
+        return []
+    return (
+        db.query(Post)
+        .join(PostHashtag, PostHashtag.post_id == Post.id)
+        .join(Hashtag, Hashtag.id == PostHashtag.hashtag_id)
+        .filter(Hashtag.user_id == user_id, Hashtag.tag == tag)
+        .order_by(Post.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def hashtag_stats(db: Session, user_id: str, sort: str = "reach", limit: int = 50,
+                  tags: Optional[Iterable[str]] = None) -> List[HashtagStats]:
+    """Per-hashtag post counts and reach/engagement over the posts' metrics."""
+    posts = func.count(func.distinct(PostHashtag.post_id))
+    total_reach = func.coalesce(func.sum(PostMetric.reach), 0)
+    avg_reach = func.coalesce(func.avg(PostMetric.reach), 0)
+    avg_engagement = func.coalesce(func.avg(PostMetric.engagement_rate), 0)
+    query = (
+        select(Hashtag.tag, posts, total_reach, avg_reach, avg_engagement)
+        .join(PostHashtag, PostHashtag.hashtag_id == Hashtag.id)
+        .outerjoin(PostMetric, PostMetric.post_id == PostHashtag.post_id)
+        .where(Hashtag.user_id == user_id)
+        .group_by(Hashtag.id, Hashtag.tag)
+    )
+    if tags is not None:
+        query = query.where(Hashtag.tag.in_([t for t in map(normalize_tag, tags) if t]))
+    order = {"reach": total_reach, "posts": posts, "engagement": avg_engagement}.get(sort, total_reach)
+    query = query.order_by(desc(order), Hashtag.tag).limit(limit)
+    return [
+        HashtagStats(tag, count, int(reach), round(float(avg), 1), round(float(engagement), 2))
+        for tag, count, reach, avg, engagement in db.execute(query)
+    ]
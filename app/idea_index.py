@@ -0,0 +1,500 @@
+"""Local TF-IDF vector index of AI content ideas, one per tenant.
+
+Each idea's title and content become a sparse vector of hashed word and
+word-pair features (the hashing trick, so there is no vocabulary to train or
+ship and no network call). Similarity is the cosine of sublinear TF-IDF
+weights, with document frequencies kept per tenant and updated as ideas are
+added, so rare words count for more than "post" or "tips".
+
+Lookups are approximate nearest neighbour via random-hyperplane LSH: every
+feature hash also picks a sign for ``TABLES * BITS_PER_TABLE`` hyperplanes,
+a document's signature is the sign of its projection on each, and each of
+the ``TABLES`` tables buckets documents by ``BITS_PER_TABLE`` of those bits.
+A query only scores the documents sharing a bucket in some table, then ranks
+them by exact TF-IDF cosine. Tenants with at most ``EXACT_MAX_DOCS`` ideas
+are simply scanned.
+
+Indexes live in memory in an LRU of tenants and are persisted as an
+append-only log per tenant under ``IDEA_INDEX_DIR``, shared by every worker
+process (under an flock) and compacted when it is mostly superseded records;
+each process applies the records others append. ``ai_content_ideas`` stays
+the source of truth. Ideas added, edited or deleted by the app are re-read by
+every process once the change commits (``touch`` logs them as stale), so an
+insert that commits after one with a higher id is not missed. On use, an
+index also catches up on ideas with a higher id than it has seen, which
+covers rows written some other way, and ``python -m app.idea_index rebuild``
+starts over.
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.models import AIContentIdea
+
+INDEX_DIR = os.environ.get("IDEA_INDEX_DIR", os.path.join(tempfile.gettempdir(), "social-pro-idea-index"))
+MAX_TENANTS = int(os.environ.get("IDEA_INDEX_MAX_TENANTS", 200))
+TTL_SECONDS = float(os.environ.get("IDEA_INDEX_TTL_SECONDS", 600))
+# Ideas at least this similar to a saved one (or each other) are not saved again
+DEDUPE_THRESHOLD = float(os.environ.get("IDEA_DEDUPE_THRESHOLD", 0.85))
+DEFAULT_MIN_SIMILARITY = 0.2
+
+FEATURE_BITS = 24
+TABLES = 16
+BITS_PER_TABLE = 6
+EXACT_MAX_DOCS = 1000
+# Compact the log once it holds this many times more records than live ideas
+COMPACT_RATIO = 2
+
+_WORD_RE = re.compile(r"[#@]?\w+", re.UNICODE)
+_URL_RE = re.compile(r"https?://\S+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or our so that the this to was we "
+    "what with you your".split()
+)
+
+
+@dataclass
+class SimilarIdea:
+    idea_id: int
+    similarity: float
+
+
+PLANES = TABLES * BITS_PER_TABLE
+# As in app/similarity.py, per-plane weight sums are accumulated in one big int
+# with a LANE-bit lane per hyperplane; weights are fixed point with WEIGHT_SCALE.
+LANE = 32
+_LANE_MASK = (1 << LANE) - 1
+WEIGHT_SCALE = 16
+
+
+@lru_cache(maxsize=65536)
+def _hash_feature(feature: str) -> Tuple[int, int]:
+    """(feature id, hyperplanes on whose positive side the feature lies, one lane each)."""
+    digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=16).digest(), "little")
+    planes = digest >> 32
+    spread = sum(1 << (LANE * i) for i in range(PLANES) if (planes >> i) & 1)
+    return digest & ((1 << FEATURE_BITS) - 1), spread
+
+
+def idea_text(title: Optional[str], content: Optional[str]) -> str:
+    return f"{title or ''}\n{content or ''}"
+
+
+def _grams(text: str) -> Counter:
+    words = [w for w in _WORD_RE.findall(_URL_RE.sub(" ", text.lower())) if w not in _STOPWORDS]
+    grams = Counter(words)
+    grams.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return grams
+
+
+def vectorize(text: str) -> Tuple[Dict[int, int], List[int]]:
+    """Hashed unigram/bigram counts of ``text`` and its LSH bucket in each table.
+
+    The buckets are the signs of the TF-weighted random projections; they
+    leave out IDF so that a document's buckets never change as others are
+    added.
+    """
+    counts: Dict[int, int] = {}
+    positive = 0
+    total = 0
+    for gram, tf in _grams(text).items():
+        feature_id, spread = _hash_feature(gram)
+        counts[feature_id] = counts.get(feature_id, 0) + tf
+        weight = round(WEIGHT_SCALE * (1 + math.log(tf)))
+        positive += weight * spread
+        total += weight
+    sig = []
+    for t in range(TABLES):
+        bucket = 0
+        for b in range(BITS_PER_TABLE):
+            # The projection is positive when more than half the weight is on the positive side
+            if 2 * ((positive >> (LANE * (t * BITS_PER_TABLE + b))) & _LANE_MASK) > total:
+                bucket |= 1 << b
+        sig.append(bucket)
+    return counts, sig
+
+
+class TenantIndex:
+    def __init__(self):
+        # Guards this tenant's index while it is loaded, caught up or queried
+        self.lock = threading.RLock()
+        self.loaded_at = time.monotonic()
+        self.reset()
+
+    def reset(self):
+        self.docs: Dict[int, Tuple[Dict[int, int], List[int]]] = {}
+        self.df: Counter = Counter()
+        self.buckets = [defaultdict(set) for _ in range(TABLES)]
+        self.max_id = 0
+        self.stale: Set[int] = set()  # ideas to re-read from the database
+        self.records = 0  # log lines, live or superseded
+        # How much of which log file has been applied (inode, bytes)
+        self.log_inode: Optional[int] = None
+        self.log_offset = 0
+        # Document norms under the IDF of the time; refreshed once the index grows or shrinks by 10%
+        self._norms: Dict[int, float] = {}
+        self._norms_size = 0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, idea_id: int, counts: Dict[int, int], sig: List[int]):
+        self.remove(idea_id)
+        self.docs[idea_id] = (counts, sig)
+        self.df.update(counts.keys())
+        self._norms.pop(idea_id, None)
+        for table, bucket in zip(self.buckets, sig):
+            table[bucket].add(idea_id)
+        self.max_id = max(self.max_id, idea_id)
+
+    def remove(self, idea_id: int) -> bool:
+        doc = self.docs.pop(idea_id, None)
+        if doc is None:
+            return False
+        counts, sig = doc
+        for feature in counts:
+            self.df[feature] -= 1
+            if self.df[feature] <= 0:
+                del self.df[feature]
+        for table, bucket in zip(self.buckets, sig):
+            table[bucket].discard(idea_id)
+            if not table[bucket]:
+                del table[bucket]
+        return True
+
+    def _idf(self, feature: int) -> float:
+        return math.log((len(self.docs) + 1) / (self.df.get(feature, 0) + 1)) + 1
+
+    def _norm(self, idea_id: int) -> float:
+        norm = self._norms.get(idea_id)
+        if norm is None:
+            counts = self.docs[idea_id][0]
+            norm = self._norms[idea_id] = math.sqrt(
+                sum(((1 + math.log(tf)) * self._idf(f)) ** 2 for f, tf in counts.items())
+            )
+        return norm
+
+    def candidates(self, sig: List[int]) -> Set[int]:
+        if len(self.docs) <= EXACT_MAX_DOCS:
+            return set(self.docs)
+        found = set()
+        for table, bucket in zip(self.buckets, sig):
+            found |= table.get(bucket, set())
+        return found
+
+    def query(self, counts: Dict[int, int], sig: List[int], limit: int, min_similarity: float,
+              exclude: Iterable[int] = ()) -> List[SimilarIdea]:
+        if abs(len(self.docs) - self._norms_size) > max(10, self._norms_size // 10):
+            self._norms.clear()
+            self._norms_size = len(self.docs)
+        idf = {f: self._idf(f) for f in counts}
+        query = {f: (1 + math.log(tf)) * idf[f] for f, tf in counts.items()}
+        query_norm = math.sqrt(sum(w * w for w in query.values()))
+        if not query_norm:
+            return []
+        exclude = set(exclude)
+        matches = []
+        for idea_id in self.candidates(sig) - exclude:
+            doc = self.docs[idea_id][0]
+            dot = 0.0
+            for f, w in query.items():
+                tf = doc.get(f)
+                if tf:
+                    dot += w * (1 + math.log(tf)) * idf[f]
+            if not dot:
+                continue
+            score = dot / (query_norm * self._norm(idea_id))
+            if score >= min_similarity:
+                matches.append(SimilarIdea(idea_id, round(min(score, 1.0), 3)))
+        matches.sort(key=lambda m: (-m.similarity, -m.idea_id))
+        return matches[:limit]
+
+
+class IdeaIndexes:
+    def __init__(self, index_dir: str = INDEX_DIR, max_tenants: int = MAX_TENANTS, ttl_seconds: float = TTL_SECONDS):
+        self.index_dir = index_dir
+        self.max_tenants = max_tenants
+        self.ttl_seconds = ttl_seconds
+        self._indexes: "OrderedDict[str, TenantIndex]" = OrderedDict()
+        # Guards the LRU and the counters only; each index has its own lock
+        # for disk and database work, so one tenant's cold load does not hold up the others
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    # -- persistence --------------------------------------------------------
+    #
+    # Every worker process appends to and reads the same per-tenant log, so the
+    # log is the channel between them: each process applies what others have
+    # appended since its last read (re-reading it all when the file has been
+    # compacted or removed). Records are an idea's vector, its removal, or a
+    # marker that it changed and must be re-read from the database. Appends,
+    # reads and compaction hold an flock on a lock file next to the log; a
+    # separate file, as compaction replaces the log itself.
+
+    def _path(self, user_id: str) -> str:
+        return os.path.join(self.index_dir, str(user_id).encode().hex() + ".jsonl")
+
+    @contextmanager
+    def _locked(self, user_id: str, exclusive: bool):
+        os.makedirs(self.index_dir, exist_ok=True)
+        with open(f"{self._path(user_id)}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _apply(index: TenantIndex, record: dict):
+        index.records += 1
+        if "f" in record:
+            index.add(record["id"], {f: tf for f, tf in record["f"]}, record["s"])
+            index.stale.discard(record["id"])
+        elif record.get("stale"):
+            index.stale.add(record["id"])
+        else:
+            index.remove(record["id"])
+            index.stale.discard(record["id"])
+
+    def _replay(self, user_id: str, index: TenantIndex):
+        """Apply log records appended since ``index`` last read the log. Hold ``_locked``."""
+        try:
+            st = os.stat(self._path(user_id))
+        except FileNotFoundError:
+            if index.log_inode is not None:
+                index.reset()  # rebuilt elsewhere; the database catch-up starts over
+            return
+        if st.st_ino != index.log_inode or st.st_size < index.log_offset:
+            index.reset()
+            index.log_inode = st.st_ino
+        if st.st_size == index.log_offset:
+            return
+        with open(self._path(user_id), "rb") as f:
+            f.seek(index.log_offset)
+            data = f.read()
+        # Only whole lines; a line cut short by a crash is skipped once the next append ends it
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # the DB catch-up re-adds whatever it held
+            self._apply(index, record)
+        index.log_offset += end
+
+    def _catch_up(self, user_id: str, index: TenantIndex):
+        try:
+            st = os.stat(self._path(user_id))
+            if st.st_ino == index.log_inode and st.st_size == index.log_offset:
+                return
+        except FileNotFoundError:
+            if index.log_inode is None:
+                return
+        with self._locked(user_id, exclusive=False):
+            self._replay(user_id, index)
+
+    def _append(self, user_id: str, index: Optional[TenantIndex], records: List[dict]):
+        """Append ``records`` to the log and apply them to ``index`` (if loaded), after others' records."""
+        if not records:
+            return
+        path = self._path(user_id)
+        with self._locked(user_id, exclusive=True):
+            if index is not None:
+                self._replay(user_id, index)
+            with open(path, "ab") as f:
+                if f.tell() and (index is None or f.tell() != index.log_offset):
+                    with open(path, "rb") as tail:
+                        tail.seek(-1, os.SEEK_END)
+                        if tail.read(1) != b"\n":
+                            f.write(b"\n")  # end a line cut short by a crash
+                f.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode())
+            if index is None:
+                return
+            for record in records:
+                self._apply(index, record)
+            st = os.stat(path)
+            index.log_inode, index.log_offset = st.st_ino, st.st_size
+            if index.records > COMPACT_RATIO * max(len(index), 100):
+                self._compact(user_id, index)
+
+    def _compact(self, user_id: str, index: TenantIndex):
+        """Rewrite the log as ``index``'s live ideas. Hold ``_locked`` exclusively, with ``index`` caught up."""
+        path = self._path(user_id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for idea_id, (counts, sig) in index.docs.items():
+                f.write(json.dumps({"id": idea_id, "f": list(counts.items()), "s": sig}, separators=(",", ":")) + "\n")
+            for idea_id in index.stale:
+                f.write(json.dumps({"id": idea_id, "stale": 1}) + "\n")
+        os.replace(tmp, path)
+        st = os.stat(path)
+        index.log_inode, index.log_offset = st.st_ino, st.st_size
+        index.records = len(index) + len(index.stale)
+
+    # -- sync with ai_content_ideas -----------------------------------------
+
+    def _sync(self, db: Session, user_id: str, index: TenantIndex):
+        columns = (AIContentIdea.id, AIContentIdea.title, AIContentIdea.content)
+        new = db.execute(
+            select(*columns).where(AIContentIdea.user_id == user_id, AIContentIdea.id > index.max_id)
+            .order_by(AIContentIdea.id)
+        ).all()
+        stale, changed = set(index.stale), []
+        new = [row for row in new if row.id not in stale]
+        if stale:
+            changed = db.execute(
+                select(*columns).where(AIContentIdea.user_id == user_id, AIContentIdea.id.in_(stale))
+            ).all()
+        records = [{"id": idea_id} for idea_id in stale - {row.id for row in changed}]
+        for row in new + changed:
+            counts, sig = vectorize(idea_text(row.title, row.content))
+            records.append({"id": row.id, "f": list(counts.items()), "s": sig})
+        self._append(user_id, index, records)
+
+    def index_for(self, db: Session, user_id: str) -> TenantIndex:
+        """The tenant's index, loaded from disk if needed and caught up with the log and the database."""
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None or time.monotonic() - index.loaded_at >= self.ttl_seconds:
+                index = self._indexes[user_id] = TenantIndex()
+                self.loads += 1
+                while len(self._indexes) > self.max_tenants:
+                    self._indexes.popitem(last=False)
+                    self.evictions += 1
+            self._indexes.move_to_end(user_id)
+        with index.lock:
+            self._catch_up(user_id, index)
+            self._sync(db, user_id, index)
+        return index
+
+    def mark_stale(self, user_id: str, idea_ids: Iterable[int]):
+        """Have every process re-read these ideas from the database on its next use of the index."""
+        records = [{"id": idea_id, "stale": 1} for idea_id in dict.fromkeys(idea_ids)]
+        with self._lock:
+            index = self._indexes.get(user_id)
+        if index is None:
+            self._append(user_id, None, records)
+            return
+        with index.lock:
+            self._append(user_id, index, records)
+
+    def rebuild(self, db: Session, user_id: str) -> int:
+        with self._locked(user_id, exclusive=True):
+            try:
+                os.remove(self._path(user_id))
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._indexes.pop(user_id, None)
+        return len(self.index_for(db, user_id))
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    # -- queries --------------------------------------------------------------
+
+    def similar_to_text(self, db: Session, user_id: str, text: str, limit: int = 10,
+                        min_similarity: float = DEFAULT_MIN_SIMILARITY, exclude: Iterable[int] = ()) -> List[SimilarIdea]:
+        index = self.index_for(db, user_id)
+        with index.lock:
+            return index.query(*vectorize(text), limit, min_similarity, exclude)
+
+    def similar_to_idea(self, db: Session, idea: AIContentIdea, limit: int = 10,
+                        min_similarity: float = DEFAULT_MIN_SIMILARITY) -> List[SimilarIdea]:
+        return self.similar_to_text(db, idea.user_id, idea_text(idea.title, idea.content), limit,
+                                    min_similarity, exclude=[idea.id])
+
+    def dedupe(self, db: Session, user_id: str, ideas: List[dict],
+               threshold: float = DEDUPE_THRESHOLD) -> Tuple[List[dict], List[dict]]:
+        """Split ``ideas`` (``title``/``content`` dicts) into (new, duplicates).
+
+        An idea is a duplicate when it is at least ``threshold`` similar to one
+        of the tenant's saved ideas or to an earlier idea in the same list.
+        Duplicates are copies with ``duplicate_of`` set to the saved idea's id
+        (None for a repeat within the list).
+        """
+        index = self.index_for(db, user_id)
+        kept, duplicates, pending = [], [], TenantIndex()
+        with index.lock:
+            for n, idea in enumerate(ideas):
+                counts, sig = vectorize(idea_text(idea.get("title"), idea.get("content")))
+                match = index.query(counts, sig, 1, threshold) or pending.query(counts, sig, 1, threshold)
+                if match:
+                    duplicates.append({**idea, "duplicate_of": match[0].idea_id if match[0].idea_id > 0 else None})
+                    continue
+                # Idea ids are unknown before the insert; negative ids keep this batch apart
+                pending.add(-(n + 1), counts, sig)
+                kept.append(idea)
+        return kept, duplicates
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tenants": len(self._indexes),
+                "ideas": sum(len(index) for index in self._indexes.values()),
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+indexes = IdeaIndexes()
+
+_DIRTY_KEY = "idea_index_dirty"
+
+
+def touch(db: Session, user_id: str, idea_ids: Iterable[int]):
+    """Re-read these ideas from the database once ``db`` commits (nothing happens on rollback)."""
+    db.info.setdefault(_DIRTY_KEY, defaultdict(set))[user_id].update(idea_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed(session: Session):
+    for user_id, idea_ids in session.info.pop(_DIRTY_KEY, {}).items():
+        indexes.mark_stale(user_id, idea_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session):
+    session.info.pop(_DIRTY_KEY, None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.idea_index")
+    parser.add_argument("command", choices=["rebuild", "stats"])
+    parser.add_argument("--user", help="only this tenant (default: every tenant with ideas)")
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        user_ids = [args.user] if args.user else db.execute(select(AIContentIdea.user_id).distinct()).scalars().all()
+        for user_id in user_ids:
+            if args.command == "rebuild":
+                started = time.perf_counter()
+                count = indexes.rebuild(db, user_id)
+                print(f"{user_id}: indexed {count} ideas in {time.perf_counter() - started:.2f}s")
+            else:
+                index = indexes.index_for(db, user_id)
+                print(f"{user_id}: {len(index)} ideas, {index.records} log records")
+    print(f"Index directory: {indexes.index_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Streaming bulk import of posts from CSV or NDJSON.
+
+Rows are parsed one at a time from the uploaded file, validated and inserted
+in chunks, and each chunk is committed on its own, so memory stays flat no
+matter how large the file is. Accounts are resolved by name (or id) from a
+single lookup map built up front.
+
+Columns / keys: ``account`` (account name or id), ``content``, ``post_type``,
+``status``, ``scheduled_at`` and ``published_at`` (ISO 8601), ``hashtags``,
+``media_urls``. Published posts without ``published_at`` take their
+``scheduled_at``, else the import time; scheduled posts must be in the future,
+so an import never hands the dispatcher a backlog to publish at once.
+
+    python -m app.importer --user-id 42 posts.csv
+"""
+import argparse
+import codecs
+import csv
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import post_hooks
+from app.models import Post, SocialAccount
+
+CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000
+
+POST_TYPES = {"text", "image", "video", "carousel", "story", "reel"}
+POST_STATUSES = {"draft", "scheduled", "published"}
+
+
+class StreamError(ValueError):
+    """The CSV input cannot be read past this point (bad encoding or broken quoting)."""
+
+
+@dataclass
+class ImportReport:
+    total: int = 0
+    imported: int = 0
+    failed: int = 0
+    errors: List[dict] = field(default_factory=list)
+    # Set when reading stopped early; rows before it are imported (chunks commit as they go)
+    file_error: Optional[str] = None
+    seconds: float = 0.0
+
+    def add_error(self, row: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "file_error": self.file_error,
+            "rows_per_second": round(self.total / self.seconds) if self.seconds else None,
+        }
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or (content_type or "").endswith(("ndjson", "jsonl")):
+        return "ndjson"
+    return "csv"
+
+
+def _decoded_lines(stream: IO[bytes]) -> Iterator[str]:
+    """UTF-8 lines (a leading BOM dropped), decoded one at a time so a bad byte is pinned to its line."""
+    for number, raw in enumerate(stream):
+        if number == 0 and raw.startswith(codecs.BOM_UTF8):
+            raw = raw[len(codecs.BOM_UTF8):]
+        yield raw.decode("utf-8")
+
+
+def iter_records(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yield ``(row_number, record)`` pairs without reading the whole stream.
+
+    Records are dicts, or an error message string for lines that do not parse.
+    A CSV file that stops being readable (bad encoding, broken quoting) ends
+    with a ``StreamError`` record for the row where that happened.
+    """
+    if fmt == "ndjson":
+        for row_number, raw in enumerate(stream, start=1):
+            try:
+                line = raw.decode("utf-8-sig" if row_number == 1 else "utf-8")
+            except UnicodeDecodeError as e:
+                yield row_number, f"not valid UTF-8 ({e.reason})"
+                continue
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row_number, f"invalid JSON: {e}"
+                continue
+            yield row_number, record if isinstance(record, dict) else "expected a JSON object"
+        return
+
+    # Row numbers count the header as row 1, matching what spreadsheets show
+    row_number = 1
+    try:
+        for row_number, record in enumerate(csv.DictReader(_decoded_lines(stream)), start=2):
+            yield row_number, record
+    except UnicodeDecodeError as e:
+        yield row_number + 1, StreamError(f"not valid UTF-8 ({e.reason}); import stopped here")
+    except csv.Error as e:
+        yield row_number + 1, StreamError(f"malformed CSV ({e}); import stopped here")
+
+
+def account_lookup(db: Session, user_id: str) -> Dict[str, int]:
+    lookup = {}
+    for account_id, account_name in db.query(SocialAccount.id, SocialAccount.account_name).filter(
+        SocialAccount.user_id == user_id
+    ):
+        lookup[str(account_id)] = account_id
+        lookup[account_name.strip().lower()] = account_id
+        lookup[account_name.strip().lstrip("@").lower()] = account_id
+    return lookup
+
+
+def _clean(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _timestamp(record: dict, key: str) -> Optional[datetime]:
+    value = _clean(record.get(key))
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{key} is not ISO 8601: {value!r}")
+
+
+def validate(record: dict, user_id: str, accounts: Dict[str, int], imported_at: Optional[datetime] = None) -> dict:
+    """Map one input record to Post column values, raising ValueError on bad input."""
+    imported_at = imported_at or datetime.now()
+    account_key = _clean(record.get("account") or record.get("account_name") or record.get("account_id"))
+    if not account_key:
+        raise ValueError("account is required")
+    account_id = accounts.get(account_key.lower()) or accounts.get(account_key.lstrip("@").lower())
+    if account_id is None:
+        raise ValueError(f"unknown account {account_key!r}")
+
+    content = _clean(record.get("content"))
+    if not content:
+        raise ValueError("content is required")
+
+    post_type = (_clean(record.get("post_type")) or "text").lower()
+    if post_type not in POST_TYPES:
+        raise ValueError(f"post_type must be one of {sorted(POST_TYPES)}")
+
+    status = (_clean(record.get("status")) or "draft").lower()
+    if status not in POST_STATUSES:
+        raise ValueError(f"status must be one of {sorted(POST_STATUSES)}")
+
+    scheduled_at = _timestamp(record, "scheduled_at")
+    if status == "scheduled":
+        if scheduled_at is None:
+            raise ValueError("scheduled posts need scheduled_at")
+        if scheduled_at <= datetime.now(scheduled_at.tzinfo):
+            raise ValueError("scheduled_at is in the past; import the post as a draft or give a future time")
+
+    published_at = _timestamp(record, "published_at")
+    if status == "published":
+        published_at = published_at or scheduled_at or imported_at
+    elif published_at is not None:
+        raise ValueError("published_at is only allowed on published posts")
+
+    return {
+        "user_id": user_id,
+        "account_id": account_id,
+        "content": content,
+        "post_type": post_type,
+        "status": status,
+        "scheduled_at": scheduled_at,
+        "published_at": published_at,
+        "hashtags": _clean(record.get("hashtags")),
+        "media_urls": _clean(record.get("media_urls")),
+    }
+
+
+def _flush(db: Session, rows: List[dict]) -> List[int]:
+    post_ids = db.execute(insert(Post).returning(Post.id), rows).scalars().all()
+    post_hooks.posts_saved(db, post_ids)
+    db.commit()
+    return post_ids
+
+
+def import_posts(db: Session, user_id: str, stream: IO[bytes], fmt: str = "csv",
+                 chunk_size: int = CHUNK_SIZE) -> ImportReport:
+    started = time.perf_counter()
+    report = ImportReport()
+    accounts = account_lookup(db, user_id)
+    imported_at = datetime.now()
+    chunk: List[dict] = []
+
+    for row_number, record in iter_records(stream, fmt):
+        report.total += 1
+        if isinstance(record, StreamError):
+            report.add_error(row_number, str(record))
+            report.file_error = str(record)
+            break
+        if isinstance(record, str):
+            report.add_error(row_number, record)
+            continue
+        try:
+            chunk.append(validate(record, user_id, accounts, imported_at))
+        except ValueError as e:
+            report.add_error(row_number, str(e))
+            continue
+        if len(chunk) >= chunk_size:
+            report.imported += len(_flush(db, chunk))
+            chunk = []
+
+    if chunk:
+        report.imported += len(_flush(db, chunk))
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.importer")
+    parser.add_argument("path", help="CSV or NDJSON file ('-' for stdin)")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default=None)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+
+    fmt = args.format or detect_format(args.path)
+    stream = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    with stream, SessionLocal() as db:
+        report = import_posts(db, args.user_id, stream, fmt, chunk_size=args.chunk_size)
+    print(json.dumps(report.as_dict(), indent=2))
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
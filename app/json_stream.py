@@ -0,0 +1,66 @@
+"""Incremental parsing of a JSON array that arrives in chunks.
+
+Model answers like the idea generator's ``[{"title": ..., "content": ...}, ...]``
+are streamed a few tokens at a time. ``JSONArrayStream`` scans each chunk
+once, tracking string/escape state and nesting depth, and hands back every
+top-level element as soon as its closing brace (or delimiter) has arrived,
+so the first idea can be shown long before the array is complete. Text
+before the opening ``[`` (a markdown fence, say) is skipped.
+"""
+import json
+from typing import Any, List
+
+
+class JSONArrayStream:
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._depth = 0  # nesting inside the top-level array; 0 = between elements
+        self._in_string = False
+        self._escaped = False
+        self._element = []
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume ``chunk``; return the elements it completed, parsed."""
+        elements = []
+        for ch in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                self._started = ch == "["
+                continue
+            if self._in_string:
+                self._element.append(ch)
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if self._depth == 0 and ch in ",]":
+                self._emit(elements)
+                self._finished = ch == "]"
+                continue
+            if ch.isspace() and self._depth == 0 and not self._element:
+                continue
+            self._element.append(ch)
+            if ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(elements)
+        return elements
+
+    def _emit(self, elements: List[Any]):
+        text = "".join(self._element).strip()
+        self._element = []
+        if text:
+            elements.append(json.loads(text))
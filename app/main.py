@@ -1,9 +1,13 @@
-from fastapi import FastAPI, Depends, Request
+import hmac
+import os
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse
+from app.ai_metrics import metrics as ai_metrics
 from app.database import engine, Base, get_db
+from app.subscription_cache import cache as subscription_cache
 import app.routes as routes_module
-from app.routes import dashboard, posts, calendar, accounts, analytics, ai_studio, hashtags, billing, api
+from app.routes import dashboard, posts, calendar, accounts, analytics, ai_studio, hashtags, billing, search, api
 # Start imports for viv-auth and viv-pay
 from viv_auth import init_auth
 from viv_pay import init_pay
@@ -19,6 +23,15 @@ def health_check():
 def api_health_check():
     return {"status": "ok"}
 
+# Prometheus scrape endpoint for model-call metrics (app/ai_metrics.py), including
+# every tenant's cost, so it only exists when METRICS_TOKEN is set and needs it as a bearer token
+@app.get("/metrics")
+def metrics_export(request: Request):
+    token = os.environ.get("METRICS_TOKEN")
+    if not token or not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}"):
+        raise HTTPException(status_code=404)
+    return PlainTextResponse(ai_metrics.prometheus(), media_type="text/plain; version=0.0.4")
+
 # Initialize Auth
 User, require_auth = init_auth(app, engine, Base, get_db, app_name="Social Pro")
 
@@ -28,8 +41,9 @@ create_checkout, get_customer, require_subscription = init_pay(app, engine, Base
 # Wrapper: chain auth -> subscription check so require_subscription gets user_id
 # viv-auth uses encrypted session cookie (viv_session), not a user_id cookie,
 # so require_subscription can't find user_id on its own.
+# The outcome is cached per user for a short TTL (app/subscription_cache.py).
 async def require_active_subscription(request: Request, user=Depends(require_auth)):
-    return await require_subscription(request, user_id=user.id)
+    return await subscription_cache.check(user.id, lambda: require_subscription(request, user_id=user.id))
 
 # Inject dependencies into routes module
 routes_module.User = User
@@ -54,13 +68,35 @@ app.include_router(analytics.router)
 app.include_router(ai_studio.router)
 app.include_router(hashtags.router)
 app.include_router(billing.router)
+app.include_router(search.router)
 app.include_router(api.router, prefix="/api/v1", tags=["api"])
 
 # Startup event
 @app.on_event("startup")
 def startup_event():
-    # Ensure all tables are created
-    # This includes User (from viv-auth), Billing tables (from viv-pay), and models (from app.models)
-    # We must import app.models so models are registered in Base
-    import app.models
-    Base.metadata.create_all(bind=engine)
+    # Schema is managed by versioned scripts in app/migrations (including the
+    # viv-auth and viv-pay tables). At boot this is a single version lookup;
+    # pending migrations are applied here only when AUTO_MIGRATE is enabled.
+    from app import migrations
+    migrations.ensure_schema(engine)
+
+    # Scheduled-post dispatcher normally runs as its own process
+    # (python -m app.dispatcher); DISPATCHER_ENABLED=1 runs it in this worker.
+    if os.environ.get("DISPATCHER_ENABLED") == "1":
+        from app.dispatcher import start_in_background
+        app.state.dispatcher = start_in_background()
+
+    # Background AI jobs (/api/ai/jobs) normally run in their own process
+    # (python -m app.ai_jobs); AI_JOB_WORKER=1 runs the worker in this one.
+    if os.environ.get("AI_JOB_WORKER") == "1":
+        from app import ai_jobs
+        app.state.ai_job_worker = ai_jobs.start_in_background()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    dispatcher = getattr(app.state, "dispatcher", None)
+    if dispatcher is not None:
+        dispatcher.stop()
+    ai_job_worker = getattr(app.state, "ai_job_worker", None)
+    if ai_job_worker is not None:
+        ai_job_worker.stop()
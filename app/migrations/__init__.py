@@ -0,0 +1,167 @@
+"""Versioned schema migrations.
+
+Each script in ``app/migrations/versions`` is named ``NNNN_description.py`` and
+defines ``upgrade(conn)``. Applied versions are recorded in the
+``schema_version`` table, so a worker booting against an up-to-date database
+only pays for a single ``SELECT MAX(version)``.
+
+Scripts that build indexes on large tables can set ``TRANSACTIONAL = False``;
+they then run on an autocommit connection so Postgres can use
+``CREATE INDEX CONCURRENTLY``.
+
+Run pending migrations offline with::
+
+    python -m app.migrations upgrade
+"""
+import fcntl
+import importlib
+import logging
+import os
+import pkgutil
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from types import ModuleType
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+VERSION_TABLE = "schema_version"
+# Arbitrary constant shared by every worker for pg_advisory_lock
+ADVISORY_LOCK_ID = 7240531
+
+_VERSIONS_PACKAGE = "app.migrations.versions"
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    module: ModuleType
+
+    @property
+    def transactional(self) -> bool:
+        return getattr(self.module, "TRANSACTIONAL", True)
+
+
+@lru_cache(maxsize=None)
+def discover() -> Tuple[Migration, ...]:
+    package = importlib.import_module(_VERSIONS_PACKAGE)
+    migrations = []
+    for info in pkgutil.iter_modules(package.__path__):
+        prefix, _, name = info.name.partition("_")
+        if not prefix.isdigit():
+            continue
+        module = importlib.import_module(f"{_VERSIONS_PACKAGE}.{info.name}")
+        migrations.append(Migration(int(prefix), name, module))
+    migrations.sort(key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {_VERSIONS_PACKAGE}: {versions}")
+    return tuple(migrations)
+
+
+def head_version() -> int:
+    migrations = discover()
+    return migrations[-1].version if migrations else 0
+
+
+def current_version(engine: Engine) -> int:
+    """Return the highest applied version, or 0 for an unmanaged database."""
+    with engine.connect() as conn:
+        try:
+            version = conn.execute(text(f"SELECT MAX(version) FROM {VERSION_TABLE}")).scalar()
+        except DBAPIError:
+            conn.rollback()
+            return 0
+    return version or 0
+
+
+def _ensure_version_table(engine: Engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR(200) NOT NULL, "
+            "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        ))
+
+
+@contextmanager
+def _migration_lock(engine: Engine):
+    """Serialize migrations across workers sharing the same database."""
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+            conn.commit()
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": ADVISORY_LOCK_ID})
+                conn.commit()
+    elif engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+        with open(f"{engine.url.database}.migrate.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        yield
+
+
+def _apply(engine: Engine, migration: Migration):
+    logger.info("Applying migration %04d_%s", migration.version, migration.name)
+    record = text(f"INSERT INTO {VERSION_TABLE} (version, name) VALUES (:version, :name)")
+    params = {"version": migration.version, "name": migration.name}
+    if migration.transactional:
+        with engine.begin() as conn:
+            migration.module.upgrade(conn)
+            conn.execute(record, params)
+    else:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            migration.module.upgrade(conn)
+            conn.execute(record, params)
+
+
+def upgrade(engine: Engine, target: Optional[int] = None) -> List[Migration]:
+    """Apply every pending migration up to ``target`` (default: head)."""
+    with _migration_lock(engine):
+        _ensure_version_table(engine)
+        # Re-read under the lock: another worker may have migrated meanwhile
+        current = current_version(engine)
+        pending = [
+            m for m in discover()
+            if m.version > current and (target is None or m.version <= target)
+        ]
+        for migration in pending:
+            _apply(engine, migration)
+    return pending
+
+
+def ensure_schema(engine: Engine, auto_upgrade: Optional[bool] = None):
+    """Startup check: a no-op when the database is already at head.
+
+    When the schema is behind, pending migrations are applied only if
+    ``AUTO_MIGRATE`` is enabled (the default, so a fresh container still boots);
+    otherwise startup fails and ``python -m app.migrations upgrade`` must run first.
+    """
+    head = head_version()
+    current = current_version(engine)
+    if current == head:
+        return
+    if current > head:
+        logger.warning("Database schema version %s is newer than code head %s", current, head)
+        return
+    if auto_upgrade is None:
+        auto_upgrade = os.environ.get("AUTO_MIGRATE", "1").lower() not in ("0", "false", "no")
+    if not auto_upgrade:
+        raise RuntimeError(
+            f"Database schema is at version {current}, expected {head}. "
+            "Run `python -m app.migrations upgrade` before starting the app."
+        )
+    upgrade(engine)
@@ -0,0 +1,37 @@
+"""Offline migration entry point: ``python -m app.migrations [upgrade|current|history]``."""
+import argparse
+import logging
+import sys
+
+from app import migrations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.migrations")
+    sub = parser.add_subparsers(dest="command", required=True)
+    up = sub.add_parser("upgrade", help="apply pending migrations")
+    up.add_argument("--to", type=int, default=None, help="stop at this version")
+    sub.add_parser("current", help="print the applied schema version")
+    sub.add_parser("history", help="list known migrations")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # app.main wires viv-auth/viv-pay, whose tables are part of the baseline
+    from app.main import engine
+
+    if args.command == "upgrade":
+        applied = migrations.upgrade(engine, target=args.to)
+        print(f"Applied {len(applied)} migration(s); now at version {migrations.current_version(engine)}")
+    elif args.command == "current":
+        print(f"current={migrations.current_version(engine)} head={migrations.head_version()}")
+    else:
+        current = migrations.current_version(engine)
+        for m in migrations.discover():
+            mark = "x" if m.version <= current else " "
+            print(f"[{mark}] {m.version:04d} {m.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""Idempotent schema operations for migration scripts.
+
+Databases created before migrations existed already have every table that
+``create_all`` knew about, and a fresh database gets the current models from
+``0001_initial``. Every helper here therefore checks before it changes
+anything, so each script is safe to run against either.
+"""
+from sqlalchemy import Column, Index, Table, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex
+
+
+def has_table(conn: Connection, table_name: str) -> bool:
+    return inspect(conn).has_table(table_name)
+
+
+def has_column(conn: Connection, table_name: str, column_name: str) -> bool:
+    return any(col["name"] == column_name for col in inspect(conn).get_columns(table_name))
+
+
+def create_table(conn: Connection, table: Table):
+    table.create(bind=conn, checkfirst=True)
+
+
+def add_column(conn: Connection, table_name: str, column: Column):
+    """``ALTER TABLE ... ADD COLUMN`` unless the column already exists.
+
+    Keep new columns nullable (or with a server default) so the ALTER is a
+    metadata-only change on large tables.
+    """
+    if has_column(conn, table_name, column.name):
+        return
+    col_type = column.type.compile(dialect=conn.dialect)
+    ddl = f"ALTER TABLE {table_name} ADD COLUMN {column.name} {col_type}"
+    if column.server_default is not None:
+        default = column.server_default.arg
+        default = default.text if hasattr(default, "text") else f"'{default}'"
+        ddl += f" DEFAULT {default}"
+    conn.exec_driver_sql(ddl)
+
+
+def create_index(conn: Connection, index: Index):
+    """Create ``index`` if missing, concurrently on Postgres outside a transaction."""
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=conn.dialect))
+    if conn.dialect.name == "postgresql" and conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT":
+        ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+        ddl = ddl.replace("CREATE UNIQUE INDEX", "CREATE UNIQUE INDEX CONCURRENTLY", 1)
+    conn.exec_driver_sql(ddl)
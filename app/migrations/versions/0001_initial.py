@@ -0,0 +1,11 @@
+"""Baseline schema: everything ``create_all`` used to build on startup.
+
+Includes the viv-auth and viv-pay tables, which register themselves on
+``Base`` when app.main calls ``init_auth``/``init_pay``.
+"""
+import app.models  # noqa: F401 - registers models on Base
+from app.database import Base
+
+
+def upgrade(conn):
+    Base.metadata.create_all(bind=conn)
@@ -0,0 +1,28 @@
+"""Index the tenant and foreign-key columns every page filters on.
+
+Runs outside a transaction so Postgres builds them with
+``CREATE INDEX CONCURRENTLY`` and existing tables stay writable.
+"""
+import app.models  # noqa: F401 - registers models on Base
+from app.database import Base
+from app.migrations import ops
+
+TRANSACTIONAL = False
+
+INDEXES = {
+    "ix_social_accounts_user_id",
+    "ix_posts_user_id",
+    "ix_posts_account_id",
+    "ix_post_metrics_post_id",
+    "ix_content_calendar_user_id",
+    "ix_hashtag_groups_user_id",
+    "ix_audience_snapshots_account_id",
+    "ix_ai_content_ideas_user_id",
+}
+
+
+def upgrade(conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in INDEXES:
+                ops.create_index(conn, index)
@@ -0,0 +1,13 @@
+"""Composite indexes behind the paginated posts list and its tab counts."""
+from app.migrations import ops
+from app.models import Post
+
+TRANSACTIONAL = False
+
+INDEXES = {"ix_posts_user_updated", "ix_posts_user_status_updated"}
+
+
+def upgrade(conn):
+    for index in Post.__table__.indexes:
+        if index.name in INDEXES:
+            ops.create_index(conn, index)
@@ -0,0 +1,101 @@
+"""Full-text search index over posts, AI ideas and calendar entries.
+
+SQLite gets an FTS5 table, Postgres a tsvector column with a GIN index. Row
+triggers on the source tables keep ``search_documents`` in sync, and existing
+rows are backfilled here. See app/search.py for the query side.
+"""
+from app.search import KIND_CODES, KIND_STRIDE
+
+# (kind, source table, title expression, body expression, columns that affect the document)
+SOURCES = [
+    ("post", "posts", "''", "{r}.content || ' ' || coalesce({r}.hashtags, '')", "content, hashtags, user_id"),
+    ("idea", "ai_content_ideas", "{r}.title", "{r}.content", "title, content, user_id"),
+    ("calendar", "content_calendar", "{r}.title", "coalesce({r}.description, '')", "title, description, user_id"),
+]
+
+
+def _doc_id(kind, row):
+    return f"{row}.id * {KIND_STRIDE} + {KIND_CODES[kind]}"
+
+
+def _upgrade_sqlite(conn):
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_documents USING fts5("
+        "title, body, user_token, kind, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    for kind, table, title, body, columns in SOURCES:
+        def insert(r):
+            return (
+                "INSERT INTO search_documents (rowid, title, body, user_token, kind) VALUES ("
+                f"{_doc_id(kind, r)}, {title.format(r=r)}, {body.format(r=r)}, "
+                f"'u' || lower(hex({r}.user_id)), '{kind}');"
+            )
+        delete_old = f"DELETE FROM search_documents WHERE rowid = {_doc_id(kind, 'old')};"
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_insert AFTER INSERT ON {table} "
+            f"BEGIN {insert('new')} END"
+        )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_update AFTER UPDATE OF {columns} ON {table} "
+            f"BEGIN {delete_old} {insert('new')} END"
+        )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_delete AFTER DELETE ON {table} "
+            f"BEGIN {delete_old} END"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO search_documents (rowid, title, body, user_token, kind) "
+            f"SELECT {_doc_id(kind, 'r')}, {title.format(r='r')}, {body.format(r='r')}, "
+            f"'u' || lower(hex(r.user_id)), '{kind}' FROM {table} r "
+            f"WHERE {_doc_id(kind, 'r')} NOT IN (SELECT rowid FROM search_documents)"
+        )
+
+
+def _upgrade_postgresql(conn):
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS search_documents ("
+        "id BIGINT PRIMARY KEY, "
+        "kind VARCHAR(16) NOT NULL, "
+        "user_id VARCHAR NOT NULL, "
+        "title TEXT NOT NULL DEFAULT '', "
+        "body TEXT NOT NULL DEFAULT '', "
+        "tsv TSVECTOR GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')"
+        ") STORED)"
+    )
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_search_documents_tsv ON search_documents USING GIN (tsv)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_search_documents_user_id ON search_documents (user_id)")
+    for kind, table, title, body, columns in SOURCES:
+        values = f"({_doc_id(kind, '{r}')}, '{kind}', {{r}}.user_id, {title}, {body})"
+        conn.exec_driver_sql(f"""
+            CREATE OR REPLACE FUNCTION search_{table}_sync() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    DELETE FROM search_documents WHERE id = {_doc_id(kind, 'OLD')};
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO search_documents (id, kind, user_id, title, body)
+                    VALUES {values.format(r='NEW')};
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS search_{table}_sync ON {table}")
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER search_{table}_sync "
+            f"AFTER INSERT OR UPDATE OF {columns} OR DELETE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION search_{table}_sync()"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO search_documents (id, kind, user_id, title, body) "
+            f"SELECT {_doc_id(kind, 'r')}, '{kind}', r.user_id, {title.format(r='r')}, {body.format(r='r')} "
+            f"FROM {table} r ON CONFLICT (id) DO NOTHING"
+        )
+
+
+def upgrade(conn):
+    if conn.dialect.name == "postgresql":
+        _upgrade_postgresql(conn)
+    elif conn.dialect.name == "sqlite":
+        _upgrade_sqlite(conn)
@@ -0,0 +1,15 @@
+"""Columns and index for the scheduled-post dispatcher (app/dispatcher.py)."""
+from app.migrations import ops
+from app.models import Post
+
+TRANSACTIONAL = False
+
+COLUMNS = ["publish_attempts", "next_attempt_at", "claimed_at", "last_error"]
+
+
+def upgrade(conn):
+    for name in COLUMNS:
+        ops.add_column(conn, "posts", Post.__table__.c[name])
+    for index in Post.__table__.indexes:
+        if index.name == "ix_posts_status_scheduled":
+            ops.create_index(conn, index)
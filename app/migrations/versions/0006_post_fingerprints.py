@@ -0,0 +1,27 @@
+"""SimHash fingerprints for near-duplicate post detection (app/similarity.py)."""
+from sqlalchemy import insert, select
+
+from app.migrations import ops
+from app.models import Post, PostFingerprint
+from app.similarity import fingerprint_row
+
+BATCH_SIZE = 2000
+
+
+def upgrade(conn):
+    ops.create_table(conn, PostFingerprint.__table__)
+
+    # Backfill posts written before fingerprints existed, in id order
+    last_id = 0
+    while True:
+        posts = conn.execute(
+            select(Post.id, Post.user_id, Post.content)
+            .outerjoin(PostFingerprint, PostFingerprint.post_id == Post.id)
+            .where(PostFingerprint.post_id.is_(None), Post.id > last_id)
+            .order_by(Post.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not posts:
+            break
+        conn.execute(insert(PostFingerprint), [fingerprint_row(p.id, p.user_id, p.content) for p in posts])
+        last_id = posts[-1].id
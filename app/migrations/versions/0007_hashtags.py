@@ -0,0 +1,32 @@
+"""Normalized hashtag and media tables (app/hashtags.py), backfilled from the text columns."""
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import hashtags
+from app.migrations import ops
+from app.models import Hashtag, HashtagGroup, HashtagGroupTag, Post, PostHashtag, PostMedia
+
+BATCH_SIZE = 2000
+
+
+def _backfill(db: Session, id_column, sync):
+    last_id = 0
+    while True:
+        ids = db.execute(
+            select(id_column).where(id_column > last_id).order_by(id_column).limit(BATCH_SIZE)
+        ).scalars().all()
+        if not ids:
+            break
+        sync(db, ids)
+        last_id = ids[-1]
+
+
+def upgrade(conn):
+    for model in (Hashtag, PostHashtag, PostMedia, HashtagGroupTag):
+        ops.create_table(conn, model.__table__)
+
+    # The session joins the migration's transaction; nothing here commits
+    db = Session(bind=conn)
+    _backfill(db, Post.id, hashtags.sync_posts)
+    _backfill(db, HashtagGroup.id, hashtags.sync_groups)
+    db.close()
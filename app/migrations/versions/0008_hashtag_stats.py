@@ -0,0 +1,22 @@
+"""Running usage/reach totals on hashtags and hashtag groups (app/hashtag_metrics.py)."""
+from sqlalchemy.orm import Session
+
+from app import hashtag_metrics
+from app.migrations import ops
+from app.models import Hashtag, HashtagGroup
+
+COLUMNS = {
+    "hashtags": (Hashtag, ["usage_count", "reach_total", "reach_samples", "avg_reach"]),
+    "hashtag_groups": (HashtagGroup, ["reach_total", "reach_samples"]),
+}
+
+
+def upgrade(conn):
+    for table_name, (model, names) in COLUMNS.items():
+        for name in names:
+            ops.add_column(conn, table_name, model.__table__.c[name])
+
+    # Replace typed-in group numbers with values computed from post metrics
+    db = Session(bind=conn)
+    hashtag_metrics.rebuild(db)
+    db.close()
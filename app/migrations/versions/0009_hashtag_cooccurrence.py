@@ -0,0 +1,15 @@
+"""Hashtag co-occurrence matrices (app/hashtag_graph.py), built from existing posts."""
+from sqlalchemy.orm import Session
+
+from app import hashtag_graph
+from app.migrations import ops
+from app.models import GlobalHashtagCooccurrence, HashtagCooccurrence
+
+
+def upgrade(conn):
+    ops.create_table(conn, HashtagCooccurrence.__table__)
+    ops.create_table(conn, GlobalHashtagCooccurrence.__table__)
+
+    db = Session(bind=conn)
+    hashtag_graph.rebuild(db)
+    db.close()
@@ -0,0 +1,7 @@
+"""Persistent cache of AI Studio model answers (app/ai_cache.py)."""
+from app.migrations import ops
+from app.models import AIResponseCache
+
+
+def upgrade(conn):
+    ops.create_table(conn, AIResponseCache.__table__)
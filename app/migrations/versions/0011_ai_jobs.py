@@ -0,0 +1,7 @@
+"""Background AI job queue (app/ai_jobs.py)."""
+from app.migrations import ops
+from app.models import AIJob
+
+
+def upgrade(conn):
+    ops.create_table(conn, AIJob.__table__)
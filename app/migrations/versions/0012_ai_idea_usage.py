@@ -0,0 +1,12 @@
+"""Latency, token and cost columns on AI content ideas (app/ai_metrics.py)."""
+from app.migrations import ops
+from app.models import AIContentIdea
+
+TRANSACTIONAL = False
+
+COLUMNS = ["latency_ms", "prompt_tokens", "completion_tokens", "cost_usd"]
+
+
+def upgrade(conn):
+    for name in COLUMNS:
+        ops.add_column(conn, "ai_content_ideas", AIContentIdea.__table__.c[name])
@@ -0,0 +1,14 @@
+"""One-time onboarding flag per user (app/onboarding.py)."""
+from sqlalchemy import distinct, insert, literal, select
+
+from app.migrations import ops
+from app.models import SocialAccount, UserOnboarding
+
+
+def upgrade(conn):
+    ops.create_table(conn, UserOnboarding.__table__)
+    # Users who already have accounts were onboarded by the old dashboard check
+    conn.execute(insert(UserOnboarding).from_select(
+        ["user_id", "seeded"],
+        select(distinct(SocialAccount.user_id), literal(False)),
+    ))
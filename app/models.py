@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Date, Float, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, Date, Float, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -7,7 +7,7 @@ class SocialAccount(Base):
     __tablename__ = "social_accounts"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, nullable=False)
+    user_id = Column(String, nullable=False, index=True)
     platform = Column(String, nullable=False)
     account_name = Column(String(100), nullable=False)
     account_id = Column(String, nullable=True)
@@ -23,10 +23,17 @@ class SocialAccount(Base):
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # Keyset pagination of the posts list, overall and per status tab
+        Index("ix_posts_user_updated", "user_id", "updated_at", "id"),
+        Index("ix_posts_user_status_updated", "user_id", "status", "updated_at", "id"),
+        # Scheduled-post dispatcher polls for due posts
+        Index("ix_posts_status_scheduled", "status", "scheduled_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, nullable=False)
-    account_id = Column(Integer, ForeignKey("social_accounts.id"), nullable=False)
+    user_id = Column(String, nullable=False, index=True)
+    account_id = Column(Integer, ForeignKey("social_accounts.id"), nullable=False, index=True)
     content = Column(Text, nullable=False)
     media_urls = Column(Text, nullable=True)
     post_type = Column(String, nullable=False)
@@ -35,6 +42,10 @@ class Post(Base):
     published_at = Column(DateTime(timezone=True), nullable=True)
     platform_post_id = Column(String, nullable=True)
     hashtags = Column(Text, nullable=True)
+    publish_attempts = Column(Integer, default=0, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -42,11 +53,86 @@ class Post(Base):
     metrics = relationship("PostMetric", back_populates="post", uselist=False, cascade="all, delete-orphan")
     calendar_entries = relationship("ContentCalendar", back_populates="post")
 
+class PostFingerprint(Base):
+    """SimHash of a post's content, split into 16-bit bands for LSH lookups."""
+    __tablename__ = "post_fingerprints"
+    __table_args__ = (
+        Index("ix_post_fingerprints_band0", "user_id", "band0"),
+        Index("ix_post_fingerprints_band1", "user_id", "band1"),
+        Index("ix_post_fingerprints_band2", "user_id", "band2"),
+        Index("ix_post_fingerprints_band3", "user_id", "band3"),
+    )
+
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(String, nullable=False)
+    simhash = Column(BigInteger, nullable=False)
+    band0 = Column(Integer, nullable=False)
+    band1 = Column(Integer, nullable=False)
+    band2 = Column(Integer, nullable=False)
+    band3 = Column(Integer, nullable=False)
+
+class Hashtag(Base):
+    """One row per distinct (normalized, lowercase, no ``#``) tag per tenant."""
+    __tablename__ = "hashtags"
+    __table_args__ = (UniqueConstraint("user_id", "tag", name="uq_hashtags_user_tag"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String, nullable=False)
+    tag = Column(String(100), nullable=False)
+    usage_count = Column(Integer, default=0, server_default="0", nullable=False)
+    reach_total = Column(BigInteger, default=0, server_default="0", nullable=False)
+    reach_samples = Column(Integer, default=0, server_default="0", nullable=False)
+    avg_reach = Column(Float, default=0.0, server_default="0", nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class PostHashtag(Base):
+    __tablename__ = "post_hashtags"
+    __table_args__ = (Index("ix_post_hashtags_hashtag_post", "hashtag_id", "post_id"),)
+
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    hashtag_id = Column(Integer, ForeignKey("hashtags.id", ondelete="CASCADE"), primary_key=True)
+
+class PostMedia(Base):
+    __tablename__ = "post_media"
+
+    id = Column(Integer, primary_key=True)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False, default=0)
+    url = Column(Text, nullable=False)
+
+class HashtagGroupTag(Base):
+    __tablename__ = "hashtag_group_tags"
+    __table_args__ = (Index("ix_hashtag_group_tags_hashtag_group", "hashtag_id", "group_id"),)
+
+    group_id = Column(Integer, ForeignKey("hashtag_groups.id", ondelete="CASCADE"), primary_key=True)
+    hashtag_id = Column(Integer, ForeignKey("hashtags.id", ondelete="CASCADE"), primary_key=True)
+
+class HashtagCooccurrence(Base):
+    """Sparse co-occurrence matrix of a tenant's hashtags, stored in both directions."""
+    __tablename__ = "hashtag_cooccurrences"
+    __table_args__ = (Index("ix_hashtag_cooccurrences_hashtag_weight", "hashtag_id", "weight"),)
+
+    hashtag_id = Column(Integer, ForeignKey("hashtags.id", ondelete="CASCADE"), primary_key=True)
+    other_id = Column(Integer, ForeignKey("hashtags.id", ondelete="CASCADE"), primary_key=True)
+    posts = Column(Integer, nullable=False, default=0)
+    # Sum of engagement_rate over the posts using both tags
+    weight = Column(Float, nullable=False, default=0.0)
+
+class GlobalHashtagCooccurrence(Base):
+    """Co-occurrence across all tenants, keyed by tag text (opt-in)."""
+    __tablename__ = "hashtag_cooccurrences_global"
+    __table_args__ = (Index("ix_hashtag_cooccurrences_global_tag_weight", "tag", "weight"),)
+
+    tag = Column(String(100), primary_key=True)
+    other_tag = Column(String(100), primary_key=True)
+    posts = Column(Integer, nullable=False, default=0)
+    weight = Column(Float, nullable=False, default=0.0)
+
 class PostMetric(Base):
     __tablename__ = "post_metrics"
 
     id = Column(Integer, primary_key=True, index=True)
-    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
+    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False, index=True)
     likes = Column(Integer, default=0)
     comments = Column(Integer, default=0)
     shares = Column(Integer, default=0)
@@ -62,7 +148,7 @@ class ContentCalendar(Base):
     __tablename__ = "content_calendar"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, nullable=False)
+    user_id = Column(String, nullable=False, index=True)
     title = Column(String(200), nullable=False)
     description = Column(Text, nullable=True)
     date = Column(Date, nullable=False)
@@ -78,19 +164,22 @@ class HashtagGroup(Base):
     __tablename__ = "hashtag_groups"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, nullable=False)
+    user_id = Column(String, nullable=False, index=True)
     name = Column(String(100), nullable=False)
     hashtags = Column(Text, nullable=False)
     category = Column(String(50), nullable=True)
     avg_reach = Column(Integer, default=0)
     usage_count = Column(Integer, default=0)
+    # Maintained by app/hashtag_metrics.py together with avg_reach and usage_count
+    reach_total = Column(BigInteger, default=0, server_default="0", nullable=False)
+    reach_samples = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class AudienceSnapshot(Base):
     __tablename__ = "audience_snapshots"
 
     id = Column(Integer, primary_key=True, index=True)
-    account_id = Column(Integer, ForeignKey("social_accounts.id"), nullable=False)
+    account_id = Column(Integer, ForeignKey("social_accounts.id"), nullable=False, index=True)
     snapshot_date = Column(Date, nullable=False)
     followers = Column(Integer, default=0)
     following = Column(Integer, default=0)
@@ -106,12 +195,65 @@ class AIContentIdea(Base):
     __tablename__ = "ai_content_ideas"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, nullable=False)
+    user_id = Column(String, nullable=False, index=True)
     platform = Column(String, nullable=True)
     idea_type = Column(String, nullable=False)
     title = Column(String(200), nullable=False)
     content = Column(Text, nullable=False)
     tone = Column(String, nullable=True)
     model_used = Column(String, nullable=True)
+    # This idea's share of the tokens and cost of the model call that produced it, and
+    # that call's latency (app/ai_metrics.py); NULL for cached answers and older ideas
+    latency_ms = Column(Float, nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    cost_usd = Column(Float, nullable=True)
     used = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class UserOnboarding(Base):
+    """Marks a user's first visit as handled (demo data seeded or skipped); see app/onboarding.py."""
+    __tablename__ = "user_onboarding"
+
+    user_id = Column(String, primary_key=True)
+    seeded = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class AIResponseCache(Base):
+    """A model answer keyed by a hash of (model, prompt, params); see app/ai_cache.py."""
+    __tablename__ = "ai_response_cache"
+
+    key = Column(String(64), primary_key=True)
+    kind = Column(String(50), nullable=False)
+    model = Column(String, nullable=False)
+    response = Column(Text, nullable=False)
+    hits = Column(Integer, nullable=False, server_default="0")
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    last_used_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class AIJob(Base):
+    """A queued AI Studio request run by the background workers in app/ai_jobs.py."""
+    __tablename__ = "ai_jobs"
+    __table_args__ = (
+        Index("ix_ai_jobs_status_next_attempt", "status", "next_attempt_at"),
+        Index("ix_ai_jobs_user_created", "user_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String, nullable=False)
+    kind = Column(String(20), nullable=False)
+    params = Column(Text, nullable=False)
+    # queued -> running -> succeeded | failed | cancelled (running -> queued on retry)
+    status = Column(String(20), nullable=False, default="queued")
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    timeout_seconds = Column(Float, nullable=False)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,66 @@
+"""One-time first-visit setup per user, kept off the dashboard's hot path.
+
+The dashboard used to count the user's social accounts on every visit to
+decide whether to seed demo data. Instead, the first visit claims the user's
+row in ``user_onboarding`` and seeds (app/seed.py) in the same transaction,
+and each process remembers who is onboarded, so later visits cost no query.
+
+The claim is an ``INSERT ... ON CONFLICT DO NOTHING`` on the user id. When
+several first requests race, exactly one inserts the row and seeds; the
+others wait on its row lock (Postgres) or write lock (SQLite) until it
+commits, then find the row and do nothing. If the seeding transaction rolls
+back, the claim goes with it and the next visit tries again. Users who
+already have accounts (added through the API before their first dashboard
+visit) are marked onboarded without demo data.
+"""
+import threading
+
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import UserOnboarding
+from app.seed import seed_social_pro
+
+# Remembered user ids are forgotten wholesale beyond this; they are re-checked with one query
+MAX_REMEMBERED = 100000
+
+_onboarded = set()
+_lock = threading.Lock()
+
+
+def _claim(db: Session, user_id: str) -> bool:
+    """Insert the user's onboarding row; False when it already exists."""
+    dialect = db.get_bind().dialect.name
+    row = {"user_id": user_id, "seeded": False}
+    if dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql if dialect == "postgresql" else sqlite).insert(UserOnboarding.__table__)
+        return db.execute(stmt.on_conflict_do_nothing(index_elements=["user_id"]), row).rowcount == 1
+    try:
+        with db.begin_nested():
+            db.execute(insert(UserOnboarding), row)
+    except IntegrityError:
+        return False
+    return True
+
+
+def ensure_onboarded(db: Session, user_id: str) -> bool:
+    """Seed demo data on the user's first visit; True if this call seeded. Commits."""
+    if user_id in _onboarded:
+        return False
+    seeded = False
+    try:
+        if _claim(db, user_id) and seed_social_pro(db, user_id):
+            db.execute(update(UserOnboarding).where(UserOnboarding.user_id == user_id).values(seeded=True))
+            seeded = True
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    with _lock:
+        if len(_onboarded) >= MAX_REMEMBERED:
+            _onboarded.clear()
+        _onboarded.add(user_id)
+    return seeded
+
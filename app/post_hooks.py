@@ -0,0 +1,47 @@
+"""Keeps data derived from posts in sync with post writes.
+
+Every code path that creates, edits or deletes posts calls these hooks
+inside its own transaction, so derived rows commit or roll back together
+with the posts themselves:
+
+* ``posts_saved`` after new or edited posts have been flushed (ids known),
+* ``posts_deleting`` before posts are deleted,
+* ``metric_changed`` when a metric row is created, edited or deleted.
+
+The search index is kept in sync by database triggers and needs no hook.
+"""
+from typing import Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import hashtag_graph, hashtag_metrics, hashtags, similarity
+from app.hashtag_metrics import MetricSample
+from app.models import Post
+
+
+def posts_saved(db: Session, post_ids: Iterable[int]):
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    similarity.index_posts(db, post_ids)
+    hashtags.sync_posts(db, post_ids)
+
+
+def posts_deleting(db: Session, post_ids: Iterable[int]):
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    similarity.remove_posts(db, post_ids)
+    hashtags.remove_posts(db, post_ids)
+
+
+def metric_changed(db: Session, before: Optional[MetricSample], after: Optional[MetricSample]):
+    """``before`` is None for a new metric row, ``after`` is None for a deleted one."""
+    hashtag_metrics.metric_changed(db, before, after)
+    hashtag_graph.metric_changed(db, before, after)
+
+
+def account_post_ids(db: Session, account_id: int) -> List[int]:
+    """Ids of an account's posts, for deletes that cascade from the account."""
+    return db.execute(select(Post.id).where(Post.account_id == account_id)).scalars().all()
@@ -0,0 +1,79 @@
+"""Platform publishing adapters used by the scheduled-post dispatcher.
+
+An adapter turns a due post into a live platform post and returns the
+platform's post id. Adapters are looked up by name (``PUBLISHER_BACKEND``) so a
+real integration can be registered without touching the dispatcher. There is
+no default: the built-in ``fake`` adapter never leaves the process yet reports
+every post as published, so only benchmarks and tests select it, explicitly.
+"""
+import hashlib
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+
+@dataclass
+class PublishRequest:
+    post_id: int
+    user_id: str
+    platform: str
+    account_id: int
+    account_name: str
+    post_type: str
+    content: str
+    hashtags: Optional[str] = None
+    media_urls: Optional[str] = None
+
+
+class PublishError(Exception):
+    """Publishing failed. ``retryable`` errors are retried with backoff."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class Publisher:
+    def publish(self, request: PublishRequest) -> str:
+        raise NotImplementedError
+
+
+class FakePublisher(Publisher):
+    """Local stand-in for platform APIs with configurable latency and failures.
+
+    ``FAKE_PUBLISH_LATENCY_MS`` sets the simulated call duration and
+    ``FAKE_PUBLISH_ERROR_RATE`` the fraction of calls that fail (retryably).
+    Platform post ids are derived from the post id so runs are reproducible.
+    """
+
+    def __init__(self, latency_ms: Optional[float] = None, error_rate: Optional[float] = None, seed: int = 0):
+        self.latency_ms = float(os.environ.get("FAKE_PUBLISH_LATENCY_MS", 0) if latency_ms is None else latency_ms)
+        self.error_rate = float(os.environ.get("FAKE_PUBLISH_ERROR_RATE", 0) if error_rate is None else error_rate)
+        self._random = random.Random(seed)
+
+    def publish(self, request: PublishRequest) -> str:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise PublishError(f"fake {request.platform} API returned 503")
+        digest = hashlib.sha1(f"{request.platform}:{request.post_id}".encode()).hexdigest()[:16]
+        return f"{request.platform}-{digest}"
+
+
+_PUBLISHERS: Dict[str, Callable[[], Publisher]] = {"fake": FakePublisher}
+
+
+def register_publisher(name: str, factory: Callable[[], Publisher]):
+    _PUBLISHERS[name] = factory
+
+
+def get_publisher(name: Optional[str] = None) -> Publisher:
+    name = name or os.environ.get("PUBLISHER_BACKEND")
+    if not name:
+        raise ValueError(f"PUBLISHER_BACKEND is not set; register a platform adapter and name it "
+                         f"(known: {sorted(_PUBLISHERS)})")
+    if name not in _PUBLISHERS:
+        raise ValueError(f"Unknown publisher backend {name!r}; known: {sorted(_PUBLISHERS)}")
+    return _PUBLISHERS[name]()
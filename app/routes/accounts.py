@@ -1,15 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Form, Request, status
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
+from app import post_hooks
 from app.database import get_db
 from app.models import SocialAccount, AudienceSnapshot, Post
 from app.routes import get_current_user, get_active_subscription
+from app.templating import templates
 from typing import Any, Optional
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 @router.get("/accounts", response_class=HTMLResponse)
 async def list_accounts(
@@ -119,6 +119,7 @@ async def delete_account(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     
+    post_hooks.posts_deleting(db, post_hooks.account_post_ids(db, account.id))
     db.delete(account)
     db.commit()
     return RedirectResponse(url="/accounts", status_code=status.HTTP_303_SEE_OTHER)
@@ -1,22 +1,86 @@
 from fastapi import APIRouter, Depends, HTTPException, Form, Request
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import AIContentIdea
+from app import ai_backends, ai_cache, ai_client, ai_jobs, ai_tasks
+from app.ai_metrics import CallStats, metrics as ai_metrics
+from app.ai_rate_limit import RateLimited
+from app.database import SessionLocal, get_db
+from app.json_stream import JSONArrayStream
+from app.models import AIContentIdea, AIJob
 from app.routes import get_current_user, get_active_subscription
-from typing import Any, Optional
+from app.templating import templates
+from typing import Any, AsyncIterator, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import math
 import os
-from google import genai
+import time
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+logger = logging.getLogger(__name__)
 
-def get_gemini_client():
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        return None
-    return genai.Client(api_key=api_key)
+def _error_body(e: Exception) -> dict:
+    """``error``, ``code`` and ``status`` for a failed call; unexpected errors are logged, not shown."""
+    status, code, message = ai_client.error_info(e)
+    if code == "internal_error":
+        logger.error("AI call failed", exc_info=e)
+    return {"error": message, "code": code, "status": status}
+
+# Failures that go away on their own, so clients are told when to try again
+_TRANSIENT_CODES = {"provider_busy", "provider_unreachable", "provider_error"}
+
+def _error(e: Exception) -> JSONResponse:
+    body = _error_body(e)
+    headers = None
+    if isinstance(e, RateLimited):
+        headers = {"Retry-After": str(math.ceil(e.retry_after))}
+    elif body["code"] in _TRANSIENT_CODES:
+        headers = {"Retry-After": str(math.ceil(ai_client.RETRY_MAX_SECONDS))}
+    return JSONResponse(body, status_code=body["status"], headers=headers)
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _event_stream(events: AsyncIterator[str]) -> StreamingResponse:
+    # X-Accel-Buffering stops nginx from holding chunks back until the end
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _save_ideas(db: Session, user_id: str, platform: str, tone: str, content_type: str,
+                ideas: Any, stats: CallStats) -> Tuple[List[dict], List[dict]]:
+    """The ideas saved and the ones skipped as near-duplicates of saved ones."""
+    rows = ai_tasks.idea_rows(user_id, platform, content_type, tone, ai_tasks.clean_ideas(ideas), stats)
+    rows, duplicates = ai_tasks.save_idea_rows(db, user_id, rows)
+    return [{"title": row["title"], "content": row["content"]} for row in rows], duplicates
+
+class _Timer:
+    """Time to first token and total time of a streamed answer, in ms."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_ms = None
+
+    def token(self):
+        if self.first_token_ms is None:
+            self.first_token_ms = self.elapsed_ms()
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+    def summary(self, **extra) -> dict:
+        return {"ttft_ms": self.first_token_ms, "total_ms": self.elapsed_ms(), **extra}
+
+async def _text_events(prompt: str, kind: str, fresh: bool, user_id: str) -> AsyncIterator[str]:
+    timer = _Timer()
+    try:
+        async for text in ai_client.stream(prompt, kind=kind, use_cache=not fresh, user_id=user_id):
+            timer.token()
+            yield _sse("chunk", {"text": text})
+    except Exception as e:
+        yield _sse("error", _error_body(e))
+        return
+    yield _sse("done", timer.summary())
 
 @router.get("/ai", response_class=HTMLResponse)
 async def ai_studio(
@@ -27,7 +91,7 @@ async def ai_studio(
 ):
     # Get recent ideas
     recent_ideas = db.query(AIContentIdea).filter(AIContentIdea.user_id == str(user.id)).order_by(AIContentIdea.created_at.desc()).limit(10).all()
-    has_api_key = os.environ.get("GOOGLE_API_KEY") is not None
+    has_api_key = ai_backends.configured()
     
     return templates.TemplateResponse("ai/studio.html", {
         "request": request, 
@@ -38,115 +102,358 @@ async def ai_studio(
 
 @router.post("/api/ai/generate")
 async def generate_ideas(
+    request: Request,
     topic: str = Form(...),
     platform: str = Form(...),
     tone: str = Form("professional"),
     content_type: str = Form("post"),
+    fresh: bool = Form(False),
     db: Session = Depends(get_db),
     user: Any = Depends(get_current_user),
     sub: Any = Depends(get_active_subscription)
 ):
-    client = get_gemini_client()
-    if not client:
-        return JSONResponse({"error": "Google API Key not configured"}, status_code=500)
-    
-    prompt = f"Generate 3 {content_type} ideas for {platform} about '{topic}' with a {tone} tone. Return the response as JSON array of objects with 'title' and 'content' keys. Do not include markdown code blocks."
-    
+    prompt = ai_tasks.idea_prompt(topic, platform, tone, content_type)
+    stats = CallStats()
+
+    def save(ideas):
+        # Dedupe and insert off the event loop; duplicates come back as the saved ideas they match
+        saved, duplicates = _save_ideas(db, str(user.id), platform, tone, content_type, ideas, stats)
+        db.commit()
+        return saved + ai_tasks.matched_ideas(db, str(user.id), duplicates), len(duplicates)
+
     try:
-        response = client.models.generate_content(model="gemini-2.5-flash", contents=prompt)
-        text = response.text
-        # Clean up markdown if present
-        if text.startswith("```json"):
-            text = text[7:]
-        if text.endswith("```"):
-            text = text[:-3]
-        text = text.strip()
-        
-        import json
-        ideas = json.loads(text)
+        ideas = await ai_client.generate(prompt, request, kind="generate", use_cache=not fresh,
+                                         parse=ai_client.parse_json, user_id=str(user.id), stats=stats)
         
         # Save to DB
-        saved_ideas = []
-        for idea in ideas:
-            new_idea = AIContentIdea(
-                user_id=str(user.id),
-                platform=platform,
-                idea_type=content_type,
-                title=idea.get("title", "Untitled"),
-                content=idea.get("content", ""),
-                tone=tone,
-                model_used="gemini-2.5-flash"
-            )
-            db.add(new_idea)
-            saved_ideas.append({"title": new_idea.title, "content": new_idea.content})
-            
-        db.commit()
-        return JSONResponse({"ideas": saved_ideas})
+        saved_ideas, duplicates = await asyncio.to_thread(save, ideas)
+        return JSONResponse({"ideas": saved_ideas, "duplicates": duplicates})
         
     except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=500)
+        return _error(e)
+
+@router.post("/api/ai/generate/stream")
+async def generate_ideas_stream(
+    topic: str = Form(...),
+    platform: str = Form(...),
+    tone: str = Form("professional"),
+    content_type: str = Form("post"),
+    fresh: bool = Form(False),
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    """Server-Sent Events: one ``idea`` event per idea as soon as it is complete, then ``done``."""
+    prompt = ai_tasks.idea_prompt(topic, platform, tone, content_type)
+    user_id = str(user.id)
+    stats = CallStats()
+
+    def save(ideas):
+        # The request's session is already closed once a streaming response runs
+        with SessionLocal() as db:
+            saved, duplicates = _save_ideas(db, user_id, platform, tone, content_type, ideas, stats)
+            db.commit()
+        return len(saved), len(duplicates)
+
+    async def events():
+        timer = _Timer()
+        parser = JSONArrayStream()
+        ideas = []
+        try:
+            async for text in ai_client.stream(prompt, kind="generate", use_cache=not fresh,
+                                               parse=ai_client.parse_json, user_id=user_id, stats=stats):
+                timer.token()
+                for idea in parser.feed(text):
+                    if isinstance(idea, dict):
+                        ideas.append(idea)
+                        yield _sse("idea", {"title": idea.get("title", "Untitled"), "content": idea.get("content", "")})
+            saved, duplicates = await asyncio.to_thread(save, ideas)
+        except Exception as e:
+            yield _sse("error", _error_body(e))
+            return
+        yield _sse("done", timer.summary(ideas=len(ideas), saved=saved, duplicates=duplicates))
+
+    return _event_stream(events())
 
 @router.post("/api/ai/caption")
 async def write_caption(
+    request: Request,
     description: str = Form(...),
     platform: str = Form("instagram"),
+    fresh: bool = Form(False),
     db: Session = Depends(get_db),
     user: Any = Depends(get_current_user),
     sub: Any = Depends(get_active_subscription)
 ):
-    client = get_gemini_client()
-    if not client:
-         return JSONResponse({"error": "Google API Key not configured"}, status_code=500)
-         
-    prompt = f"Write a {platform} caption for a post about: {description}. Include emojis and hashtags."
+    prompt = ai_tasks.caption_prompt(description, platform)
     try:
-        response = client.models.generate_content(model="gemini-2.5-flash", contents=prompt)
-        return JSONResponse({"caption": response.text})
+        caption = await ai_client.generate(prompt, request, kind="caption", use_cache=not fresh, user_id=str(user.id))
+        return JSONResponse({"caption": caption})
     except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=500)
+        return _error(e)
+
+@router.post("/api/ai/caption/stream")
+async def write_caption_stream(
+    description: str = Form(...),
+    platform: str = Form("instagram"),
+    fresh: bool = Form(False),
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    prompt = ai_tasks.caption_prompt(description, platform)
+    return _event_stream(_text_events(prompt, "caption", fresh, str(user.id)))
 
 @router.post("/api/ai/hashtags")
 async def research_hashtags(
+    request: Request,
     keyword: str = Form(...),
+    fresh: bool = Form(False),
     db: Session = Depends(get_db),
     user: Any = Depends(get_current_user),
     sub: Any = Depends(get_active_subscription)
 ):
-    client = get_gemini_client()
-    if not client:
-         return JSONResponse({"error": "Google API Key not configured"}, status_code=500)
-         
-    prompt = f"Suggest 30 hashtags for '{keyword}' categorized by reach (High, Medium, Low). Return as a JSON object with keys 'high_reach', 'medium_reach', 'low_reach', each containing an array of strings."
+    prompt = ai_tasks.hashtags_prompt(keyword)
     try:
-        response = client.models.generate_content(model="gemini-2.5-flash", contents=prompt)
-        text = response.text
-         # Clean up markdown if present
-        if text.startswith("```json"):
-            text = text[7:]
-        if text.endswith("```"):
-            text = text[:-3]
-        text = text.strip()
-        import json
-        data = json.loads(text)
+        data = await ai_client.generate(prompt, request, kind="hashtags", use_cache=not fresh,
+                                        parse=ai_client.parse_json, user_id=str(user.id))
         return JSONResponse(data)
     except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=500)
+        return _error(e)
 
 @router.post("/api/ai/repurpose")
 async def repurpose_content(
+    request: Request,
     content: str = Form(...),
     target_platform: str = Form(...),
+    fresh: bool = Form(False),
     db: Session = Depends(get_db),
     user: Any = Depends(get_current_user),
     sub: Any = Depends(get_active_subscription)
 ):
-    client = get_gemini_client()
-    if not client:
-         return JSONResponse({"error": "Google API Key not configured"}, status_code=500)
-    
-    prompt = f"Repurpose the following content for {target_platform}. Make it native to the platform style.\n\nContent:\n{content}"
+    prompt = ai_tasks.repurpose_prompt(content, target_platform)
     try:
-        response = client.models.generate_content(model="gemini-2.5-flash", contents=prompt)
-        return JSONResponse({"content": response.text})
+        text = await ai_client.generate(prompt, request, kind="repurpose", use_cache=not fresh, user_id=str(user.id))
+        return JSONResponse({"content": text})
     except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=500)
+        return _error(e)
+
+@router.post("/api/ai/repurpose/stream")
+async def repurpose_content_stream(
+    content: str = Form(...),
+    target_platform: str = Form(...),
+    fresh: bool = Form(False),
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    prompt = ai_tasks.repurpose_prompt(content, target_platform)
+    return _event_stream(_text_events(prompt, "repurpose", fresh, str(user.id)))
+
+BATCH_MAX_ITEMS = int(os.environ.get("AI_BATCH_MAX_ITEMS", 24))
+
+@router.post("/api/ai/batch")
+async def batch_generate(
+    platforms: List[str] = Form(...),
+    content: Optional[str] = Form(None),
+    topics: List[str] = Form([]),
+    tone: str = Form("professional"),
+    content_type: str = Form("post"),
+    fresh: bool = Form(False),
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    """Fan out several model calls at once and stream each result as Server-Sent Events.
+
+    ``content`` is repurposed for every platform and ideas are generated for
+    every (topic, platform) pair. Calls run concurrently within
+    ``ai_client.limits``; each finished call is sent as a ``result`` (or
+    ``error``) event, then every idea that is not a near-duplicate is saved
+    in one bulk insert and ``done`` reports the totals.
+    """
+    items = ai_tasks.batch_items(platforms, content, topics)
+    if not items:
+        return JSONResponse({"error": "Nothing to generate: send content and/or topics with platforms"}, status_code=400)
+    if len(items) > BATCH_MAX_ITEMS:
+        return JSONResponse({"error": f"At most {BATCH_MAX_ITEMS} calls per batch"}, status_code=400)
+    user_id = str(user.id)
+
+    stats = [CallStats() for _ in items]
+
+    async def run(index: int, item: dict):
+        try:
+            ideas = await ai_tasks.run_batch_item(item, content, tone, content_type, user_id, use_cache=not fresh,
+                                                  stats=stats[index])
+        except Exception as e:
+            return index, None, e
+        return index, ideas, None
+
+    async def events():
+        timer = _Timer()
+        rows, failed = [], 0
+        tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, ideas, error = await next_done
+                item = items[index]
+                if error is not None:
+                    failed += 1
+                    yield _sse("error", {**item, "index": index, **_error_body(error)})
+                    continue
+                timer.token()
+                rows += ai_tasks.idea_rows(user_id, item["platform"], ai_tasks.batch_idea_type(item, content_type),
+                                           tone, ideas, stats[index])
+                yield _sse("result", {**item, "index": index, "ideas": ideas})
+        finally:
+            # A disconnected client cancels this generator; stop the calls still running
+            for task in tasks:
+                task.cancel()
+        saved, duplicates = await asyncio.to_thread(_bulk_save, user_id, rows) if rows else (0, 0)
+        yield _sse("done", timer.summary(items=len(items), failed=failed, saved=saved, duplicates=duplicates))
+
+    return _event_stream(events())
+
+def _bulk_save(user_id: str, rows: List[dict]) -> Tuple[int, int]:
+    with SessionLocal() as db:
+        rows, duplicates = ai_tasks.save_idea_rows(db, user_id, rows)
+        db.commit()
+    return len(rows), len(duplicates)
+
+@router.get("/api/ai/cache")
+async def cache_stats(
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    return JSONResponse({"enabled": ai_cache.ENABLED, "entries": ai_cache.entries(db), **ai_cache.stats.snapshot()})
+
+@router.get("/api/ai/metrics")
+async def call_metrics(
+    format: str = "json",
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    """Latency, token, parse-failure and cost figures of model calls (app/ai_metrics.py).
+
+    Counters cover all tenants; the cost shown is only the caller's.
+    ``format=prometheus`` returns the Prometheus text format instead; the
+    full export with every tenant's cost is ``/metrics``.
+    """
+    if format == "prometheus":
+        return PlainTextResponse(ai_metrics.prometheus(user_id=str(user.id)))
+    return JSONResponse(ai_metrics.snapshot(user_id=str(user.id)))
+
+JOB_WAIT_MAX_SECONDS = 30.0
+JOB_POLL_SECONDS = 0.5
+
+def _get_job(db: Session, job_id: int, user_id: str) -> AIJob:
+    job = db.query(AIJob).filter(AIJob.id == job_id, AIJob.user_id == user_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/api/ai/jobs", status_code=202)
+async def submit_job(
+    kind: str = Form(...),
+    topic: Optional[str] = Form(None),
+    platform: Optional[str] = Form(None),
+    description: Optional[str] = Form(None),
+    keyword: Optional[str] = Form(None),
+    content: Optional[str] = Form(None),
+    target_platform: Optional[str] = Form(None),
+    platforms: List[str] = Form([]),
+    topics: List[str] = Form([]),
+    tone: str = Form("professional"),
+    content_type: str = Form("post"),
+    fresh: bool = Form(False),
+    timeout: Optional[float] = Form(None),
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    """Queue any AI Studio request and return its job id at once; see app/ai_jobs.py."""
+    params = {
+        "topic": topic, "platform": platform, "description": description, "keyword": keyword,
+        "content": content, "target_platform": target_platform, "platforms": platforms, "topics": topics,
+        "tone": tone, "content_type": content_type, "fresh": fresh,
+    }
+    params = {name: value for name, value in params.items() if value not in (None, [])}
+    if kind == "batch" and len(ai_tasks.batch_items(platforms, content, topics)) > BATCH_MAX_ITEMS:
+        return JSONResponse({"error": f"At most {BATCH_MAX_ITEMS} calls per batch"}, status_code=400)
+    try:
+        job = ai_jobs.submit(db, str(user.id), kind, params, timeout_seconds=timeout)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    db.commit()
+    return JSONResponse(ai_jobs.to_dict(job), status_code=202,
+                        headers={"Location": f"/api/ai/jobs/{job.id}"})
+
+@router.get("/api/ai/jobs")
+async def list_jobs(
+    limit: int = 20,
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    jobs = (
+        db.query(AIJob).filter(AIJob.user_id == str(user.id))
+        .order_by(AIJob.created_at.desc(), AIJob.id.desc()).limit(min(max(limit, 1), 100)).all()
+    )
+    return JSONResponse({"jobs": [ai_jobs.to_dict(job) for job in jobs]})
+
+def _load_job(job_id: int) -> dict:
+    """The job as a dict, read on a short-lived session of its own (call it off the event loop)."""
+    with SessionLocal() as session:
+        return ai_jobs.to_dict(session.get(AIJob, job_id))
+
+@router.get("/api/ai/jobs/{job_id}")
+async def get_job(
+    job_id: int,
+    wait: float = 0,
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    """The job's status and result. ``wait`` long-polls up to that many seconds for it to finish."""
+    job = ai_jobs.to_dict(_get_job(db, job_id, str(user.id)))
+    deadline = time.monotonic() + min(max(wait, 0), JOB_WAIT_MAX_SECONDS)
+    if job["status"] not in ai_jobs.TERMINAL and time.monotonic() < deadline:
+        # Hand the request's pooled connection back rather than holding it for the whole wait
+        db.close()
+    while job["status"] not in ai_jobs.TERMINAL and time.monotonic() < deadline:
+        await asyncio.sleep(JOB_POLL_SECONDS)
+        job = await asyncio.to_thread(_load_job, job_id)
+    return JSONResponse(job)
+
+@router.get("/api/ai/jobs/{job_id}/events")
+async def job_events(
+    job_id: int,
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    """Server-Sent Events: a ``status`` event whenever the job changes, ending with its final state."""
+    _get_job(db, job_id, str(user.id))
+
+    async def events():
+        last = None
+        while True:
+            # The request's session is already closed once a streaming response runs
+            job = await asyncio.to_thread(_load_job, job_id)
+            state = (job["status"], job["attempts"], job["cancel_requested"])
+            if state != last:
+                last = state
+                yield _sse("status", job)
+            if job["status"] in ai_jobs.TERMINAL:
+                return
+            await asyncio.sleep(JOB_POLL_SECONDS)
+
+    return _event_stream(events())
+
+@router.post("/api/ai/jobs/{job_id}/cancel")
+async def cancel_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    job = ai_jobs.cancel(db, _get_job(db, job_id, str(user.id)))
+    db.commit()
+    return JSONResponse(ai_jobs.to_dict(job))
@@ -1,16 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, func
 from app.database import get_db
 from app.models import Post, PostMetric, SocialAccount
 from app.routes import get_current_user, get_active_subscription
+from app.templating import templates
 from typing import Any, List
 from datetime import datetime, timedelta
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 @router.get("/analytics", response_class=HTMLResponse)
 async def analytics_overview(
@@ -1,11 +1,19 @@
 from datetime import datetime, date
-from typing import Any, Optional
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from app.bulk_actions import BulkActionError, PostFilter, apply_bulk_action
 from app.database import get_db
+from app.hashtag_metrics import sample_of
+from app.hashtag_graph import recommend
+from app.hashtag_suggest import suggester
+from app.hashtags import hashtag_stats, parse_hashtags, posts_with_tag, remove_groups, sync_groups
+from app.idea_index import DEFAULT_MIN_SIMILARITY, indexes as idea_indexes, touch as touch_ideas
+from app.importer import detect_format, import_posts
+from app import post_hooks
 from app.models import (
     AIContentIdea,
     AudienceSnapshot,
@@ -16,6 +24,8 @@ from app.models import (
     SocialAccount,
 )
 from app.routes import get_current_user
+from app.search import KIND_CODES, search
+from app.similarity import DEFAULT_MAX_DISTANCE, find_similar
 
 router = APIRouter()
 
@@ -36,6 +46,21 @@ def to_dict(obj) -> dict:
     return result
 
 
+def _similar_dict(match) -> dict:
+    return {
+        "post_id": match.post_id,
+        "distance": match.distance,
+        "similarity": match.similarity,
+        "status": match.status,
+        "content": match.content,
+    }
+
+
+def _similar_ideas(db: Session, matches) -> List[dict]:
+    ideas = {i.id: i for i in db.query(AIContentIdea).filter(AIContentIdea.id.in_([m.idea_id for m in matches]))}
+    return [{"similarity": m.similarity, **to_dict(ideas[m.idea_id])} for m in matches if m.idea_id in ideas]
+
+
 def get_or_404(db: Session, model, id_val: int, label: str):
     obj = db.get(model, id_val)
     if obj is None:
@@ -91,6 +116,25 @@ class PostUpdate(BaseModel):
     hashtags: Optional[str] = None
 
 
+class PostBulkFilter(BaseModel):
+    status: Optional[str] = None
+    account_id: Optional[int] = None
+    post_type: Optional[str] = None
+
+
+class PostBulkAction(BaseModel):
+    action: str
+    ids: Optional[List[int]] = None
+    filter: Optional[PostBulkFilter] = None
+    scheduled_at: Optional[str] = None
+    account_id: Optional[int] = None
+
+
+class PostSimilarityCheck(BaseModel):
+    content: str
+    exclude_id: Optional[int] = None
+
+
 class PostMetricCreate(BaseModel):
     post_id: int
     likes: Optional[int] = 0
@@ -132,20 +176,18 @@ class ContentCalendarUpdate(BaseModel):
     color: Optional[str] = None
 
 
+# avg_reach and usage_count are computed from the group's tags (app/hashtag_metrics.py),
+# so responses include them but requests cannot set them
 class HashtagGroupCreate(BaseModel):
     name: str
     hashtags: str
     category: Optional[str] = None
-    avg_reach: Optional[int] = 0
-    usage_count: Optional[int] = 0
 
 
 class HashtagGroupUpdate(BaseModel):
     name: Optional[str] = None
     hashtags: Optional[str] = None
     category: Optional[str] = None
-    avg_reach: Optional[int] = None
-    usage_count: Optional[int] = None
 
 
 class AudienceSnapshotCreate(BaseModel):
@@ -314,6 +356,7 @@ def delete_social_account(
     obj = get_or_404(db, SocialAccount, account_id, "SocialAccount")
     if obj.user_id != str(user.id):
         raise HTTPException(status_code=403, detail="Forbidden")
+    post_hooks.posts_deleting(db, post_hooks.account_post_ids(db, obj.id))
     db.delete(obj)
     db.commit()
 
@@ -341,6 +384,56 @@ def list_posts(
     return [to_dict(p) for p in q.limit(limit).all()]
 
 
+@router.post("/posts/bulk")
+def bulk_update_posts(
+    body: PostBulkAction,
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    scheduled_at = None
+    if body.scheduled_at:
+        try:
+            scheduled_at = datetime.fromisoformat(body.scheduled_at)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="scheduled_at must be ISO 8601")
+    post_filter = PostFilter(**body.filter.model_dump()) if body.filter else None
+    try:
+        counts = apply_bulk_action(
+            db, str(user.id), body.action,
+            post_ids=body.ids, post_filter=post_filter,
+            scheduled_at=scheduled_at, account_id=body.account_id,
+        )
+    except BulkActionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"action": body.action, "affected": counts}
+
+
+@router.post("/posts/import")
+def import_posts_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    fmt = format or detect_format(file.filename, file.content_type)
+    report = import_posts(db, str(user.id), file.file, fmt)
+    return report.as_dict()
+
+
+@router.post("/posts/similar")
+def check_similar_posts(
+    body: PostSimilarityCheck,
+    max_distance: int = Query(DEFAULT_MAX_DISTANCE, ge=0, le=16),
+    limit: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    """Near-duplicates of unsaved content, used by the post form."""
+    matches = find_similar(db, str(user.id), body.content, exclude_post_id=body.exclude_id,
+                           max_distance=max_distance, limit=limit)
+    return [_similar_dict(m) for m in matches]
+
+
 @router.get("/posts/{post_id}")
 def get_post(
     post_id: int,
@@ -353,6 +446,38 @@ def get_post(
     return to_dict(obj)
 
 
+@router.get("/posts/{post_id}/similar")
+def get_similar_posts(
+    post_id: int,
+    max_distance: int = Query(DEFAULT_MAX_DISTANCE, ge=0, le=16),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    obj = get_or_404(db, Post, post_id, "Post")
+    if obj.user_id != str(user.id):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    matches = find_similar(db, obj.user_id, obj.content, exclude_post_id=obj.id,
+                           max_distance=max_distance, limit=limit)
+    return [_similar_dict(m) for m in matches]
+
+
+@router.get("/posts/{post_id}/similar-ideas")
+def get_ideas_similar_to_post(
+    post_id: int,
+    min_similarity: float = Query(DEFAULT_MIN_SIMILARITY, ge=0, le=1),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    """AI content ideas closest to a post, e.g. to reuse the angle of a top performer."""
+    obj = get_or_404(db, Post, post_id, "Post")
+    if obj.user_id != str(user.id):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    matches = idea_indexes.similar_to_text(db, obj.user_id, obj.content, limit=limit, min_similarity=min_similarity)
+    return _similar_ideas(db, matches)
+
+
 @router.post("/posts", status_code=201)
 def create_post(
     body: PostCreate,
@@ -361,6 +486,8 @@ def create_post(
 ):
     obj = Post(user_id=str(user.id), **body.model_dump())
     db.add(obj)
+    db.flush()
+    post_hooks.posts_saved(db, [obj.id])
     db.commit()
     db.refresh(obj)
     return to_dict(obj)
@@ -378,6 +505,8 @@ def update_post(
         raise HTTPException(status_code=403, detail="Forbidden")
     for key, val in body.model_dump(exclude_unset=True).items():
         setattr(obj, key, val)
+    db.flush()
+    post_hooks.posts_saved(db, [obj.id])
     db.commit()
     db.refresh(obj)
     return to_dict(obj)
@@ -392,6 +521,7 @@ def delete_post(
     obj = get_or_404(db, Post, post_id, "Post")
     if obj.user_id != str(user.id):
         raise HTTPException(status_code=403, detail="Forbidden")
+    post_hooks.posts_deleting(db, [obj.id])
     db.delete(obj)
     db.commit()
 
@@ -441,6 +571,8 @@ def create_post_metric(
         raise HTTPException(status_code=403, detail="Forbidden")
     obj = PostMetric(**body.model_dump())
     db.add(obj)
+    db.flush()
+    post_hooks.metric_changed(db, None, sample_of(obj))
     db.commit()
     db.refresh(obj)
     return to_dict(obj)
@@ -457,8 +589,11 @@ def update_post_metric(
     post = db.get(Post, obj.post_id)
     if post is None or post.user_id != str(user.id):
         raise HTTPException(status_code=403, detail="Forbidden")
+    before = sample_of(obj)
     for key, val in body.model_dump(exclude_unset=True).items():
         setattr(obj, key, val)
+    db.flush()
+    post_hooks.metric_changed(db, before, sample_of(obj))
     db.commit()
     db.refresh(obj)
     return to_dict(obj)
@@ -474,6 +609,7 @@ def delete_post_metric(
     post = db.get(Post, obj.post_id)
     if post is None or post.user_id != str(user.id):
         raise HTTPException(status_code=403, detail="Forbidden")
+    post_hooks.metric_changed(db, sample_of(obj), None)
     db.delete(obj)
     db.commit()
 
@@ -587,6 +723,8 @@ def create_hashtag_group(
 ):
     obj = HashtagGroup(user_id=str(user.id), **body.model_dump())
     db.add(obj)
+    db.flush()
+    sync_groups(db, [obj.id])
     db.commit()
     db.refresh(obj)
     return to_dict(obj)
@@ -604,6 +742,8 @@ def update_hashtag_group(
         raise HTTPException(status_code=403, detail="Forbidden")
     for key, val in body.model_dump(exclude_unset=True).items():
         setattr(obj, key, val)
+    db.flush()
+    sync_groups(db, [obj.id])
     db.commit()
     db.refresh(obj)
     return to_dict(obj)
@@ -618,10 +758,56 @@ def delete_hashtag_group(
     obj = get_or_404(db, HashtagGroup, group_id, "HashtagGroup")
     if obj.user_id != str(user.id):
         raise HTTPException(status_code=403, detail="Forbidden")
+    remove_groups(db, [obj.id])
     db.delete(obj)
     db.commit()
 
 
+# ---------------------------------------------------------------------------
+# Hashtags (normalized from posts and groups)
+# ---------------------------------------------------------------------------
+
+@router.get("/hashtags")
+def list_hashtags(
+    sort: str = Query("reach", pattern="^(reach|posts|engagement)$"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    return [vars(s) for s in hashtag_stats(db, str(user.id), sort=sort, limit=limit)]
+
+
+@router.get("/hashtags/suggest")
+def suggest_hashtags(
+    prefix: str = Query("", max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    return [vars(s) for s in suggester.suggest(db, str(user.id), prefix, limit=limit)]
+
+
+@router.get("/hashtags/recommend")
+def recommend_hashtags(
+    tags: str = Query(..., description="picked hashtags, comma or space separated"),
+    scope: str = Query("tenant", pattern="^(tenant|global)$"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    return [vars(r) for r in recommend(db, str(user.id), parse_hashtags(tags), limit=limit, scope=scope)]
+
+
+@router.get("/hashtags/{tag}/posts")
+def list_hashtag_posts(
+    tag: str,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    return [to_dict(p) for p in posts_with_tag(db, str(user.id), tag, limit=limit)]
+
+
 # ---------------------------------------------------------------------------
 # AudienceSnapshot CRUD
 # ---------------------------------------------------------------------------
@@ -747,6 +933,8 @@ def create_ai_content_idea(
 ):
     obj = AIContentIdea(user_id=str(user.id), **body.model_dump())
     db.add(obj)
+    db.flush()
+    touch_ideas(db, obj.user_id, [obj.id])
     db.commit()
     db.refresh(obj)
     return to_dict(obj)
@@ -764,11 +952,28 @@ def update_ai_content_idea(
         raise HTTPException(status_code=403, detail="Forbidden")
     for key, val in body.model_dump(exclude_unset=True).items():
         setattr(obj, key, val)
+    touch_ideas(db, obj.user_id, [obj.id])
     db.commit()
     db.refresh(obj)
     return to_dict(obj)
 
 
+@router.get("/ai-content-ideas/{idea_id}/similar")
+def get_similar_ai_content_ideas(
+    idea_id: int,
+    min_similarity: float = Query(DEFAULT_MIN_SIMILARITY, ge=0, le=1),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    """The tenant's other ideas ranked by TF-IDF cosine similarity (app/idea_index.py)."""
+    obj = get_or_404(db, AIContentIdea, idea_id, "AIContentIdea")
+    if obj.user_id != str(user.id):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    matches = idea_indexes.similar_to_idea(db, obj, limit=limit, min_similarity=min_similarity)
+    return _similar_ideas(db, matches)
+
+
 @router.delete("/ai-content-ideas/{idea_id}", status_code=204)
 def delete_ai_content_idea(
     idea_id: int,
@@ -778,5 +983,33 @@ def delete_ai_content_idea(
     obj = get_or_404(db, AIContentIdea, idea_id, "AIContentIdea")
     if obj.user_id != str(user.id):
         raise HTTPException(status_code=403, detail="Forbidden")
+    touch_ideas(db, obj.user_id, [obj.id])
     db.delete(obj)
     db.commit()
+
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+@router.get("/search")
+def search_documents(
+    q: str = Query(..., min_length=1),
+    kind: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    if kind is not None and kind not in KIND_CODES:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {sorted(KIND_CODES)}")
+    hits = search(db, str(user.id), q, kind=kind, limit=limit + 1, offset=offset)
+    return {
+        "results": [
+            {"kind": h.kind, "id": h.id, "title": h.title, "snippet": h.snippet, "rank": h.rank, "url": h.url}
+            for h in hits[:limit]
+        ],
+        "limit": limit,
+        "offset": offset,
+        "has_more": len(hits) > limit,
+    }
@@ -1,13 +1,13 @@
 from fastapi import APIRouter, Depends, Request, status, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 import app.routes as routes_module
 from app.routes import get_current_user
+from app.subscription_cache import cache as subscription_cache
+from app.templating import templates
 from typing import Any
 import os
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 @router.get("/pricing", response_class=HTMLResponse)
 async def pricing_page(request: Request):
@@ -24,6 +24,8 @@ async def subscribe(request: Request, user: Any = Depends(get_current_user)):
         # If empty, it will likely fail downstream or I should raise error.
         raise HTTPException(status_code=500, detail="Stripe Price ID not configured")
 
+    # Re-check the subscription on the next request instead of trusting a cached refusal
+    subscription_cache.invalidate(user.id)
     try:
         url = routes_module.create_checkout(user_id=user.id, email=user.email, price_id=price_id)
         return RedirectResponse(url=url, status_code=status.HTTP_303_SEE_OTHER)
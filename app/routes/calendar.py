@@ -1,16 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Form, Request, status
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from app.database import get_db
 from app.models import ContentCalendar, Post
 from app.routes import get_current_user, get_active_subscription
+from app.templating import templates
 from typing import Any, Optional
 from datetime import date, datetime
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 @router.get("/calendar", response_class=HTMLResponse)
 async def calendar_view(
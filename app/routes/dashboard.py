@@ -1,17 +1,16 @@
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from app.database import get_db
 from app.models import Post, SocialAccount, AIContentIdea, ContentCalendar
 from app.routes import get_current_user, get_active_subscription
-from app.seed import seed_social_pro
+from app.onboarding import ensure_onboarded
+from app.templating import templates
 from typing import Any
 from datetime import datetime, timedelta
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 @router.get("/", response_class=HTMLResponse)
 async def dashboard(
@@ -20,9 +19,8 @@ async def dashboard(
     user: Any = Depends(get_current_user),
     sub: Any = Depends(get_active_subscription)
 ):
-    # Seed data check
-    if db.query(SocialAccount).filter(SocialAccount.user_id == str(user.id)).count() == 0:
-        seed_social_pro(db, str(user.id))
+    # Seed demo data on the first visit (remembered afterwards, no query)
+    ensure_onboarded(db, str(user.id))
 
     # Upcoming posts (next 7 days)
     now = datetime.now()
@@ -1,15 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Form, Request, status
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from app.database import get_db
-from app.models import HashtagGroup
+from app.hashtag_graph import recommend, recommend_each
+from app.hashtags import parse_hashtags, remove_groups, sync_groups
+from app.models import Hashtag, HashtagGroup
 from app.routes import get_current_user, get_active_subscription
+from app.templating import templates
 from typing import Any, Optional
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+
+TOP_HASHTAGS = 15
+RELATED_HASHTAGS = 5
 
 @router.get("/hashtags", response_class=HTMLResponse)
 async def list_hashtags(
@@ -18,8 +22,25 @@ async def list_hashtags(
     user: Any = Depends(get_current_user),
     sub: Any = Depends(get_active_subscription)
 ):
-    groups = db.query(HashtagGroup).filter(HashtagGroup.user_id == str(user.id)).all()
-    return templates.TemplateResponse("hashtags/list.html", {"request": request, "user": user, "groups": groups})
+    # Stats are maintained incrementally (app/hashtag_metrics.py), so sorting is a plain ORDER BY
+    groups = (
+        db.query(HashtagGroup)
+        .filter(HashtagGroup.user_id == str(user.id))
+        .order_by(desc(HashtagGroup.avg_reach), desc(HashtagGroup.usage_count), HashtagGroup.name)
+        .all()
+    )
+    top_hashtags = (
+        db.query(Hashtag)
+        .filter(Hashtag.user_id == str(user.id), Hashtag.reach_samples > 0)
+        .order_by(desc(Hashtag.avg_reach), desc(Hashtag.usage_count))
+        .limit(TOP_HASHTAGS)
+        .all()
+    )
+    by_id = recommend_each(db, [h.id for h in top_hashtags], limit=RELATED_HASHTAGS)
+    related = {h.tag: by_id[h.id] for h in top_hashtags}
+    return templates.TemplateResponse("hashtags/list.html", {
+        "request": request, "user": user, "groups": groups, "top_hashtags": top_hashtags, "related": related,
+    })
 
 @router.get("/hashtags/new", response_class=HTMLResponse)
 async def new_hashtag_form(
@@ -35,7 +56,6 @@ async def create_hashtag_group(
     name: str = Form(...),
     hashtags: str = Form(...), # Comma separated or just text
     category: Optional[str] = Form(None),
-    avg_reach: Optional[int] = Form(0),
     db: Session = Depends(get_db),
     user: Any = Depends(get_current_user),
     sub: Any = Depends(get_active_subscription)
@@ -45,9 +65,10 @@ async def create_hashtag_group(
         name=name,
         hashtags=hashtags,
         category=category,
-        avg_reach=avg_reach
     )
     db.add(new_group)
+    db.flush()
+    sync_groups(db, [new_group.id])
     db.commit()
     return RedirectResponse(url="/hashtags", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -62,7 +83,10 @@ async def edit_hashtag_form(
     group = db.query(HashtagGroup).filter(HashtagGroup.id == id, HashtagGroup.user_id == str(user.id)).first()
     if not group:
         raise HTTPException(status_code=404, detail="Hashtag Group not found")
-    return templates.TemplateResponse("hashtags/form.html", {"request": request, "user": user, "group": group})
+    recommendations = recommend(db, str(user.id), parse_hashtags(group.hashtags), limit=10)
+    return templates.TemplateResponse("hashtags/form.html", {
+        "request": request, "user": user, "group": group, "recommendations": recommendations,
+    })
 
 @router.post("/hashtags/{id}/edit")
 async def update_hashtag_group(
@@ -71,7 +95,6 @@ async def update_hashtag_group(
     name: str = Form(...),
     hashtags: str = Form(...),
     category: Optional[str] = Form(None),
-    avg_reach: Optional[int] = Form(0),
     db: Session = Depends(get_db),
     user: Any = Depends(get_current_user),
     sub: Any = Depends(get_active_subscription)
@@ -83,8 +106,9 @@ async def update_hashtag_group(
     group.name = name
     group.hashtags = hashtags
     group.category = category
-    group.avg_reach = avg_reach
     
+    db.flush()
+    sync_groups(db, [group.id])
     db.commit()
     return RedirectResponse(url="/hashtags", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -100,6 +124,7 @@ async def delete_hashtag_group(
     if not group:
         raise HTTPException(status_code=404, detail="Hashtag Group not found")
     
+    remove_groups(db, [group.id])
     db.delete(group)
     db.commit()
     return RedirectResponse(url="/hashtags", status_code=status.HTTP_303_SEE_OTHER)
@@ -1,16 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, Form, Request, status
+from fastapi import APIRouter, Depends, File, HTTPException, Form, Query, Request, UploadFile, status
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import String, and_, cast, desc, func, literal, or_
+from app.bulk_actions import BulkActionError, PostFilter, apply_bulk_action
 from app.database import get_db
+from app.importer import detect_format, import_posts
+from app import post_hooks
 from app.models import Post, SocialAccount, HashtagGroup
 from app.routes import get_current_user, get_active_subscription
-from typing import Any, Optional
+from app.templating import templates
+from typing import Any, List, Optional
 from datetime import datetime
+import base64
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+
+POSTS_PAGE_SIZE = 24
+CONTENT_PREVIEW_CHARS = 140
+
+TAB_STATUSES = {
+    "drafts": "draft",
+    "scheduled": "scheduled",
+    "published": "published",
+    "failed": "failed",
+}
+
+
+def _encode_cursor(updated_at: str, post_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{updated_at}|{post_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        updated_at, post_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return updated_at, int(post_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 
 @router.get("/posts", response_class=HTMLResponse)
 async def list_posts(
@@ -18,26 +44,80 @@ async def list_posts(
     db: Session = Depends(get_db),
     user: Any = Depends(get_current_user),
     sub: Any = Depends(get_active_subscription),
-    tab: str = "all"
+    tab: str = "all",
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    per_page: int = Query(POSTS_PAGE_SIZE, ge=1, le=100)
 ):
-    query = db.query(Post).filter(Post.user_id == str(user.id))
-    
-    if tab == "drafts":
-        query = query.filter(Post.status == "draft")
-    elif tab == "scheduled":
-        query = query.filter(Post.status == "scheduled")
-    elif tab == "published":
-        query = query.filter(Post.status == "published")
-    elif tab == "failed":
-        query = query.filter(Post.status == "failed")
-    
-    posts = query.order_by(desc(Post.updated_at)).all()
-    
+    user_id = str(user.id)
+
+    # Tab counts in one grouped query instead of one COUNT per status
+    status_counts = dict(
+        db.query(Post.status, func.count(Post.id))
+        .filter(Post.user_id == user_id)
+        .group_by(Post.status)
+        .all()
+    )
+    counts = {"all": sum(status_counts.values())}
+    for tab_name, post_status in TAB_STATUSES.items():
+        counts[tab_name] = status_counts.get(post_status, 0)
+
+    # Only the columns a card shows; the account comes from the join, not a lazy load.
+    # updated_at is read back as stored text so the keyset cursor compares
+    # exactly against what is in the column.
+    sort_key = cast(Post.updated_at, String).label("sort_key")
+    query = db.query(
+        Post.id,
+        Post.status,
+        func.substr(Post.content, 1, CONTENT_PREVIEW_CHARS + 1).label("content_prefix"),
+        Post.scheduled_at,
+        Post.published_at,
+        Post.created_at,
+        sort_key,
+        SocialAccount.account_name,
+        SocialAccount.platform,
+    ).join(SocialAccount, Post.account_id == SocialAccount.id).filter(Post.user_id == user_id)
+
+    if tab in TAB_STATUSES:
+        query = query.filter(Post.status == TAB_STATUSES[tab])
+
+    # Keyset pagination on (updated_at, id): deep pages cost the same as the first
+    if before:
+        key, key_id = _decode_cursor(before)
+        key = literal(key, String)
+        query = query.filter(or_(Post.updated_at > key, and_(Post.updated_at == key, Post.id > key_id)))
+        rows = query.order_by(Post.updated_at, Post.id).limit(per_page + 1).all()
+        has_newer = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_older = True
+    else:
+        if after:
+            key, key_id = _decode_cursor(after)
+            key = literal(key, String)
+            query = query.filter(or_(Post.updated_at < key, and_(Post.updated_at == key, Post.id < key_id)))
+        rows = query.order_by(desc(Post.updated_at), desc(Post.id)).limit(per_page + 1).all()
+        has_older = len(rows) > per_page
+        rows = rows[:per_page]
+        has_newer = after is not None
+
+    accounts = db.query(SocialAccount.id, SocialAccount.account_name, SocialAccount.platform).filter(
+        SocialAccount.user_id == user_id
+    ).all()
+
+    next_cursor = _encode_cursor(rows[-1].sort_key, rows[-1].id) if rows and has_older else None
+    prev_cursor = _encode_cursor(rows[0].sort_key, rows[0].id) if rows and has_newer else None
+
     return templates.TemplateResponse("posts/list.html", {
         "request": request, 
         "user": user, 
-        "posts": posts,
-        "tab": tab
+        "posts": rows,
+        "tab": tab,
+        "counts": counts,
+        "preview_chars": CONTENT_PREVIEW_CHARS,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "per_page": per_page,
+        "accounts": accounts
     })
 
 @router.get("/posts/new", response_class=HTMLResponse)
@@ -88,10 +168,72 @@ async def create_post(
         scheduled_at=scheduled_dt
     )
     db.add(new_post)
+    db.flush()
+    post_hooks.posts_saved(db, [new_post.id])
     db.commit()
     db.refresh(new_post)
     return RedirectResponse(url=f"/posts/{new_post.id}", status_code=status.HTTP_303_SEE_OTHER)
 
+@router.post("/posts/bulk")
+def bulk_posts(
+    request: Request,
+    action: str = Form(...),
+    ids: List[int] = Form([]),
+    tab: str = Form("all"),
+    whole_tab: bool = Form(False),
+    scheduled_at: Optional[str] = Form(None),
+    account_id: Optional[int] = Form(None),
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    post_filter = None
+    if whole_tab:
+        if tab not in TAB_STATUSES:
+            raise HTTPException(status_code=400, detail="Pick a status tab to apply an action to all of its posts")
+        post_filter = PostFilter(status=TAB_STATUSES[tab])
+        ids = []
+
+    scheduled_dt = None
+    if scheduled_at:
+        try:
+            scheduled_dt = datetime.fromisoformat(scheduled_at)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid schedule time")
+
+    try:
+        apply_bulk_action(
+            db, str(user.id), action, post_ids=ids, post_filter=post_filter,
+            scheduled_at=scheduled_dt, account_id=account_id
+        )
+    except BulkActionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return RedirectResponse(url=f"/posts?tab={tab}", status_code=status.HTTP_303_SEE_OTHER)
+
+@router.get("/posts/import", response_class=HTMLResponse)
+async def import_posts_form(
+    request: Request,
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    return templates.TemplateResponse("posts/import.html", {"request": request, "user": user})
+
+@router.post("/posts/import", response_class=HTMLResponse)
+def import_posts_upload(
+    request: Request,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    # Sync route: parsing and bulk inserts run in the threadpool, off the event loop
+    report = import_posts(db, str(user.id), file.file, detect_format(file.filename, file.content_type))
+    return templates.TemplateResponse("posts/import.html", {
+        "request": request,
+        "user": user,
+        "report": report.as_dict()
+    })
+
 @router.get("/posts/{id}", response_class=HTMLResponse)
 async def post_detail(
     request: Request,
@@ -162,6 +304,8 @@ async def update_post(
     post.hashtags = hashtags
     post.scheduled_at = scheduled_dt
     
+    db.flush()
+    post_hooks.posts_saved(db, [post.id])
     db.commit()
     return RedirectResponse(url=f"/posts/{id}", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -177,6 +321,7 @@ async def delete_post(
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
+    post_hooks.posts_deleting(db, [post.id])
     db.delete(post)
     db.commit()
     return RedirectResponse(url="/posts", status_code=status.HTTP_303_SEE_OTHER)
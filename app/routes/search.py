@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import HTMLResponse
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.routes import get_current_user, get_active_subscription
+from app.search import KIND_CODES, search
+from app.templating import templates
+from typing import Any, Optional
+
+router = APIRouter()
+
+SEARCH_PAGE_SIZE = 20
+
+@router.get("/search", response_class=HTMLResponse)
+async def search_page(
+    request: Request,
+    q: str = "",
+    kind: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+    sub: Any = Depends(get_active_subscription)
+):
+    if kind not in KIND_CODES:
+        kind = None
+    hits = search(db, str(user.id), q, kind=kind, limit=SEARCH_PAGE_SIZE + 1, offset=(page - 1) * SEARCH_PAGE_SIZE)
+
+    return templates.TemplateResponse("search/results.html", {
+        "request": request,
+        "user": user,
+        "search_query": q,
+        "kind": kind,
+        "hits": hits[:SEARCH_PAGE_SIZE],
+        "has_more": len(hits) > SEARCH_PAGE_SIZE,
+        "page": page
+    })
@@ -0,0 +1,115 @@
+"""Full-text search over posts, AI content ideas and calendar entries.
+
+Documents live in a single ``search_documents`` index that database triggers
+keep in sync with the source tables (see migration 0004):
+
+* SQLite: an FTS5 virtual table ranked with bm25().
+* Postgres: a regular table with a weighted ``tsvector`` column and a GIN
+  index, ranked with ts_rank().
+
+Each document's id encodes its source as ``ref_id * KIND_STRIDE + kind code``,
+so triggers update and delete by primary key instead of scanning.
+"""
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+KIND_STRIDE = 4
+KIND_CODES = {"post": 1, "idea": 2, "calendar": 3}
+KIND_NAMES = {code: kind for kind, code in KIND_CODES.items()}
+
+# Title matches count more than body matches
+TITLE_WEIGHT = 4.0
+BODY_WEIGHT = 1.0
+
+MAX_QUERY_TERMS = 12
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class SearchHit:
+    kind: str
+    id: int
+    title: str
+    snippet: str
+    rank: float
+
+    @property
+    def url(self) -> str:
+        if self.kind == "post":
+            return f"/posts/{self.id}"
+        if self.kind == "idea":
+            return "/ai"
+        return "/calendar"
+
+
+def tenant_token(user_id: str) -> str:
+    """Encode a user id as a single FTS token so tenants can never prefix-match each other."""
+    return "u" + str(user_id).encode().hex()
+
+
+def query_terms(query: str) -> List[str]:
+    return [t.lower() for t in _TERM_RE.findall(query or "")][:MAX_QUERY_TERMS]
+
+
+def _fts5_match(user_id: str, terms: List[str], kind: Optional[str]) -> str:
+    # Every term must match; the last one is a prefix so results appear while typing
+    phrases = [f'"{t}"' for t in terms[:-1]] + [f'"{terms[-1]}"*']
+    match = f'user_token:"{tenant_token(user_id)}" AND {{title body}}: ({" ".join(phrases)})'
+    if kind:
+        match += f' AND kind:"{kind}"'
+    return match
+
+
+def search(
+    db: Session,
+    user_id: str,
+    query: str,
+    kind: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[SearchHit]:
+    """Ranked search for one tenant. Fetch ``limit + 1`` to learn whether more pages exist."""
+    terms = query_terms(query)
+    if not terms:
+        return []
+    if kind is not None and kind not in KIND_CODES:
+        raise ValueError(f"Unknown search kind: {kind}")
+
+    if db.bind.dialect.name == "postgresql":
+        tsquery = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+        rows = db.execute(text(
+            "SELECT id, title, "
+            "ts_headline('simple', coalesce(nullif(body, ''), title), q, "
+            "'StartSel=\"\",StopSel=\"\",MaxWords=24,MinWords=8') AS snippet, "
+            "ts_rank(tsv, q) AS rank "
+            "FROM search_documents, to_tsquery('simple', :tsquery) AS q "
+            "WHERE user_id = :user_id AND tsv @@ q "
+            + ("AND kind = :kind " if kind else "")
+            + "ORDER BY rank DESC, id DESC LIMIT :limit OFFSET :offset"
+        ), {"tsquery": tsquery, "user_id": str(user_id), "kind": kind, "limit": limit, "offset": offset}).all()
+        rank_sign = 1
+    else:
+        rows = db.execute(text(
+            "SELECT rowid AS id, title, "
+            "snippet(search_documents, -1, '', '', '…', 16) AS snippet, "
+            f"bm25(search_documents, {TITLE_WEIGHT}, {BODY_WEIGHT}, 0, 0) AS rank "
+            "FROM search_documents WHERE search_documents MATCH :match "
+            "ORDER BY rank, rowid DESC LIMIT :limit OFFSET :offset"
+        ), {"match": _fts5_match(user_id, terms, kind), "limit": limit, "offset": offset}).all()
+        rank_sign = -1  # bm25() is "lower is better"
+
+    return [
+        SearchHit(
+            kind=KIND_NAMES[row.id % KIND_STRIDE],
+            id=row.id // KIND_STRIDE,
+            title=row.title or "",
+            snippet=row.snippet or "",
+            rank=rank_sign * float(row.rank or 0),
+        )
+        for row in rows
+    ]
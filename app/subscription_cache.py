@@ -0,0 +1,146 @@
+"""Per-user cache of the subscription check behind every page and AI route.
+
+``require_active_subscription`` (app/main.py) runs viv-pay's
+``require_subscription`` on almost every request, and that costs one or more
+database lookups each time. Its outcome is kept per user instead: the
+subscription it returned for ``SUBSCRIPTION_CACHE_TTL_SECONDS`` (default 60;
+0 turns the cache off), or the HTTP error it raised (no or lapsed
+subscription) for only ``SUBSCRIPTION_CACHE_DENIED_TTL_SECONDS`` (default 5),
+so someone who has just paid gets in almost at once.
+
+Entries are dropped as soon as a subscription changes in this process:
+
+* any commit that writes a billing row (a table whose name mentions
+  subscriptions, customers or payments, as viv-pay's checkout and webhook
+  handlers do) invalidates the row's ``user_id``, or every user when the row
+  has none;
+* ``touch(db, user_ids)`` does the same for changes made some other way, and
+  ``cache.invalidate`` / ``cache.clear`` act immediately.
+
+Other worker processes see a change when their entry expires, so the TTL
+bounds how stale a check can be.
+"""
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.exceptions import HTTPException
+
+TTL_SECONDS = float(os.environ.get("SUBSCRIPTION_CACHE_TTL_SECONDS", 60))
+DENIED_TTL_SECONDS = float(os.environ.get("SUBSCRIPTION_CACHE_DENIED_TTL_SECONDS", 5))
+MAX_ENTRIES = int(os.environ.get("SUBSCRIPTION_CACHE_MAX_ENTRIES", 50000))
+BILLING_TABLE_WORDS = ("subscription", "customer", "payment")
+
+
+class SubscriptionCache:
+    def __init__(self, ttl: float = TTL_SECONDS, denied_ttl: float = DENIED_TTL_SECONDS,
+                 max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.denied_ttl = denied_ttl
+        self.max_entries = max_entries
+        # user id -> (expires at, subscription, error raised)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Bumped by every invalidation so a check that was in flight meanwhile is not stored
+        self._version = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def check(self, user_id: Any, load: Callable[[], Awaitable[Any]]) -> Any:
+        """The cached outcome of ``load()`` for ``user_id``: its result, or the HTTP error it raised."""
+        if self.ttl <= 0:
+            return await load()
+        key = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                entry = None
+                self.misses += 1
+            version = self._version
+        if entry is not None:
+            if entry[2] is not None:
+                raise copy.copy(entry[2])
+            return entry[1]
+
+        try:
+            subscription = await load()
+        except HTTPException as e:
+            self._store(key, version, (now + self.denied_ttl, None, e))
+            raise
+        self._store(key, version, (now + self.ttl, subscription, None))
+        return subscription
+
+    def _store(self, key: str, version: int, entry: tuple):
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: Any):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+            self._version += 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version += 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "invalidations": self.invalidations}
+
+
+cache = SubscriptionCache()
+
+_DIRTY_KEY = "subscription_cache_dirty"
+_ALL = "*"
+
+
+def touch(db: Session, user_ids: Iterable[Optional[Any]]):
+    """Invalidate these users' cached checks once ``db`` commits (nothing happens on rollback)."""
+    db.info.setdefault(_DIRTY_KEY, set()).update(str(u) for u in user_ids if u is not None)
+
+
+def _is_billing_row(instance: Any) -> bool:
+    table = getattr(instance, "__tablename__", "") or ""
+    return any(word in table.lower() for word in BILLING_TABLE_WORDS)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_billing_changes(session: Session, flush_context):
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if _is_billing_row(instance):
+            user_id = getattr(instance, "user_id", None)
+            session.info.setdefault(_DIRTY_KEY, set()).add(_ALL if user_id is None else str(user_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    dirty = session.info.pop(_DIRTY_KEY, ())
+    if _ALL in dirty:
+        cache.clear()
+        return
+    for user_id in dirty:
+        cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session):
+    session.info.pop(_DIRTY_KEY, None)
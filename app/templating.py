@@ -0,0 +1,64 @@
+"""Shared Jinja2 environment for every HTML router.
+
+Compiled templates are written to a filesystem bytecode cache
+(``TEMPLATE_CACHE_DIR``), so a fresh worker loads base.html and friends
+without re-parsing them. ``auto_reload`` (an mtime check on every render) is
+only enabled when ``APP_ENV=development`` or ``TEMPLATE_AUTO_RELOAD=1``.
+
+Fill the cache at image build time with::
+
+    python -m app.templating precompile
+"""
+import os
+import sys
+import tempfile
+
+import jinja2
+from fastapi.templating import Jinja2Templates
+
+TEMPLATE_DIR = "app/templates"
+TEMPLATE_CACHE_DIR = os.environ.get(
+    "TEMPLATE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "social-pro-jinja")
+)
+
+
+def _flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes")
+
+
+def create_environment(cache_dir: str = TEMPLATE_CACHE_DIR) -> jinja2.Environment:
+    bytecode_cache = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        bytecode_cache = jinja2.FileSystemBytecodeCache(cache_dir)
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(TEMPLATE_DIR),
+        autoescape=True,
+        auto_reload=_flag("TEMPLATE_AUTO_RELOAD", os.environ.get("APP_ENV") == "development"),
+        bytecode_cache=bytecode_cache,
+    )
+
+
+def precompile(env: jinja2.Environment = None) -> int:
+    """Load every template so it lands in the bytecode (and in-memory) cache."""
+    env = env or templates.env
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+templates = Jinja2Templates(env=create_environment())
+
+# Optionally pay the compile cost at boot instead of on each page's first hit
+if _flag("TEMPLATE_PRECOMPILE", False):
+    precompile()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["precompile"]:
+        sys.exit("usage: python -m app.templating precompile")
+    print(f"Precompiled {precompile()} templates into {TEMPLATE_CACHE_DIR}")
@@ -0,0 +1,175 @@
+"""Event-loop responsiveness while AI Studio calls are in flight.
+
+Serves the AI Studio routes (auth stubbed out) and ``benchmarks/fake_gemini.py``
+with uvicorn, fires ``--requests`` concurrent calls at one AI endpoint and,
+meanwhile, pings a trivial route every ``--ping-interval-ms``. Reports the AI
+calls' wall time and the ping latency percentiles, then checks that calls
+whose client hangs up are cancelled upstream. Exits non-zero when ping p99
+exceeds ``--stall-budget-ms``.
+
+    python -m benchmarks.ai_concurrency --requests 50 --latency-ms 1000
+    python -m benchmarks.ai_concurrency --blocking   # the old synchronous call, for comparison
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+FORMS = {
+    "caption": {"description": "A product launch", "platform": "instagram"},
+    "generate": {"topic": "Sustainable fashion", "platform": "twitter"},
+    "hashtags": {"keyword": "Digital marketing"},
+    "repurpose": {"content": "We shipped dark mode today.", "target_platform": "linkedin"},
+}
+
+
+def configure_env(scratch_dir: str):
+    """Scratch database, and no cache or rate limits between the benchmark and the fake model."""
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{scratch_dir}/ai.db")
+    # Every call here repeats the same prompt; measure the model path, not the cache
+    os.environ.setdefault("AI_CACHE_ENABLED", "0")
+    for name in ("AI_RATE_PER_SECOND", "AI_RATE_BURST", "AI_USER_RATE_PER_MINUTE", "AI_USER_BURST"):
+        os.environ.setdefault(name, "1000000")
+
+
+class _User:
+    id = "bench"
+
+
+def _create_app(blocking: bool):
+    from fastapi import FastAPI
+    from app import ai_backends, ai_client, routes
+    from app.routes import ai_studio
+
+    if blocking:
+        class BlockingBackend(ai_backends.GeminiBackend):
+            async def generate(self, prompt):
+                # The old synchronous SDK call, which holds the event loop for the whole request
+                return self._completion(self.client.models.generate_content(model=self.model, contents=prompt))
+
+        def get_backend(loop=None):
+            client = ai_backends.get_client(loop)
+            return BlockingBackend(client) if client is not None else None
+
+        ai_client.get_backend = get_backend
+
+    app = FastAPI()
+    app.include_router(ai_studio.router)
+    app.dependency_overrides[routes.get_current_user] = lambda: _User()
+    app.dependency_overrides[routes.get_active_subscription] = lambda: None
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def _serve(app):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+async def _run(base_url, args):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.requests + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        stop = asyncio.Event()
+        pings = []
+
+        async def pinger():
+            while not stop.is_set():
+                started = time.perf_counter()
+                await client.get("/ping")
+                pings.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(args.ping_interval_ms / 1000)
+
+        async def call():
+            response = await client.post(f"/api/ai/{args.endpoint}", data=FORMS[args.endpoint])
+            return response.status_code
+
+        ping_task = asyncio.create_task(pinger())
+        await asyncio.sleep(0.2)
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(call() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await ping_task
+
+        async def abandoned_call():
+            try:
+                await client.post(f"/api/ai/{args.endpoint}", data=FORMS[args.endpoint],
+                                  timeout=args.latency_ms / 4000)
+            except httpx.TimeoutException:
+                pass
+
+        if not args.blocking:
+            await asyncio.gather(*(abandoned_call() for _ in range(args.disconnects)))
+            # Give the app's disconnect watcher and the fake's poll time to notice
+            await asyncio.sleep(args.latency_ms / 1000 + 0.5)
+    return statuses, elapsed, pings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.ai_concurrency")
+    parser.add_argument("--endpoint", choices=sorted(FORMS), default="caption")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=1000.0, help="fake model latency")
+    parser.add_argument("--ping-interval-ms", type=float, default=10.0)
+    parser.add_argument("--disconnects", type=int, default=10, help="calls abandoned by the client")
+    parser.add_argument("--stall-budget-ms", type=float, default=100.0)
+    parser.add_argument("--blocking", action="store_true", help="call the model synchronously (old behaviour)")
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.TemporaryDirectory()
+    configure_env(scratch.name)
+
+    from app import migrations
+    from app.database import engine
+    from benchmarks.fake_gemini import FakeGeminiServer
+
+    migrations.upgrade(engine)
+    with FakeGeminiServer(latency_ms=args.latency_ms) as fake:
+        os.environ["GOOGLE_API_KEY"] = "fake"
+        os.environ["GEMINI_BASE_URL"] = fake.url
+        server, base_url = _serve(_create_app(args.blocking))
+        try:
+            statuses, elapsed, pings = asyncio.run(_run(base_url, args))
+        finally:
+            server.should_exit = True
+        stats = dict(fake.stats)
+
+    codes = Counter(statuses)
+    print(f"{codes[200]}/{len(statuses)} {args.endpoint} calls OK in {elapsed:.2f}s "
+          f"(model latency {args.latency_ms:.0f} ms, {'blocking' if args.blocking else 'async'})"
+          + (f", statuses {dict(codes)}" if len(codes) > 1 or 200 not in codes else ""))
+    p99 = _percentile(pings, 0.99)
+    print(f"/ping during the calls: {len(pings)} requests  p50 {_percentile(pings, 0.5):.1f} ms  "
+          f"p99 {p99:.1f} ms  max {max(pings, default=0):.1f} ms")
+    if not args.blocking:
+        print(f"abandoned by client: {args.disconnects}, cancelled upstream: {stats['abandoned']}")
+    scratch.cleanup()
+    if p99 > args.stall_budget_ms:
+        print(f"ping p99 over budget ({args.stall_budget_ms:.0f} ms)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
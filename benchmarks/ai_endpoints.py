@@ -0,0 +1,165 @@
+"""Throughput and latency of the AI Studio endpoints against a fake model.
+
+Runs the app with ``AI_BACKEND=fake`` (app/ai_backends.py), so no key or
+network is needed, and drives ``/api/ai/generate``, ``/caption``,
+``/hashtags`` and ``/repurpose`` in turn with ``--concurrency`` clients until
+``--requests`` calls per endpoint have completed. For each endpoint it reports
+throughput, p50/p99 latency and failures, plus how long the server's event
+loop stalled meanwhile: a probe on the server loop sleeps
+``--probe-interval-ms`` and measures how late it wakes up.
+
+``--profile`` picks the fake's latency/streaming/error profile and
+``--latency-ms`` / ``--error-rate`` override it. ``--via-sdk`` routes calls
+through the real Gemini SDK to ``benchmarks/fake_gemini.py`` instead, to
+include the SDK's own overhead.
+
+    python -m benchmarks.ai_endpoints --concurrency 32 --requests 200
+    python -m benchmarks.ai_endpoints --profile flaky --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks.ai_concurrency import FORMS, _create_app, _percentile, _serve, configure_env
+
+ENDPOINTS = ["generate", "caption", "hashtags", "repurpose"]
+
+
+class LoopProbe:
+    """Measures how late a periodic timer fires on the loop it runs on."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lags = []
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - started - self.interval) * 1000)
+
+    def take(self):
+        lags, self.lags = self.lags, []
+        return lags
+
+
+async def _drive(client, endpoint: str, concurrency: int, requests: int):
+    latencies, statuses = [], Counter()
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"/api/ai/{endpoint}", data=FORMS[endpoint])
+                statuses[response.status_code] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+async def _run(base_url, probe, args):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        # Warm up at full concurrency: the first calls import the SDK, build clients and open connections
+        await _drive(client, "caption", args.concurrency, args.concurrency)
+        for endpoint in args.endpoints:
+            probe.take()
+            results[endpoint] = (*await _drive(client, endpoint, args.concurrency, args.requests), probe.take())
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.ai_endpoints")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200, help="calls per endpoint")
+    parser.add_argument("--profile", default="typical", help="fake model profile (app/ai_backends.py FAKE_PROFILES)")
+    parser.add_argument("--latency-ms", type=float, help="override the profile's model latency")
+    parser.add_argument("--error-rate", type=float, help="override the profile's error rate")
+    parser.add_argument("--via-sdk", action="store_true", help="call benchmarks/fake_gemini.py through the SDK")
+    parser.add_argument("--probe-interval-ms", type=float, default=5.0)
+    parser.add_argument("--stall-budget-ms", type=float, default=50.0, help="fail when the worst stall exceeds this")
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.TemporaryDirectory()
+    configure_env(scratch.name)
+    os.environ.setdefault("IDEA_INDEX_DIR", os.path.join(scratch.name, "idea-index"))
+    os.environ["AI_FAKE_PROFILE"] = args.profile
+    if args.latency_ms is not None:
+        os.environ["AI_FAKE_LATENCY_MS"] = str(args.latency_ms)
+    if args.error_rate is not None:
+        os.environ["AI_FAKE_ERROR_RATE"] = str(args.error_rate)
+
+    # Read when app.ai_backends is imported
+    os.environ["AI_BACKEND"] = "gemini" if args.via_sdk else "fake"
+    fake_server = None
+    if args.via_sdk:
+        from app.ai_backends import FAKE_PROFILES
+        from benchmarks.fake_gemini import FakeGeminiServer
+
+        profile = FAKE_PROFILES[args.profile]
+        fake_server = FakeGeminiServer(
+            latency_ms=args.latency_ms if args.latency_ms is not None else profile["latency_ms"],
+            chunks=profile["chunks"],
+            error_rate=args.error_rate if args.error_rate is not None else profile["error_rate"],
+        ).__enter__()
+        os.environ["GOOGLE_API_KEY"] = "fake"
+        os.environ["GEMINI_BASE_URL"] = fake_server.url
+
+    from app import migrations
+    from app.database import engine
+
+    migrations.upgrade(engine)
+    probe = LoopProbe(args.probe_interval_ms / 1000)
+    app = _create_app(blocking=False)
+
+    async def start_probe():
+        app.state.probe = asyncio.ensure_future(probe.run())
+
+    app.add_event_handler("startup", start_probe)
+
+    server, base_url = _serve(app)
+    try:
+        results = asyncio.run(_run(base_url, probe, args))
+    finally:
+        server.should_exit = True
+        if fake_server is not None:
+            fake_server.__exit__(None, None, None)
+
+    backend = "SDK -> fake_gemini" if args.via_sdk else "AI_BACKEND=fake"
+    print(f"{backend}, profile {args.profile}, concurrency {args.concurrency}, {args.requests} calls per endpoint")
+    print(f"{'endpoint':<10} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'failed':>7}   "
+          f"{'stall max':>9} {'p99':>6} {'total':>8}")
+    worst = 0.0
+    for endpoint, (latencies, statuses, elapsed, lags) in results.items():
+        failed = sum(n for status, n in statuses.items() if status != 200)
+        stalled = sum(lag for lag in lags if lag > args.probe_interval_ms)
+        worst = max(worst, max(lags, default=0.0))
+        print(f"{endpoint:<10} {statuses[200] / elapsed:8.1f} {_percentile(latencies, 0.5):9.1f} "
+              f"{_percentile(latencies, 0.99):9.1f} {failed:7d}   {max(lags, default=0.0):7.1f}ms "
+              f"{_percentile(lags, 0.99):5.1f} {stalled:6.0f}ms"
+              + (f"  statuses {dict(statuses)}" if failed else ""))
+    scratch.cleanup()
+    if worst > args.stall_budget_ms:
+        print(f"event loop stalled {worst:.1f} ms, over budget ({args.stall_budget_ms:.0f} ms)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Time to first token of the streaming AI Studio endpoints.
+
+Serves the AI Studio routes against ``benchmarks/fake_gemini.py`` (which
+spreads ``--latency-ms`` over ``--chunks`` SSE chunks) and, for caption,
+repurpose and idea generation, compares the plain endpoint's response time
+with the streaming variant's time to the first ``chunk``/``idea`` event and
+to ``done``, as seen by the client.
+
+    python -m benchmarks.ai_streaming --latency-ms 2000 --chunks 20 --iterations 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.ai_concurrency import FORMS, _create_app, _serve, configure_env
+
+ENDPOINTS = ["caption", "repurpose", "generate"]
+
+
+async def _measure(client, endpoint: str, iterations: int):
+    plain, first, total = [], [], []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = await client.post(f"/api/ai/{endpoint}", data=FORMS[endpoint])
+        response.raise_for_status()
+        plain.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        first_at = None
+        async with client.stream("POST", f"/api/ai/{endpoint}/stream", data=FORMS[endpoint]) as response:
+            async for line in response.aiter_lines():
+                if first_at is None and line in ("event: chunk", "event: idea"):
+                    first_at = time.perf_counter()
+                if line == "event: error":
+                    raise RuntimeError(f"{endpoint} stream failed")
+        total.append((time.perf_counter() - started) * 1000)
+        first.append(((first_at or time.perf_counter()) - started) * 1000)
+    return statistics.median(plain), statistics.median(first), statistics.median(total)
+
+
+async def _run(base_url, args):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        return {endpoint: await _measure(client, endpoint, args.iterations) for endpoint in ENDPOINTS}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.ai_streaming")
+    parser.add_argument("--latency-ms", type=float, default=2000.0, help="fake model time for a whole answer")
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.TemporaryDirectory()
+    configure_env(scratch.name)
+
+    from app import migrations
+    from app.database import engine
+    from benchmarks.fake_gemini import FakeGeminiServer
+
+    migrations.upgrade(engine)
+    with FakeGeminiServer(latency_ms=args.latency_ms, chunks=args.chunks) as fake:
+        os.environ["GOOGLE_API_KEY"] = "fake"
+        os.environ["GEMINI_BASE_URL"] = fake.url
+        server, base_url = _serve(_create_app(blocking=False))
+        try:
+            results = asyncio.run(_run(base_url, args))
+        finally:
+            server.should_exit = True
+
+    print(f"model latency {args.latency_ms:.0f} ms over {args.chunks} chunks, median of {args.iterations}")
+    for endpoint, (plain, first, total) in results.items():
+        print(f"{endpoint:<10} plain {plain:7.1f} ms   stream: first event {first:7.1f} ms  done {total:7.1f} ms")
+    scratch.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,463 @@
+"""Synthetic dataset at scale, shaped like the demo workspace in app/seed.py.
+
+Generates ``--users`` tenants with ``--accounts`` social accounts each and
+``--posts`` posts in total, plus a metrics row per published post, an
+audience snapshot per account every ``--snapshot-days`` over ``--days`` of
+history, and each tenant's hashtag groups, calendar entries and AI ideas.
+Everything is built from the seed's templates (accounts, post texts and
+types, hashtag groups, peak hours, ideas) with skewed, seeded distributions:
+
+* posts per account follow a Pareto law, so a few accounts hold most posts;
+* followers are log-normal; impressions scale with followers, and likes,
+  comments, shares and clicks with a per-account engagement rate;
+* publish times cluster around the seed's peak hours, and statuses are
+  mostly published, then drafts, scheduled and failed;
+* each tenant draws hashtags from the seed tags plus ``--tags`` long-tail
+  tags of its own (random word-like strings), with Zipf-like popularity.
+
+Rows are written in ``--chunk``-row batches: ``COPY`` on Postgres, Core
+``executemany`` inserts elsewhere. Ids are assigned here, so posts, metrics
+and snapshots need no ``RETURNING`` round trips. Derived tables (hashtag
+links and stats, fingerprints, co-occurrence) are then built with the app's
+own hooks unless ``--no-derive`` is given. Each tenant gets a
+``user_onboarding`` row so that visiting the dashboard does not add the demo
+workspace on top.
+
+The target is ``DATABASE_URL`` (or ``--database-url``), migrated first:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.dataset --users 1000 --accounts 3 --posts 3000000
+
+Benchmarks that read ``DATABASE_URL`` run against such a database as is.
+``fixture(spec, path)`` gives benchmarks a private SQLite copy of a dataset
+that is built once and cached under ``DATASET_CACHE_DIR``.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import itertools
+import json
+import math
+import os
+import random
+import re
+import shutil
+import string
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Sequence
+
+PLATFORMS = ["twitter", "instagram", "linkedin", "facebook", "tiktok"]
+POST_TYPES = {
+    "twitter": ["text", "text", "text", "image", "video"],
+    "instagram": ["image", "image", "carousel", "video", "story"],
+    "linkedin": ["text", "text", "image", "carousel"],
+    "facebook": ["text", "image", "image", "video"],
+    "tiktok": ["video"],
+}
+MEDIA_TYPES = {"image", "carousel", "video", "story"}
+STATUSES = ["published", "draft", "scheduled", "failed"]
+STATUS_WEIGHTS = [0.70, 0.17, 0.08, 0.05]
+TAIL_TAGS = 300
+# Bump when the generated data changes, so cached fixtures are rebuilt
+GENERATOR_VERSION = 2
+CACHE_DIR = os.environ.get("DATASET_CACHE_DIR", os.path.join(tempfile.gettempdir(), "social-pro-datasets"))
+
+
+@dataclass(frozen=True)
+class Spec:
+    users: int = 10
+    accounts: int = 2
+    posts: int = 10000
+    days: int = 365
+    snapshot_days: int = 1
+    ideas: int = 20
+    tags: int = TAIL_TAGS
+    seed: int = 42
+    user_prefix: str = "synthetic-"
+    derive: bool = True
+
+    def rows(self) -> int:
+        """Rough row count of the base tables, for progress and sizing."""
+        snapshots = self.users * self.accounts * (self.days // self.snapshot_days)
+        return self.posts * 2 + snapshots + self.users * (self.accounts + self.ideas + 9)
+
+    def key(self) -> str:
+        data = {**asdict(self), "generator": GENERATOR_VERSION}
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Writer:
+    """Appends rows to tables in chunks on one connection, one transaction per chunk."""
+
+    def __init__(self, engine, chunk: int):
+        self.engine = engine
+        self.chunk = chunk
+        self.copy = engine.dialect.name == "postgresql"
+        self.counts = {}
+
+    def next_id(self, table) -> int:
+        from sqlalchemy import func, select
+
+        with self.engine.connect() as conn:
+            return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+    def write(self, table, columns: Sequence[str], rows: Iterable[tuple]):
+        for chunk in _chunks(rows, self.chunk):
+            with self.engine.begin() as conn:
+                if self.copy:
+                    self._copy(conn, table, columns, chunk)
+                else:
+                    conn.execute(table.insert(), [dict(zip(columns, row)) for row in chunk])
+            self.counts[table.name] = self.counts.get(table.name, 0) + len(chunk)
+
+    @staticmethod
+    def _copy(conn, table, columns: Sequence[str], chunk: List[tuple]):
+        # COPY skips the models' Python-side defaults that Core inserts would apply
+        defaults = [(c.name, c.default.arg) for c in table.c
+                    if c.name not in columns and c.default is not None and c.default.is_scalar]
+        extra = tuple(value for _, value in defaults)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in chunk:
+            # An unquoted empty field is NULL in COPY's CSV format
+            writer.writerow(["" if value is None else value for value in row + extra])
+        buffer.seek(0)
+        names = ", ".join([*columns, *(name for name, _ in defaults)])
+        cursor = conn.connection.dbapi_connection.cursor()
+        cursor.copy_expert(f"COPY {table.name} ({names}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    def reset_sequences(self, tables):
+        if not self.copy:
+            return
+        from sqlalchemy import text
+
+        with self.engine.begin() as conn:
+            for table in tables:
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"
+                ))
+
+
+class Generator:
+    def __init__(self, spec: Spec):
+        from app import seed
+
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+        self.now = datetime.now().replace(microsecond=0)
+        self.templates = seed.seed_posts(0, 1)
+        text = " ".join([p["content"] for p in self.templates] + [i["content"] for i in seed.AI_IDEAS])
+        self.words = sorted(set(re.findall(r"[A-Za-z']{3,}", text)))
+        self.seed_tags = sorted({
+            tag for group in seed.HASHTAG_GROUPS for tag in json.loads(group["hashtags"])
+        } | {tag for p in self.templates for tag in (p.get("hashtags") or "").split()})
+        self.peak_hours = [int(h.split(":")[0]) for h in seed.PEAK_HOURS]
+        self.accounts = []  # (id, user_id, platform, followers, engagement rate)
+        self.tag_pools = {}
+
+    # -- tenants and accounts ------------------------------------------------
+
+    def users(self) -> List[str]:
+        return [f"{self.spec.user_prefix}{n}" for n in range(1, self.spec.users + 1)]
+
+    def account_rows(self, first_id: int) -> Iterator[tuple]:
+        from app import seed
+
+        rng = self.rng
+        account_id = first_id
+        for user_id in self.users():
+            for k in range(self.spec.accounts):
+                template = seed.ACCOUNTS[k % len(seed.ACCOUNTS)]
+                platform = PLATFORMS[k % len(PLATFORMS)]
+                followers = int(rng.lognormvariate(math.log(5000), 1.5))
+                engagement = max(0.3, rng.gauss(3.5, 1.2))
+                self.accounts.append((account_id, user_id, platform, followers, engagement))
+                yield (account_id, user_id, platform, f"{template['account_name']}{account_id}", template["avatar_url"],
+                       followers, int(rng.lognormvariate(math.log(800), 0.8)), "connected")
+                account_id += 1
+
+    # -- posts and metrics ---------------------------------------------------
+
+    def _post_counts(self) -> List[int]:
+        weights = [self.rng.paretovariate(1.16) for _ in self.accounts]
+        total = sum(weights)
+        counts = [int(self.spec.posts * w / total) for w in weights]
+        counts[weights.index(max(weights))] += self.spec.posts - sum(counts)
+        return counts
+
+    def _tag_pool(self, user_id: str) -> List[str]:
+        if user_id not in self.tag_pools:
+            # A per-tenant generator keeps each tenant's tail the same whatever the other spec fields
+            rng = random.Random(f"{self.spec.seed}:{user_id}")
+            tail = ("#" + "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 14)))
+                    for _ in range(self.spec.tags))
+            self.tag_pools[user_id] = list(dict.fromkeys(itertools.chain(self.seed_tags, tail)))
+        return self.tag_pools[user_id]
+
+    def _content(self, template: dict) -> str:
+        words = self.rng.choices(self.words, k=self.rng.randint(6, 30))
+        return f"{template['content']} {' '.join(words)}"
+
+    def _publish_time(self) -> datetime:
+        rng = self.rng
+        day = self.now - timedelta(days=rng.random() * self.spec.days)
+        hour = rng.choice(self.peak_hours) if rng.random() < 0.7 else rng.randrange(24)
+        return day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+
+    def post_rows(self, first_id: int, metrics: list) -> Iterator[tuple]:
+        """Post rows; the metrics of published posts are appended to ``metrics`` as they are made."""
+        rng = self.rng
+        status_weights = list(itertools.accumulate(STATUS_WEIGHTS))
+        post_id = first_id
+        for (account_id, user_id, platform, followers, engagement), count in zip(self.accounts, self._post_counts()):
+            pool = self._tag_pool(user_id)
+            tag_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(pool))))
+            for _ in range(count):
+                template = rng.choice(self.templates)
+                post_type = rng.choice(POST_TYPES[platform])
+                status = rng.choices(STATUSES, cum_weights=status_weights)[0]
+                tags = " ".join(dict.fromkeys(rng.choices(pool, cum_weights=tag_weights, k=rng.choice((0, 1, 2, 3, 3, 4, 5)))))
+                media = (f"https://placehold.co/600x400?text=post+{post_id}" if post_type in MEDIA_TYPES else None)
+                scheduled_at = published_at = last_error = None
+                if status == "published":
+                    published_at = self._publish_time()
+                    created_at = published_at - timedelta(hours=rng.random() * 72)
+                    metrics.append(self._metric(post_id, followers, engagement, published_at))
+                elif status == "scheduled":
+                    scheduled_at = self.now + timedelta(days=rng.random() * 30)
+                    created_at = self.now - timedelta(days=rng.random() * 14)
+                elif status == "failed":
+                    scheduled_at = self._publish_time()
+                    created_at = scheduled_at - timedelta(hours=rng.random() * 72)
+                    last_error = "Platform rejected the post"
+                else:
+                    created_at = self.now - timedelta(days=rng.random() * self.spec.days)
+                yield (post_id, user_id, account_id, self._content(template), media, post_type, status,
+                       scheduled_at, published_at, tags or None, 0, last_error,
+                       created_at, published_at or created_at)
+                post_id += 1
+
+    def _metric(self, post_id: int, followers: int, engagement: float, published_at: datetime) -> tuple:
+        rng = self.rng
+        impressions = max(10, int(followers * rng.lognormvariate(-0.5, 0.9)))
+        reach = int(impressions * rng.uniform(0.6, 0.95))
+        interactions = reach * engagement / 100 * rng.lognormvariate(0, 0.4)
+        likes = int(interactions * 0.8)
+        comments = int(interactions * 0.08)
+        shares = int(interactions * 0.12)
+        clicks = int(reach * rng.uniform(0.005, 0.03))
+        rate = round((likes + comments + shares) / reach * 100, 2) if reach else 0.0
+        return (post_id, likes, comments, shares, impressions, reach, clicks, rate,
+                published_at + timedelta(days=rng.uniform(0.5, 3)))
+
+    # -- snapshots and the rest ----------------------------------------------
+
+    def snapshot_rows(self, first_id: int) -> Iterator[tuple]:
+        rng = self.rng
+        peak_hours = json.dumps([f"{h:02d}:00" for h in self.peak_hours])
+        steps = self.spec.days // self.spec.snapshot_days
+        snapshot_id = first_id
+        for account_id, _, platform, followers, engagement in self.accounts:
+            start = followers * rng.uniform(0.5, 0.9)
+            following = int(rng.lognormvariate(math.log(800), 0.8))
+            top_type = POST_TYPES[platform][0]
+            previous = start
+            for step in range(steps):
+                progress = step / max(steps - 1, 1)
+                count = int((start + (followers - start) * progress) * rng.uniform(0.995, 1.005))
+                growth = round((count - previous) / previous * 100, 3) if previous else 0.0
+                previous = count
+                day = (self.now - timedelta(days=(steps - 1 - step) * self.spec.snapshot_days)).date()
+                yield (snapshot_id, account_id, day, count, following + step // 10,
+                       round(max(0.1, engagement + rng.gauss(0, 0.3)), 2), top_type, growth, peak_hours)
+                snapshot_id += 1
+
+    def group_rows(self) -> Iterator[tuple]:
+        from app import seed
+
+        for user_id in self.users():
+            for group in seed.HASHTAG_GROUPS:
+                yield (user_id, group["name"], group["hashtags"], group["category"], group["avg_reach"])
+
+    def calendar_rows(self) -> Iterator[tuple]:
+        from app import seed
+
+        months = max(1, self.spec.days // 30)
+        for user_id in self.users():
+            for month in range(months):
+                first = (self.now - timedelta(days=30 * month)).date().replace(day=1)
+                for i, entry in enumerate(seed.CALENDAR_ENTRIES):
+                    yield (user_id, entry["title"], first.replace(day=3 + i * 5), entry["category"], entry["color"])
+
+    def idea_rows(self) -> Iterator[tuple]:
+        from app import seed
+
+        for user_id in self.users():
+            for n in range(self.spec.ideas):
+                idea = seed.AI_IDEAS[n % len(seed.AI_IDEAS)]
+                content = f"{idea['content']} {' '.join(self.rng.choices(self.words, k=8))}"
+                yield (user_id, idea["platform"], idea["idea_type"], idea["title"], content, idea["tone"],
+                       "synthetic", self.rng.random() < 0.2)
+
+
+def generate(engine, spec: Spec, chunk: int = 10000, log=print) -> dict:
+    """Append ``spec``'s dataset to the (migrated) database behind ``engine``; returns row counts."""
+    from sqlalchemy import event, select
+    from sqlalchemy.orm import Session
+
+    from app.models import (AIContentIdea, AudienceSnapshot, ContentCalendar, HashtagGroup, Post, PostMetric,
+                            SocialAccount, UserOnboarding)
+
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _fast_load(dbapi_connection, record):
+            # Load speed over durability: only an OS crash mid-load could corrupt the file
+            dbapi_connection.execute("PRAGMA synchronous=OFF")
+
+        engine.dispose()
+
+    started = time.perf_counter()
+    writer = Writer(engine, chunk)
+    gen = Generator(spec)
+
+    def step(name: str):
+        log(f"{name:<12} {sum(writer.counts.values()):>12,} rows  {time.perf_counter() - started:8.1f}s")
+
+    writer.write(UserOnboarding.__table__, ["user_id", "seeded"], ((u, False) for u in gen.users()))
+    writer.write(SocialAccount.__table__,
+                 ["id", "user_id", "platform", "account_name", "avatar_url", "followers_count", "following_count",
+                  "status"],
+                 gen.account_rows(writer.next_id(SocialAccount.__table__)))
+    step("accounts")
+
+    metrics = []
+    first_post = writer.next_id(Post.__table__)
+    metric_id = writer.next_id(PostMetric.__table__)
+    post_columns = ["id", "user_id", "account_id", "content", "media_urls", "post_type", "status", "scheduled_at",
+                    "published_at", "hashtags", "publish_attempts", "last_error", "created_at", "updated_at"]
+    metric_columns = ["id", "post_id", "likes", "comments", "shares", "impressions", "reach", "clicks",
+                      "engagement_rate", "recorded_at"]
+    # Metrics are made alongside their posts and written after each post chunk, which bounds memory
+    for posts in _chunks(gen.post_rows(first_post, metrics), chunk):
+        writer.write(Post.__table__, post_columns, posts)
+        writer.write(PostMetric.__table__, metric_columns,
+                     [(metric_id + i, *row) for i, row in enumerate(metrics)])
+        metric_id += len(metrics)
+        metrics.clear()
+        step("posts")
+
+    writer.write(AudienceSnapshot.__table__,
+                 ["id", "account_id", "snapshot_date", "followers", "following", "engagement_rate", "top_post_type",
+                  "audience_growth", "peak_hours"],
+                 gen.snapshot_rows(writer.next_id(AudienceSnapshot.__table__)))
+    step("snapshots")
+    writer.write(HashtagGroup.__table__, ["user_id", "name", "hashtags", "category", "avg_reach"], gen.group_rows())
+    writer.write(ContentCalendar.__table__, ["user_id", "title", "date", "category", "color"], gen.calendar_rows())
+    writer.write(AIContentIdea.__table__,
+                 ["user_id", "platform", "idea_type", "title", "content", "tone", "model_used", "used"],
+                 gen.idea_rows())
+    writer.reset_sequences([SocialAccount.__table__, Post.__table__, PostMetric.__table__,
+                            AudienceSnapshot.__table__])
+    step("other")
+
+    if spec.derive:
+        from app import hashtag_graph, hashtag_metrics, post_hooks
+        from app.hashtags import sync_groups
+
+        users = gen.users()
+        for post_ids in _chunks(range(first_post, first_post + spec.posts), chunk):
+            with Session(engine) as db:
+                post_hooks.posts_saved(db, post_ids)
+                db.commit()
+            log(f"{'derived':<12} {post_ids[-1] - first_post + 1:>12,} posts {time.perf_counter() - started:8.1f}s")
+        with Session(engine) as db:
+            groups = db.execute(select(HashtagGroup.id).where(HashtagGroup.user_id.in_(users))).scalars().all()
+            for group_ids in _chunks(groups, chunk):
+                sync_groups(db, group_ids)
+            hashtag_metrics.rebuild(db)
+            hashtag_graph.rebuild(db)
+            db.commit()
+        step("derived")
+    return dict(writer.counts)
+
+
+def fixture(spec: Spec, path: str, chunk: int = 10000) -> str:
+    """Copy ``spec``'s dataset to the SQLite file ``path`` and return its URL.
+
+    The dataset is built once per spec and schema version under
+    ``DATASET_CACHE_DIR``; each caller gets its own copy to modify.
+    """
+    from sqlalchemy import create_engine
+
+    from app import migrations
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cached = os.path.join(CACHE_DIR, f"{spec.key()}-v{migrations.head_version()}.db")
+    if not os.path.exists(cached):
+        building = f"{cached}.{os.getpid()}.tmp"
+        engine = create_engine(f"sqlite:///{building}")
+        migrations.upgrade(engine)
+        generate(engine, spec, chunk, log=lambda line: None)
+        engine.dispose()
+        os.replace(building, cached)
+        os.remove(f"{building}.migrate.lock")
+    shutil.copyfile(cached, path)
+    return f"sqlite:///{path}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.dataset")
+    parser.add_argument("--users", type=int, default=Spec.users)
+    parser.add_argument("--accounts", type=int, default=Spec.accounts, help="accounts per user")
+    parser.add_argument("--posts", type=int, default=Spec.posts, help="posts in total")
+    parser.add_argument("--days", type=int, default=Spec.days, help="days of history")
+    parser.add_argument("--snapshot-days", type=int, default=Spec.snapshot_days, help="days between snapshots")
+    parser.add_argument("--ideas", type=int, default=Spec.ideas, help="AI ideas per user")
+    parser.add_argument("--tags", type=int, default=Spec.tags, help="long-tail hashtags per user")
+    parser.add_argument("--seed", type=int, default=Spec.seed)
+    parser.add_argument("--user-prefix", default=Spec.user_prefix)
+    parser.add_argument("--no-derive", dest="derive", action="store_false",
+                        help="skip hashtag links, stats and fingerprints")
+    parser.add_argument("--chunk", type=int, default=10000, help="rows per insert/COPY batch")
+    parser.add_argument("--database-url", help="default: DATABASE_URL")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    if not os.environ.get("DATABASE_URL"):
+        parser.error("set DATABASE_URL or pass --database-url")
+
+    from app import migrations
+    from app.database import engine
+
+    spec = Spec(users=args.users, accounts=args.accounts, posts=args.posts, days=args.days,
+                snapshot_days=args.snapshot_days, ideas=args.ideas, tags=args.tags, seed=args.seed, user_prefix=args.user_prefix,
+                derive=args.derive)
+    migrations.upgrade(engine)
+    print(f"generating ~{spec.rows():,} rows into {engine.url.render_as_string(hide_password=True)}")
+    started = time.perf_counter()
+    counts = generate(engine, spec, args.chunk)
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(f"{total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s): {counts}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""A local stand-in for the Gemini REST API.
+
+Serves ``POST /{version}/models/{model}:generateContent`` and
+``:streamGenerateContent?alt=sse`` with a fixed latency and the canned
+answers of app/ai_backends.py's fake backend, so the real SDK (and its HTTP
+path) can be pointed at it with ``GEMINI_BASE_URL``. For load tests that do
+not need the SDK, ``AI_BACKEND=fake`` fakes the model in-process instead.
+``--error-rate`` makes that fraction of calls fail with 429 or 503 to
+exercise retries::
+
+    python -m benchmarks.fake_gemini --port 8089 --latency-ms 800
+
+``stats`` counts calls that completed, failed on purpose, and whose client
+hung up before the answer was ready.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.ai_backends import answer_for
+
+# Sleep in slices so an abandoned call is noticed promptly
+_POLL_SECONDS = 0.01
+
+
+def _chunk(text: str, finished: bool) -> dict:
+    chunk = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}]}
+    if finished:
+        chunk["candidates"][0]["finishReason"] = "STOP"
+        chunk["usageMetadata"] = {"promptTokenCount": 20, "candidatesTokenCount": 40, "totalTokenCount": 60}
+    return chunk
+
+
+def create_app(latency_ms: float = 500.0, chunks: int = 8, error_rate: float = 0.0, seed: int = 0) -> Starlette:
+    stats = {"completed": 0, "failed": 0, "abandoned": 0}
+    rng = random.Random(seed)
+
+    async def wait(request: Request, seconds: float) -> bool:
+        """Sleep ``seconds``; False if the client went away meanwhile."""
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if await request.is_disconnected():
+                stats["abandoned"] += 1
+                return False
+            await asyncio.sleep(min(_POLL_SECONDS, max(0.0, deadline - time.monotonic())))
+        return True
+
+    async def models(request: Request):
+        action = request.path_params["target"].partition(":")[2]
+        body = await request.json()
+        prompt = "".join(
+            part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])
+        )
+        text = answer_for(prompt)
+        if error_rate and rng.random() < error_rate:
+            stats["failed"] += 1
+            code, status = rng.choice([(429, "RESOURCE_EXHAUSTED"), (503, "UNAVAILABLE")])
+            return JSONResponse({"error": {"code": code, "message": "fake failure", "status": status}}, status_code=code)
+        if action == "generateContent":
+            if not await wait(request, latency_ms / 1000):
+                return JSONResponse({}, status_code=499)
+            stats["completed"] += 1
+            return JSONResponse(_chunk(text, finished=True))
+        if action != "streamGenerateContent":
+            return JSONResponse({"error": {"code": 404, "message": f"unknown action {action}"}}, status_code=404)
+        size = max(1, -(-len(text) // chunks))
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+
+        async def events():
+            for i, piece in enumerate(pieces):
+                if not await wait(request, latency_ms / 1000 / len(pieces)):
+                    return
+                yield f"data: {json.dumps(_chunk(piece, finished=i == len(pieces) - 1))}\r\n\r\n"
+            stats["completed"] += 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    app = Starlette(routes=[Route("/{version}/models/{target:path}", models, methods=["POST"])])
+    app.state.stats = stats
+    return app
+
+
+class FakeGeminiServer:
+    """Run the fake in a background thread: ``with FakeGeminiServer(...) as server: server.url``."""
+
+    def __init__(self, latency_ms: float = 500.0, chunks: int = 8, error_rate: float = 0.0, port: int = 0):
+        import uvicorn
+
+        self.app = create_app(latency_ms, chunks, error_rate)
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def stats(self) -> dict:
+        return self.app.state.stats
+
+    @property
+    def url(self) -> str:
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.fake_gemini")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--chunks", type=int, default=8, help="SSE chunks per streamed answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 429/503")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    print(f"Fake Gemini on http://127.0.0.1:{args.port} (set GEMINI_BASE_URL to this)")
+    uvicorn.run(create_app(args.latency_ms, args.chunks, args.error_rate), host="127.0.0.1", port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
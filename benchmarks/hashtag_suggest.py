@@ -0,0 +1,81 @@
+"""Hashtag autocomplete latency (app/hashtag_suggest.py).
+
+Runs against a cached synthetic dataset (benchmarks/dataset.py) of
+``--tenants`` tenants sharing ``--posts`` posts, each drawing on ``--tags``
+long-tail hashtags of its own, or against ``DATABASE_URL`` as is. Reports the
+index load time for the tenant with the most hashtags and the per-query
+latency of 1-, 2- and 3-character prefixes, plus the memory bound behaviour
+across every tenant.
+
+    python -m benchmarks.hashtag_suggest --tenants 20 --posts 200000 --tags 20000 --queries 20000
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.hashtag_suggest")
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--posts", type=int, default=200000, help="posts in total (not used with DATABASE_URL)")
+    parser.add_argument("--tags", type=int, default=20000,
+                        help="long-tail hashtags per tenant (not used with DATABASE_URL)")
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--max-entries", type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.TemporaryDirectory()
+    path = f"{scratch.name}/suggest.db"
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{path}")
+    if os.environ["DATABASE_URL"] == f"sqlite:///{path}":
+        from benchmarks.dataset import Spec, fixture
+
+        fixture(Spec(users=args.tenants, accounts=2, posts=args.posts, tags=args.tags), path)
+
+    from sqlalchemy import func, select
+    from app import migrations
+    from app.database import SessionLocal, engine
+    from app.hashtag_suggest import HashtagSuggester
+    from app.models import Hashtag
+
+    migrations.upgrade(engine)
+    rng = random.Random(42)
+    with SessionLocal() as db:
+        tenants = db.execute(
+            select(Hashtag.user_id, func.count()).group_by(Hashtag.user_id).order_by(func.count().desc())
+        ).all()
+        if not tenants:
+            parser.error("the database has no hashtags")
+        user_id, count = tenants[0]
+
+        suggester = HashtagSuggester(max_entries=args.max_entries)
+        started = time.perf_counter()
+        suggester.index_for(db, user_id)
+        print(f"loaded {count} tags for {user_id} in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        for length in (1, 2, 3):
+            prefixes = ["".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+                        for _ in range(args.queries)]
+            timings = []
+            for prefix in prefixes:
+                started = time.perf_counter()
+                suggester.suggest(db, user_id, prefix, limit=10)
+                timings.append((time.perf_counter() - started) * 1e6)
+            timings.sort()
+            print(f"prefix len {length}: mean {statistics.mean(timings):.1f} us  "
+                  f"p50 {timings[len(timings) // 2]:.1f} us  p99 {timings[int(len(timings) * 0.99)]:.1f} us")
+
+        for tenant, _ in tenants:
+            suggester.suggest(db, tenant, "a")
+        print(f"after touching {len(tenants)} tenants: {suggester.stats()}")
+    scratch.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
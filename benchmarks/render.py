@@ -0,0 +1,108 @@
+"""Template compile and render timings for the busiest pages.
+
+For dashboard.html and posts/list.html this reports:
+
+* cold compile: a fresh environment with no bytecode cache,
+* bytecode load: a fresh environment reading the filesystem bytecode cache,
+* steady-state render time per page (mean / p50 / p99).
+
+The contexts are built in memory rather than loaded from a dataset, so the
+timings cover template work only.
+
+    python -m benchmarks.render --iterations 2000 --posts 50
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from starlette.requests import Request
+
+from app.templating import create_environment
+
+PAGES = ["dashboard.html", "posts/list.html"]
+
+
+def _request(path: str) -> Request:
+    return Request({
+        "type": "http", "method": "GET", "path": path, "root_path": "", "scheme": "http",
+        "query_string": b"", "headers": [], "server": ("localhost", 8000),
+    })
+
+
+def _contexts(post_count: int):
+    now = datetime.now()
+    account = SimpleNamespace(id=1, platform="instagram", account_name="@acme.official", followers_count=28700)
+    content = "5 tips for sustainable living, and why it matters for your brand " * 3
+    posts = [
+        SimpleNamespace(
+            id=i, account=account, account_id=1, status=("scheduled", "published", "draft")[i % 3],
+            content=content, content_prefix=content[:141],
+            platform=account.platform, account_name=account.account_name,
+            created_at=now, scheduled_at=now + timedelta(hours=i), published_at=now - timedelta(hours=i),
+            updated_at=now,
+        )
+        for i in range(post_count)
+    ]
+    ideas = [
+        SimpleNamespace(title=f"Idea {i}", content="Everyone says X. Here's why they're wrong...",
+                        platform="twitter", idea_type="hook")
+        for i in range(5)
+    ]
+    user = SimpleNamespace(id=1, email="bench@example.com")
+    return {
+        "dashboard.html": {
+            "request": _request("/"), "user": user, "upcoming_posts": posts[:10],
+            "total_followers": 41100, "ai_ideas": ideas, "accounts": [account],
+        },
+        "posts/list.html": {
+            "request": _request("/posts"), "user": user, "posts": posts, "tab": "all",
+            "counts": {"all": post_count, "drafts": 0, "scheduled": 0, "published": 0, "failed": 0},
+            "preview_chars": 140, "next_cursor": "bmV4dA==", "prev_cursor": None, "per_page": post_count,
+            "accounts": [account],
+        },
+    }
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.render")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=50, help="posts rendered per list page")
+    args = parser.parse_args(argv)
+
+    contexts = _contexts(args.posts)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for page in PAGES:
+            start = time.perf_counter()
+            create_environment(cache_dir="").get_template(page)
+            cold_ms = (time.perf_counter() - start) * 1000
+
+            create_environment(cache_dir=cache_dir).get_template(page)  # populate bytecode cache
+            start = time.perf_counter()
+            template = create_environment(cache_dir=cache_dir).get_template(page)
+            bytecode_ms = (time.perf_counter() - start) * 1000
+
+            samples = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                template.render(contexts[page])
+                samples.append((time.perf_counter() - start) * 1000)
+
+            print(f"{page}")
+            print(f"  cold compile      {cold_ms:8.2f} ms")
+            print(f"  bytecode load     {bytecode_ms:8.2f} ms")
+            print(f"  render mean       {statistics.mean(samples):8.3f} ms")
+            print(f"  render p50 / p99  {_percentile(samples, 50):8.3f} / {_percentile(samples, 99):.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
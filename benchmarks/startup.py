@@ -0,0 +1,100 @@
+"""Cold-start benchmark for app.main.
+
+Reports the slowest imports (``python -X importtime``) and the time from
+spawning uvicorn until ``/health`` first answers 200. Exits non-zero when a
+budget is exceeded, so it can gate CI. The budgets default to 1000 ms and
+3000 ms (``STARTUP_IMPORT_BUDGET_MS`` / ``STARTUP_READY_BUDGET_MS``)::
+
+    python -m benchmarks.startup --import-budget-ms 1000 --ready-budget-ms 3000
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+DEFAULT_IMPORT_BUDGET_MS = float(os.environ.get("STARTUP_IMPORT_BUDGET_MS", 1000))
+DEFAULT_READY_BUDGET_MS = float(os.environ.get("STARTUP_READY_BUDGET_MS", 3000))
+
+
+def measure_imports(module: str = "app.main"):
+    """Return (total_ms, [(cumulative_ms, self_ms, name), ...]) for importing ``module``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=os.environ.copy(),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us) / 1000, int(self_us) / 1000, name.rstrip()))
+    total = next((cum for cum, _, name in rows if name.strip() == module), 0.0)
+    return total, rows
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_health(timeout_s: float = 30.0) -> float:
+    """Spawn uvicorn and return milliseconds until GET /health returns 200."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=os.environ.copy(),
+    )
+    try:
+        while time.perf_counter() - start < timeout_s:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited early:\n{proc.stderr.read().decode()[-2000:]}")
+            try:
+                with urllib.request.urlopen(url, timeout=0.5) as resp:
+                    if resp.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"/health did not return 200 within {timeout_s}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    parser.add_argument("--import-budget-ms", type=float, default=DEFAULT_IMPORT_BUDGET_MS)
+    parser.add_argument("--ready-budget-ms", type=float, default=DEFAULT_READY_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to list")
+    parser.add_argument("--runs", type=int, default=3, help="take the best of N runs")
+    args = parser.parse_args(argv)
+
+    import_runs = [measure_imports() for _ in range(args.runs)]
+    import_ms, rows = min(import_runs, key=lambda r: r[0])
+    print(f"import app.main: {import_ms:.1f} ms (best of {args.runs})")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative, self_ms, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative:14.1f} {self_ms:9.1f}  {name}")
+
+    ready_ms = min(measure_first_health() for _ in range(args.runs))
+    print(f"\nspawn -> first 200 on /health: {ready_ms:.1f} ms (best of {args.runs})")
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import time {import_ms:.1f} ms > budget {args.import_budget_ms:.0f} ms")
+    if ready_ms > args.ready_budget_ms:
+        failures.append(f"time to first 200 {ready_ms:.1f} ms > budget {args.ready_budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"BUDGET EXCEEDED: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
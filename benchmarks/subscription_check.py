@@ -0,0 +1,103 @@
+"""Per-request cost of the auth -> subscription dependency chain.
+
+Mounts ``/bench`` behind ``get_active_subscription`` on the real app (viv-pay's
+``require_subscription`` against a scratch SQLite database, or
+``DATABASE_URL``) with ``require_auth`` replaced by a user taken from the
+``X-User`` header, and a bare ``/bare`` route for the framework's own cost.
+Requests go through an in-process ASGI transport cycling over ``--users``
+users, first with the subscription cache off and then on
+(app/subscription_cache.py), and the mean and p99 per request are reported
+with the bare route's cost subtracted.
+
+None of the users has a subscription, so this times the refusal path; the
+cache keeps refusals for ``--ttl`` here too.
+
+    python -m benchmarks.subscription_check --requests 5000 --users 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+async def _time(client, path: str, requests: int, users: int):
+    timings, statuses = [], {}
+    for i in range(requests):
+        started = time.perf_counter()
+        response = await client.get(path, headers={"X-User": str(i % users + 1)})
+        timings.append((time.perf_counter() - started) * 1e6)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    timings.sort()
+    return statistics.mean(timings), timings[int(len(timings) * 0.99)], statuses
+
+
+async def _run(app, args):
+    import httpx
+
+    from app.subscription_cache import cache
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", follow_redirects=False) as client:
+        await _time(client, "/bare", args.requests // 10 or 1, args.users)  # warm up
+        bare = await _time(client, "/bare", args.requests, args.users)
+        results = {}
+        for label, ttl in (("uncached", 0.0), ("cached", args.ttl)):
+            cache.clear()
+            cache.ttl = cache.denied_ttl = ttl
+            results[label] = await _time(client, "/bench", args.requests, args.users)
+        return bare, results, cache.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.subscription_check")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--ttl", type=float, default=60.0)
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.TemporaryDirectory()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{scratch.name}/subscription.db")
+    os.environ["AI_JOB_WORKER"] = "0"
+
+    from fastapi import Depends, Request
+
+    from app import main as app_main
+    from app import migrations
+    from app.routes import get_active_subscription
+
+    migrations.upgrade(app_main.engine)
+    app = app_main.app
+
+    class BenchUser:
+        def __init__(self, user_id: int):
+            self.id = user_id
+            self.email = f"bench{user_id}@example.com"
+
+    async def header_user(request: Request):
+        return BenchUser(int(request.headers["x-user"]))
+
+    app.dependency_overrides[app_main.require_auth] = header_user
+
+    @app.get("/bench")
+    async def bench(sub=Depends(get_active_subscription)):
+        return {"ok": True}
+
+    @app.get("/bare")
+    async def bare():
+        return {"ok": True}
+
+    (bare_mean, bare_p99, _), results, stats = asyncio.run(_run(app, args))
+    print(f"{args.requests} requests over {args.users} users; bare route mean {bare_mean:.0f} us, p99 {bare_p99:.0f} us")
+    print(f"{'':<10} {'mean us':>9} {'p99 us':>9} {'overhead us':>12}   statuses")
+    for label, (mean, p99, statuses) in results.items():
+        print(f"{label:<10} {mean:9.0f} {p99:9.0f} {mean - bare_mean:12.0f}   {statuses}")
+    print(f"cache: {stats}")
+    scratch.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())